@@ -0,0 +1,115 @@
+"""Local stand-in of NBP serving recorded archive pages and rate tables with configurable latency.
+
+It's an ASGI application, `NBPApiService` is pointed at it with an httpx client using `httpx.ASGITransport`, so
+requests to www.nbp.pl and api.nbp.pl never leave the process. Every weekday is a publication day, listings and
+tables of any past month are generated from the recorded fixtures.
+"""
+import asyncio
+import random
+from collections import Counter
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Callable, Optional
+from urllib.parse import parse_qs
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+
+FIXTURES_DIR = Path(__file__).parent.parent / "tests" / "fixtures" / "nbp"
+
+_ARCHIVE_ROW = (
+    '<li><a href="/kursy/xml/{table_id}.xml" target="_blank">'
+    "Tabela nr {number:03d}/A/NBP/{year} z dnia {table_date}</a></li>\n"
+)
+
+
+def _publication_days(year: int, month: int, until: date) -> list[date]:
+    day = date(year, month, 1)
+    days = []
+    while day.month == month and day <= until:
+        if day.weekday() < 5:
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def _table_number(table_date: date) -> int:
+    """Number of the table in its year, counting weekdays since new year."""
+    first_day = date(table_date.year, 1, 1)
+    return sum((first_day + timedelta(days=day)).weekday() < 5 for day in range((table_date - first_day).days + 1))
+
+
+def table_id(table_date: date) -> str:
+    return f"a{_table_number(table_date):03d}z{table_date.strftime('%y%m%d')}"
+
+
+class FakeNBP:
+    """NBP archive, XML tables and JSON api endpoints, each response delayed by `latency` +- `jitter` seconds.
+
+    Requests are counted by endpoint in `requests`, to tell how many upstream calls a scenario made.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        today: Callable[[], date] = date.today,
+        rng: Optional[random.Random] = None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self._today = today
+        self._rng = rng if rng is not None else random.Random(0)
+        self.requests: Counter[str] = Counter()
+        self._archive_form = (FIXTURES_DIR / "archive_form.html").read_bytes()
+        archive_month = (FIXTURES_DIR / "archive_2010_01.html").read_text(encoding="utf-8")
+        self._archive_head, _, rest = archive_month.partition("<li>")
+        self._archive_tail = rest[rest.index("</ul>") :]
+        self._table = (FIXTURES_DIR / "a005z100111.xml").read_text(encoding="utf-8")
+        self._json_table = (FIXTURES_DIR / "table_a_2010-01-11.json").read_text(encoding="utf-8")
+        self.app = Starlette(
+            routes=[
+                Route("/transfer.aspx", self.archive, methods=["GET", "POST"]),
+                Route("/kursy/xml/{table_id}.xml", self.table),
+                Route("/api/exchangerates/tables/A/{rate_date}/", self.json_table),
+            ]
+        )
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.app(scope, receive, send)
+
+    async def _delay(self) -> None:
+        delay = self.latency + self._rng.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def archive(self, request: Request) -> Response:
+        await self._delay()
+        if request.method == "GET":
+            self.requests["archive_form"] += 1
+            return Response(self._archive_form, media_type="text/html")
+
+        self.requests["archive_month"] += 1
+        # parsed by hand, starlette forms need python-multipart which the application doesn't depend on
+        form = parse_qs((await request.body()).decode())
+        year, month = 2000 + int(form["rok"][0]), int(form["mies"][0])
+        rows = "".join(
+            _ARCHIVE_ROW.format(table_id=table_id(day), number=_table_number(day), year=year, table_date=day)
+            for day in _publication_days(year, month, self._today())
+        )
+        return Response(self._archive_head + rows + self._archive_tail, media_type="text/html")
+
+    async def table(self, request: Request) -> Response:
+        await self._delay()
+        self.requests["table"] += 1
+        return Response(self._table, media_type="text/xml")
+
+    async def json_table(self, request: Request) -> Response:
+        await self._delay()
+        self.requests["json_table"] += 1
+        rate_date = date.fromisoformat(request.path_params["rate_date"])
+        if rate_date.weekday() >= 5 or rate_date > self._today():
+            return Response("404 NotFound - Not Found - Brak danych", status_code=404)
+        return Response(self._json_table.replace("2010-01-11", rate_date.isoformat()), media_type="application/json")
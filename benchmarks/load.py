@@ -0,0 +1,262 @@
+"""Load benchmark of the ASGI application against a local NBP stand-in.
+
+Requests are sent in process with an httpx client mounted on the application, NBP is replaced by `FakeNBP` with
+configurable latency, and the database is a scratch `<POSTGRES_DB>_bench` database created and dropped by the benchmark.
+Scenarios run in order, each on the state left by the previous ones:
+
+- cold_db: rates of distinct days which are in no cache nor in the database, each day is scraped from NBP
+- cold_cache: the same days again with in-memory caches cleared, rates are read from the database
+- hot_cache: random requests for the same days, served from the in-memory rate cache
+- thundering_herd: `--concurrency` simultaneous requests for one day which isn't loaded yet
+- batch: `POST /exchange/batch` of `--batch-size` random orders with in-memory caches cleared
+
+The report is JSON with throughput and latency percentiles per scenario and upstream NBP request counts, meant to be
+compared across commits with the same arguments.
+
+Usage: python -m benchmarks.load --requests 2000 --concurrency 32 --latency 0.05 --output report.json
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+from typing import Any, Awaitable, Callable, Optional
+
+import httpx
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy_utils import create_database, database_exists, drop_database
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from benchmarks.fake_nbp import FakeNBP
+from currency_exchange.asgi import setup_application
+from currency_exchange.config import AppConfig
+from currency_exchange.dependencies import (
+    exchange_rate_cache,
+    get_async_db_session,
+    get_nbp_api_service,
+    get_rate_snapshot,
+    get_rate_source,
+    get_shared_cache,
+    get_warmup,
+    month_tables_cache,
+)
+from currency_exchange.enums import FOREIGN_CURRENCIES, Currency
+from currency_exchange.services.nbp_api import NBPApiService
+
+FIRST_DAY = date(2015, 1, 1)
+
+Request = Callable[[httpx.AsyncClient], Awaitable[httpx.Response]]
+
+
+def weekdays(first_day: date, count: int) -> list[date]:
+    days = []
+    day = first_day
+    while len(days) < count:
+        if day.weekday() < 5:
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def exchange_request(exchange_date: date, in_currency: Currency, out_currency: Currency) -> Request:
+    params = {
+        "exchange_date": exchange_date.isoformat(),
+        "in_currency": in_currency.value,
+        "out_currency": out_currency.value,
+        "amount": 100.0,
+    }
+    return lambda client: client.get("/exchange", params=params)
+
+
+def batch_request(orders: list[tuple[date, Currency, Currency]]) -> Request:
+    data = [
+        {
+            "exchange_date": exchange_date.isoformat(),
+            "in_currency": in_currency.value,
+            "out_currency": out_currency.value,
+            "amount": 100.0,
+        }
+        for exchange_date, in_currency, out_currency in orders
+    ]
+    return lambda client: client.post("/exchange/batch", json=data)
+
+
+def random_order(rng: random.Random, days: list[date]) -> tuple[date, Currency, Currency]:
+    return rng.choice(days), rng.choice(FOREIGN_CURRENCIES), Currency.PLN
+
+
+def percentiles(latencies: list[float]) -> dict[str, float]:
+    """Latency percentiles in milliseconds."""
+    if len(latencies) < 2:
+        latencies = latencies * 2 or [0.0, 0.0]
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "p50_ms": round(cuts[49] * 1000, 3),
+        "p90_ms": round(cuts[89] * 1000, 3),
+        "p99_ms": round(cuts[98] * 1000, 3),
+        "max_ms": round(max(latencies) * 1000, 3),
+    }
+
+
+async def run_scenario(
+    client: httpx.AsyncClient, fake_nbp: FakeNBP, requests: list[Request], concurrency: int
+) -> dict[str, Any]:
+    """Send the requests from `concurrency` workers and measure latency of each of them."""
+    latencies = []
+    errors = 0
+    pending = iter(requests)
+    fake_nbp.requests.clear()
+
+    async def worker() -> None:
+        nonlocal errors
+        for request in pending:
+            start = time.perf_counter()
+            resp = await request(client)
+            latencies.append(time.perf_counter() - start)
+            if resp.status_code != httpx.codes.OK:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "errors": errors,
+        "duration_s": round(elapsed, 3),
+        "requests_per_s": round(len(latencies) / elapsed, 1),
+        **percentiles(latencies),
+        "upstream_requests": dict(fake_nbp.requests),
+    }
+
+
+def clear_caches() -> None:
+    exchange_rate_cache.clear()
+    month_tables_cache.clear()
+
+
+async def run(config: AppConfig, args: argparse.Namespace) -> dict[str, Any]:
+    engine = create_async_engine(config.database_url, future=True, pool_size=args.concurrency)
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    fake_nbp = FakeNBP(latency=args.latency, jitter=args.jitter)
+    nbp_api_service = NBPApiService(httpx.AsyncClient(transport=httpx.ASGITransport(app=fake_nbp)))
+
+    async def bench_db_session() -> AsyncSession:
+        async with session_factory() as session:
+            yield session
+
+    async def bench_nbp_api_service() -> NBPApiService:
+        return nbp_api_service
+
+    app = setup_application()
+    app.dependency_overrides[get_async_db_session] = bench_db_session
+    app.dependency_overrides[get_nbp_api_service] = bench_nbp_api_service
+    app.dependency_overrides[get_shared_cache] = lambda: None
+    # tables are looked up in the archive of the stand-in, like before rate sources were configurable
+    app.dependency_overrides[get_rate_source] = lambda: None
+    app.dependency_overrides[get_warmup] = lambda: None
+    app.dependency_overrides[get_rate_snapshot] = lambda: None
+
+    rng = random.Random(args.seed)
+    days = weekdays(FIRST_DAY, args.days)
+    herd_day = weekdays(days[-1] + timedelta(days=1), 1)[0]
+    scenarios: dict[str, tuple[Optional[Callable[[], None]], list[Request], int]] = {
+        "cold_db": (None, [exchange_request(day, Currency.USD, Currency.EUR) for day in days], args.concurrency),
+        "cold_cache": (
+            clear_caches,
+            [exchange_request(day, Currency.USD, Currency.EUR) for day in days],
+            args.concurrency,
+        ),
+        "hot_cache": (
+            None,
+            [exchange_request(day, Currency.USD, Currency.EUR) for day in rng.choices(days, k=args.requests)],
+            args.concurrency,
+        ),
+        "thundering_herd": (
+            None,
+            [exchange_request(herd_day, Currency.USD, Currency.EUR)] * args.concurrency,
+            args.concurrency,
+        ),
+        "batch": (
+            clear_caches,
+            [batch_request([random_order(rng, days) for _ in range(args.batch_size)]) for _ in range(args.batches)],
+            max(1, args.concurrency // 8),
+        ),
+    }
+
+    clear_caches()
+    results = {}
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        for name, (setup, requests, concurrency) in scenarios.items():
+            if args.scenario and name not in args.scenario:
+                continue
+            if setup is not None:
+                setup()
+            results[name] = await run_scenario(client, fake_nbp, requests, concurrency)
+            print(f"{name:<18}{results[name]['requests_per_s']:>10.1f} req/s", file=sys.stderr)
+
+    await nbp_api_service.aclose()
+    await engine.dispose()
+    return results
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, check=True, text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2_000, help="number of hot cache requests")
+    parser.add_argument("--days", type=int, default=200, help="number of distinct days of cold scenarios")
+    parser.add_argument("--concurrency", type=int, default=32, help="number of concurrent clients")
+    parser.add_argument("--batches", type=int, default=20, help="number of batch requests")
+    parser.add_argument("--batch-size", type=int, default=500, help="number of orders in a batch request")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds, latency of NBP responses")
+    parser.add_argument("--jitter", type=float, default=0.01, help="seconds, random spread of NBP latency")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scenario", action="append", help="run only the scenario, may be repeated")
+    parser.add_argument("--output", help="write JSON report to the file instead of stdout")
+    args = parser.parse_args()
+
+    config = AppConfig()
+    config.postgres_db = f"{config.postgres_db}_bench"
+    sync_url = config.database_url.replace("+asyncpg", "")
+    if database_exists(sync_url):
+        drop_database(sync_url)
+    create_database(sync_url)
+    try:
+        results = asyncio.run(run(config, args))
+    finally:
+        drop_database(sync_url)
+
+    report = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "arguments": {name: value for name, value in vars(args).items() if name != "output"},
+        "scenarios": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
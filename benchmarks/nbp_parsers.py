@@ -0,0 +1,67 @@
+"""Microbenchmark of NBP response parsers on recorded fixtures.
+
+Compares parser backends of `NBPApiService` on the archive pages and the XML rate table, and the JSON api table parser.
+`--positions` inflates the rate table with extra currencies, to see how parsers scale with the document size.
+
+Usage: python -m benchmarks.nbp_parsers --iterations 2000
+"""
+import argparse
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+from currency_exchange.services.nbp_parsers import PARSERS, get_parser, parse_json_table
+
+FIXTURES_DIR = Path(__file__).parent.parent / "tests" / "fixtures" / "nbp"
+
+
+def measure(parse: Callable[[bytes], Any], content: bytes, iterations: int) -> float:
+    """Returns mean parse time in microseconds."""
+    for _ in range(min(iterations, 100)):  # warm up
+        parse(content)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        parse(content)
+    return (time.perf_counter() - start) / iterations * 1_000_000
+
+
+def inflate_table(content: bytes, positions: int) -> bytes:
+    """Prepend unsupported currency positions, parsers have to skip them like other non supported currencies."""
+    position = (
+        b"<pozycja><nazwa_waluty>waluta</nazwa_waluty><przelicznik>1</przelicznik>"
+        b"<kod_waluty>XXX</kod_waluty><kurs_sredni>1,2345</kurs_sredni></pozycja>\n"
+    )
+    head, separator, tail = content.partition(b"<pozycja>")
+    return head + position * positions + separator + tail
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2_000, help="number of measured parses per variant")
+    parser.add_argument("--positions", type=int, default=0, help="extra positions added to the rate table")
+    args = parser.parse_args()
+
+    documents = {
+        "archive form": (FIXTURES_DIR / "archive_form.html").read_bytes(),
+        "archive month": (FIXTURES_DIR / "archive_2010_01.html").read_bytes(),
+        "rate table": inflate_table((FIXTURES_DIR / "a005z100111.xml").read_bytes(), args.positions),
+    }
+    for name in PARSERS:
+        backend = get_parser(name)
+        methods = {
+            "archive form": backend.parse_archive_form,
+            "archive month": backend.parse_archive_tables,
+            "rate table": backend.parse_table,
+        }
+        for document, method in methods.items():
+            content = documents[document]
+            elapsed = measure(method, content, args.iterations)
+            print(f"{name:<8}{document:<16}{len(content):>10} B{elapsed:>12.1f} us/parse")
+
+    content = (FIXTURES_DIR / "table_a_2010-01-11.json").read_bytes()
+    elapsed = measure(parse_json_table, content, args.iterations)
+    print(f"{'json':<8}{'rate table':<16}{len(content):>10} B{elapsed:>12.1f} us/parse")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Microbenchmark of single exchange rate lookup from the database.
+
+Compares ORM lookup hydrating `ExchangeRate` instance with the Core lookup used by `ExchangeRateRepository.get_rate`.
+Runs against a scratch `<POSTGRES_DB>_bench` database, which is created and dropped by the benchmark.
+
+Usage: python -m benchmarks.rate_lookup --lookups 20000
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Awaitable, Callable
+
+from sqlalchemy import and_, select, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy_utils import create_database, database_exists, drop_database
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from currency_exchange.config import AppConfig
+from currency_exchange.database.tables import ExchangeRate
+from currency_exchange.dependencies import create_exchange_rate_repository
+from currency_exchange.enums import FOREIGN_CURRENCIES, Currency
+
+
+async def orm_lookup(session: AsyncSession, rate_date: date, currency: Currency) -> Decimal:
+    query = select(ExchangeRate).where(and_(ExchangeRate.rate_date == rate_date, ExchangeRate.currency == currency))
+    return (await session.execute(query)).scalar_one_or_none().rate
+
+
+async def measure(lookup: Callable[[date, Currency], Awaitable[Decimal]], keys: list[tuple[date, Currency]]) -> float:
+    """Returns mean lookup time in microseconds."""
+    for rate_date, currency in keys[:100]:  # warm up connection and statement caches
+        await lookup(rate_date, currency)
+    start = time.perf_counter()
+    for rate_date, currency in keys:
+        await lookup(rate_date, currency)
+    return (time.perf_counter() - start) / len(keys) * 1_000_000
+
+
+async def run(config: AppConfig, days: int, lookups: int) -> None:
+    engine = create_async_engine(config.database_url, future=True)
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_factory() as session:
+        repository = create_exchange_rate_repository(config, session)
+        first_day = date(2000, 1, 1)
+        await repository.insert_exchange_rates(
+            {
+                (first_day + timedelta(days=day), currency): Decimal(random.randint(10_000, 99_999)) / 10_000
+                for day in range(days)
+                for currency in FOREIGN_CURRENCIES
+            }
+        )
+        async with engine.connect() as conn:
+            await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.execute(text("VACUUM ANALYZE exchangerate"))
+
+        keys = [
+            (first_day + timedelta(days=random.randrange(days)), random.choice(FOREIGN_CURRENCIES))
+            for _ in range(lookups)
+        ]
+        orm_time = await measure(lambda rate_date, currency: orm_lookup(session, rate_date, currency), keys)
+        core_time = await measure(repository.get_rate, keys)
+
+        plan = await session.execute(
+            text("EXPLAIN SELECT rate FROM exchangerate WHERE rate_date = :rate_date AND currency = 840"),
+            {"rate_date": first_day},
+        )
+        print("Lookup plan:")
+        for (line,) in plan:
+            print(f"  {line}")
+
+    print(f"{'ORM select(ExchangeRate)':<32}{orm_time:>10.1f} us/lookup")
+    print(f"{'Core select(rate)':<32}{core_time:>10.1f} us/lookup")
+    print(f"{'speedup':<32}{orm_time / core_time:>10.2f} x")
+    await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=3_650, help="number of days with stored rates")
+    parser.add_argument("--lookups", type=int, default=20_000, help="number of measured lookups per variant")
+    args = parser.parse_args()
+
+    config = AppConfig()
+    config.postgres_db = f"{config.postgres_db}_bench"
+    sync_url = config.database_url.replace("+asyncpg", "")
+    if database_exists(sync_url):
+        drop_database(sync_url)
+    create_database(sync_url)
+    try:
+        asyncio.run(run(config, args.days, args.lookups))
+    finally:
+        drop_database(sync_url)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""Benchmark of exchange rate storage before and after the compact schema.
+
+Compares the previous layout (postgres enum currency, numeric rate, multi-row VALUES inserts in chunks) with the
+current one (ISO 4217 numeric code in smallint, rate as bigint scaled by 10**8, insert of unnested arrays) on the same
+rates: bulk insert, point lookups, batch lookups, range scans of one currency, scans of all currencies in a month and
+size of the table with indexes.
+Runs against a scratch `<POSTGRES_DB>_bench` database, which is created and dropped by the benchmark.
+
+Usage: python -m benchmarks.storage_schema --days 7300 --lookups 20000
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Any, Awaitable, Callable
+
+import sqlalchemy as sa
+from sqlalchemy import and_, bindparam, select, text, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy_utils import create_database, database_exists, drop_database
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from currency_exchange.config import AppConfig
+from currency_exchange.database.tables import ExchangeRate
+from currency_exchange.dependencies import create_exchange_rate_repository
+from currency_exchange.enums import FOREIGN_CURRENCIES, Currency
+
+# layout of `exchangerate` before migration b81f3e6a0c25
+legacy_metadata = sa.MetaData()
+legacy_table = sa.Table(
+    "exchangerate_legacy",
+    legacy_metadata,
+    sa.Column("rate_date", sa.Date(), primary_key=True),
+    sa.Column("currency", sa.Enum(Currency, name="currency"), primary_key=True),
+    sa.Column("rate", sa.Numeric()),
+    sa.Column("fetched_at", sa.DateTime(), nullable=False),
+    sa.Index("ix_exchangerate_legacy_lookup", "rate_date", "currency", postgresql_include=["rate", "fetched_at"]),
+)
+LEGACY_ROWS_PER_QUERY = 5_000
+
+RateKey = tuple[date, Currency]
+
+
+class LegacyRepository:
+    """Insert and batch lookup of `ExchangeRateRepository` before the compact schema."""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def insert_exchange_rates(self, rates: dict[RateKey, Decimal]) -> None:
+        values = [
+            {"rate_date": rate_date, "currency": currency, "rate": rate, "fetched_at": datetime.now()}
+            for (rate_date, currency), rate in rates.items()
+        ]
+        for offset in range(0, len(values), LEGACY_ROWS_PER_QUERY):
+            query = insert(legacy_table).values(values[offset : offset + LEGACY_ROWS_PER_QUERY])
+            query = query.on_conflict_do_update(
+                index_elements=[legacy_table.c.rate_date, legacy_table.c.currency],
+                set_={"rate": query.excluded.rate, "fetched_at": query.excluded.fetched_at},
+                where=legacy_table.c.rate.is_(None),
+            )
+            await self.session.execute(query)
+        await self.session.commit()
+
+    async def get_exchange_rates(self, keys: list[RateKey]) -> dict[RateKey, Decimal]:
+        query = select(legacy_table.c.rate_date, legacy_table.c.currency, legacy_table.c.rate).where(
+            tuple_(legacy_table.c.rate_date, legacy_table.c.currency).in_(keys)
+        )
+        return {(rate_date, currency): rate for rate_date, currency, rate in await self.session.execute(query)}
+
+
+def point_query(table: sa.Table) -> Any:
+    return select(table.c.rate).where(
+        and_(table.c.rate_date == bindparam("rate_date"), table.c.currency == bindparam("currency"))
+    )
+
+
+def range_query(table: sa.Table) -> Any:
+    return (
+        select(table.c.rate_date, table.c.rate)
+        .where(
+            and_(
+                table.c.currency == bindparam("currency"),
+                table.c.rate_date >= bindparam("date_from"),
+                table.c.rate_date <= bindparam("date_to"),
+            )
+        )
+        .order_by(table.c.rate_date)
+    )
+
+
+def date_range_query(table: sa.Table) -> Any:
+    return (
+        select(table.c.rate_date, table.c.currency, table.c.rate)
+        .where(and_(table.c.rate_date >= bindparam("date_from"), table.c.rate_date <= bindparam("date_to")))
+        .order_by(table.c.rate_date)
+    )
+
+
+async def measure(operation: Callable[[Any], Awaitable[Any]], items: list[Any]) -> float:
+    """Returns mean operation time in microseconds."""
+    for item in items[:50]:  # warm up statement caches
+        await operation(item)
+    start = time.perf_counter()
+    for item in items:
+        await operation(item)
+    return (time.perf_counter() - start) / len(items) * 1_000_000
+
+
+async def run_variant(
+    session: AsyncSession,
+    table: sa.Table,
+    repository: Any,
+    rates: dict[RateKey, Decimal],
+    workload: dict[str, list[Any]],
+) -> dict[str, float]:
+    start = time.perf_counter()
+    await repository.insert_exchange_rates(rates)
+    insert_time = time.perf_counter() - start
+
+    async with session.bind.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text(f"VACUUM ANALYZE {table.name}"))
+        size = (await conn.execute(text(f"SELECT pg_total_relation_size('{table.name}')"))).scalar()
+
+    point, range_, date_range = point_query(table), range_query(table), date_range_query(table)
+
+    async def point_lookup(key: RateKey) -> None:
+        (await session.execute(point, {"rate_date": key[0], "currency": key[1]})).all()
+
+    async def range_scan(item: tuple[Currency, date, date]) -> None:
+        (await session.execute(range_, {"currency": item[0], "date_from": item[1], "date_to": item[2]})).all()
+
+    async def date_range_scan(item: tuple[date, date]) -> None:
+        (await session.execute(date_range, {"date_from": item[0], "date_to": item[1]})).all()
+
+    return {
+        "insert_s": insert_time,
+        "point_us": await measure(point_lookup, workload["keys"]),
+        "batch_us": await measure(repository.get_exchange_rates, workload["batches"]),
+        "range_us": await measure(range_scan, workload["ranges"]),
+        "date_range_us": await measure(date_range_scan, workload["date_ranges"]),
+        "size_kb": size / 1024,
+    }
+
+
+async def run(config: AppConfig, args: argparse.Namespace) -> None:
+    engine = create_async_engine(config.database_url, future=True)
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+        await conn.run_sync(legacy_metadata.create_all)
+
+    rng = random.Random(args.seed)
+    first_day = date(2000, 1, 1)
+    rates = {
+        (first_day + timedelta(days=day), currency): Decimal(rng.randint(10_000, 99_999)).scaleb(-4)
+        for day in range(args.days)
+        for currency in FOREIGN_CURRENCIES
+    }
+    days = [first_day + timedelta(days=day) for day in range(args.days)]
+    range_starts = days[: max(args.days - 365, 1)]
+    workload = {
+        "keys": [(rng.choice(days), rng.choice(FOREIGN_CURRENCIES)) for _ in range(args.lookups)],
+        "batches": [rng.sample(list(rates), args.batch_size) for _ in range(args.batches)],
+        "ranges": [
+            (rng.choice(FOREIGN_CURRENCIES), date_from, date_from + timedelta(days=364))
+            for date_from in rng.choices(range_starts, k=args.ranges)
+        ],
+        "date_ranges": [
+            (date_from, date_from + timedelta(days=30))
+            for date_from in rng.choices(days[: max(args.days - 31, 1)], k=args.date_ranges)
+        ],
+    }
+
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    results = {}
+    async with session_factory() as session:
+        results["legacy"] = await run_variant(session, legacy_table, LegacyRepository(session), rates, workload)
+    async with session_factory() as session:
+        results["compact"] = await run_variant(
+            session, ExchangeRate.__table__, create_exchange_rate_repository(config, session), rates, workload
+        )
+    await engine.dispose()
+
+    print(
+        f"{len(rates)} rates, {args.lookups} point lookups, {args.batches} batch lookups of {args.batch_size} keys, "
+        f"{args.ranges} range scans of a year, {args.date_ranges} scans of all currencies in a month"
+    )
+    print(f"{'':<24}{'legacy':>12}{'compact':>12}{'speedup':>10}")
+    for label, key in [
+        ("bulk insert [s]", "insert_s"),
+        ("point lookup [us]", "point_us"),
+        ("batch lookup [us]", "batch_us"),
+        ("range scan [us]", "range_us"),
+        ("date range scan [us]", "date_range_us"),
+        ("table + indexes [kB]", "size_kb"),
+    ]:
+        legacy, compact = results["legacy"][key], results["compact"][key]
+        print(f"{label:<24}{legacy:>12.2f}{compact:>12.2f}{legacy / compact:>9.2f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=7_300, help="number of days with stored rates")
+    parser.add_argument("--lookups", type=int, default=20_000, help="number of measured point lookups")
+    parser.add_argument("--batches", type=int, default=200, help="number of measured batch lookups")
+    parser.add_argument("--batch-size", type=int, default=1_000, help="keys per batch lookup")
+    parser.add_argument("--ranges", type=int, default=2_000, help="number of measured one year range scans")
+    parser.add_argument(
+        "--date-ranges", type=int, default=2_000, help="number of measured scans of all currencies in a month"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config = AppConfig()
+    config.postgres_db = f"{config.postgres_db}_bench"
+    sync_url = config.database_url.replace("+asyncpg", "")
+    if database_exists(sync_url):
+        drop_database(sync_url)
+    create_database(sync_url)
+    try:
+        asyncio.run(run(config, args))
+    finally:
+        drop_database(sync_url)
+
+
+if __name__ == "__main__":
+    main()
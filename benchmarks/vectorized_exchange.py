@@ -0,0 +1,72 @@
+"""Benchmark of exchanging many amounts at once, requires `numpy` extra.
+
+Compares the per-item `Decimal` conversion used by `CurrencyExchangeService.exchange_many` with the vectorized
+`RateMatrix.exchange` on random orders over synthetic rates, and reports the largest relative difference of results.
+
+Usage: python -m benchmarks.vectorized_exchange --rows 1000000
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+import numpy as np
+
+from currency_exchange.enums import FOREIGN_CURRENCIES, Currency
+from currency_exchange.services.currency_exchange import (
+    CurrencyExchangeService,
+    ExchangeOrder,
+)
+from currency_exchange.services.vectorized_exchange import RateMatrix
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="number of exchanged amounts")
+    parser.add_argument("--days", type=int, default=3_650, help="number of days with rates")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    first_day = date(2000, 1, 1)
+    rates = {
+        (first_day + timedelta(days=day), currency): Decimal(rng.randint(10_000, 99_999)) / 10_000
+        for day in range(args.days)
+        for currency in FOREIGN_CURRENCIES
+    }
+    currencies = list(Currency)
+    orders = [
+        ExchangeOrder(
+            amount=rng.randint(1, 10_000_000) / 100,
+            in_currency=rng.choice(currencies),
+            out_currency=rng.choice(currencies),
+            exchange_date=first_day + timedelta(days=rng.randrange(args.days)),
+        )
+        for _ in range(args.rows)
+    ]
+
+    start = time.perf_counter()
+    # pylint: disable=protected-access
+    results = [CurrencyExchangeService._convert(order, rates) for order in orders]
+    per_item_time = time.perf_counter() - start
+
+    matrix = RateMatrix.from_rates((rate_date, currency, rate) for (rate_date, currency), rate in rates.items())
+    amounts = np.array([order.amount for order in orders])
+    day_indexes = matrix.day_indexes([order.exchange_date for order in orders])
+    in_currencies = matrix.currency_indexes([order.in_currency for order in orders])
+    out_currencies = matrix.currency_indexes([order.out_currency for order in orders])
+    start = time.perf_counter()
+    vectorized = matrix.exchange(amounts, day_indexes, in_currencies, out_currencies)
+    vectorized_time = time.perf_counter() - start
+
+    expected = np.array([result.amount for result in results])
+    difference = np.max(np.abs(vectorized.amounts - expected) / np.maximum(np.abs(expected), 1e-300))
+    print(f"{'per item Decimal':<32}{per_item_time * 1000:>10.1f} ms")
+    print(f"{'vectorized float64':<32}{vectorized_time * 1000:>10.1f} ms")
+    print(f"{'speedup':<32}{per_item_time / vectorized_time:>10.1f} x")
+    print(f"{'max relative difference':<32}{difference:>10.1e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+python -m currency_exchange.backfill "$@"
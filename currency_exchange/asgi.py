@@ -1,7 +1,23 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from currency_exchange.dependencies import (
+    app_config,
+    create_nbp_api_service,
+    create_rate_source,
+    create_shared_cache,
+    create_table_prefetcher,
+    create_warmup,
+    exchange_rate_cache,
+    get_db_engine,
+    metrics,
+)
 from currency_exchange.endpoints.exchange import router as exchange_router
+from currency_exchange.endpoints.health import router as health_router
+from currency_exchange.endpoints.metrics import router as metrics_router
+from currency_exchange.endpoints.rates import router as rates_router
+from currency_exchange.metrics import MetricsMiddleware
+from currency_exchange.services.rate_snapshot import load_rate_snapshot
 
 
 def setup_application() -> FastAPI:
@@ -16,6 +32,54 @@ def setup_application() -> FastAPI:
     )
 
     application.router.include_router(exchange_router)
+    application.router.include_router(rates_router)
+    application.router.include_router(health_router)
+
+    # without metrics enabled requests don't pass through the middleware at all
+    if metrics.enabled:
+        application.add_middleware(MetricsMiddleware, metrics=metrics)
+        application.router.include_router(metrics_router)
+
+    @application.on_event("startup")
+    async def startup() -> None:
+        # engine, NBP api service and rate snapshot are set up here rather than on import, which stays cheap for
+        # workers and tools
+        db_engine = get_db_engine()
+        application.state.rate_snapshot = load_rate_snapshot(app_config.rate_snapshot_path)
+        application.state.nbp_api_service = create_nbp_api_service(app_config)
+        application.state.shared_cache = create_shared_cache(app_config)
+        application.state.rate_source = create_rate_source(
+            app_config, application.state.nbp_api_service, application.state.shared_cache
+        )
+        application.state.table_prefetcher = None
+        if app_config.prefetch_enabled:
+            application.state.table_prefetcher = create_table_prefetcher(
+                app_config, application.state.nbp_api_service, application.state.shared_cache
+            )
+            application.state.table_prefetcher.start_polling()
+        # startup doesn't wait for the warm-up, the worker passes readiness checks and serves requests meanwhile
+        application.state.warmup = create_warmup(app_config, application.state.nbp_api_service)
+        application.state.warmup.start()
+        if metrics.enabled:
+            metrics.watch(
+                db_engine=db_engine,
+                http_client=application.state.nbp_api_service.client,
+                rate_cache=exchange_rate_cache,
+                rate_source=application.state.rate_source,
+            )
+
+    @application.on_event("shutdown")
+    async def shutdown() -> None:
+        await application.state.warmup.stop()
+        if application.state.table_prefetcher is not None:
+            await application.state.table_prefetcher.stop_polling()
+        await application.state.nbp_api_service.aclose()
+        if application.state.shared_cache is not None:
+            await application.state.shared_cache.aclose()
+        await get_db_engine().dispose()
+        if application.state.rate_snapshot is not None:
+            application.state.rate_snapshot.close()
+
     return application
 
 
@@ -0,0 +1,98 @@
+"""Backfill exchange rates of all currencies for a range of dates from NBP into the database.
+
+Dates which already have records of all currencies are skipped, so an interrupted backfill can be simply rerun.
+
+Usage: python -m currency_exchange.backfill 2010-01-01 2020-12-31 --concurrency 8
+"""
+import argparse
+import asyncio
+import logging
+from datetime import date, datetime, timedelta
+
+from currency_exchange.database.repositories import RateTableRepository
+from currency_exchange.dependencies import (
+    app_config,
+    create_exchange_rate_repository,
+    create_nbp_api_service,
+    create_shared_cache,
+    exchange_rate_cache,
+    get_async_session_factory,
+    get_db_engine,
+    month_tables_cache,
+)
+from currency_exchange.services.currency_exchange import (
+    CurrencyExchangeService,
+    date_range,
+)
+from currency_exchange.services.rate_table_index import RateTableIndexService
+
+logger = logging.getLogger(__name__)
+
+
+async def backfill(service: CurrencyExchangeService, date_from: date, date_to: date, batch_size: int = 100) -> int:
+    """Fetch and store rates for dates in range missing in the database, returns number of dates which failed."""
+    complete_dates = await service.exchange_rate_repository.get_complete_dates(date_from, date_to)
+    missing_dates = [rate_date for rate_date in date_range(date_from, date_to) if rate_date not in complete_dates]
+    logger.info("Skipping %d already stored dates, %d dates to backfill", len(complete_dates), len(missing_dates))
+
+    failed = 0
+    for offset in range(0, len(missing_dates), batch_size):
+        batch = set(missing_dates[offset : offset + batch_size])
+        rates = await service.fetch_exchange_rates(batch)
+        failed += len(batch - {rate_date for rate_date, _ in rates})
+        logger.info(
+            "Backfilled %d/%d dates (%d failed), last date %s",
+            min(offset + batch_size, len(missing_dates)),
+            len(missing_dates),
+            failed,
+            max(batch),
+        )
+    return failed
+
+
+def parse_date(value: str) -> date:
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Backfill NBP exchange rates into the database.")
+    parser.add_argument("date_from", type=parse_date, help="first date of the range, YYYY-MM-DD")
+    parser.add_argument("date_to", type=parse_date, help="last date of the range, YYYY-MM-DD")
+    parser.add_argument("--concurrency", type=int, default=4, help="number of NBP tables downloaded concurrently")
+    parser.add_argument("--batch-size", type=int, default=100, help="number of dates stored in a single insert")
+    return parser.parse_args()
+
+
+async def main(args: argparse.Namespace) -> int:
+    # today's table may be not published yet and unavailable rate would be stored for the whole day
+    date_to = min(args.date_to, date.today() - timedelta(days=1))
+    nbp_api_service = create_nbp_api_service(app_config)
+    shared_cache = create_shared_cache(app_config)
+    session_factory = get_async_session_factory()
+    async with session_factory() as session:
+        rate_table_index_service = RateTableIndexService(
+            RateTableRepository(session),
+            nbp_api_service,
+            month_tables_cache,
+            current_month_ttl=timedelta(seconds=app_config.current_month_tables_ttl),
+            shared_cache=shared_cache,
+        )
+        service = CurrencyExchangeService(
+            create_exchange_rate_repository(app_config, session),
+            nbp_api_service,
+            rate_table_index_service,
+            exchange_rate_cache,
+            concurrent_table_fetches=args.concurrency,
+            shared_cache=shared_cache,
+        )
+        failed = await backfill(service, args.date_from, date_to, args.batch_size)
+    await nbp_api_service.aclose()
+    if shared_cache is not None:
+        await shared_cache.aclose()
+    await get_db_engine().dispose()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    raise SystemExit(asyncio.run(main(parse_args())))
@@ -1,3 +1,6 @@
+from datetime import time
+from typing import Optional
+
 from pydantic import BaseSettings
 
 
@@ -8,6 +11,78 @@ class AppConfig(BaseSettings):
     postgres_port: int
     postgres_db: str
 
+    db_echo: bool = False
+    db_pool_size: int = 10
+    db_max_overflow: int = 10
+    db_pool_recycle: int = 1_800
+    # milliseconds, 0 disables the timeout
+    db_statement_timeout: int = 5_000
+    # asyncpg prepared statements cached per connection, 0 disables caching (e.g. behind pgbouncer)
+    db_prepared_statement_cache_size: int = 100
+
+    rate_cache_size: int = 10_000
+    # seconds, unavailable rates fetched on their day (before the table got published) are fetched again after it,
+    # the same for in-memory cache, shared cache and database, so no tier keeps serving a rate the others refetched
+    unavailable_rate_ttl: float = 300.0
+    current_month_tables_ttl: float = 600.0
+    # exchange with the last published rate on weekends and holidays, instead of responding with unavailable rate
+    last_available_rate: bool = False
+    stream_chunk_size: int = 1_000
+    stream_max_line_length: int = 4_096
+    rates_max_range_days: int = 3_660
+    # seconds, Cache-Control max-age of GET responses for past days and for today
+    http_cache_max_age: int = 31_536_000
+    http_cache_today_max_age: int = 60
+
+    # prefetch of today's table by one elected worker, between start and deadline of server local time every interval
+    # seconds, NBP publishes the table around 12:15 Warsaw time
+    prefetch_enabled: bool = True
+    prefetch_start: time = time(11, 45)
+    prefetch_deadline: time = time(16, 0)
+    prefetch_poll_interval: float = 60.0
+
+    # after startup a worker opens a database connection and caches stored rates of the last days in the background,
+    # /ready reports "cold" until done
+    warmup_rate_days: int = 31
+    warmup_retry_interval: float = 5.0
+    # import the NBP parser during warm-up, otherwise it's imported by the first parse
+    warmup_load_parser: bool = False
+
+    # rate snapshot written by `currency_exchange.export_snapshot`, mapped by all workers if the file exists
+    rate_snapshot_path: Optional[str] = None
+
+    # requires `metrics` extra, exposes /metrics endpoint
+    metrics_enabled: bool = False
+
+    # "memory://" or "redis://host:port/db", shared cache is disabled if not set
+    shared_cache_url: Optional[str] = None
+    shared_cache_lock_timeout: float = 30.0
+
+    nbp_max_connections: int = 20
+    nbp_max_keepalive_connections: int = 10
+    nbp_keepalive_expiry: float = 30.0
+    nbp_connect_timeout: float = 5.0
+    nbp_timeout: float = 10.0
+    nbp_retries: int = 2
+    nbp_retry_backoff: float = 0.5
+    # "lxml" or "bs4"
+    nbp_parser: str = "lxml"
+    # bytes, larger NBP responses are parsed in a worker thread
+    nbp_parse_in_thread_threshold: int = 65_536
+    # upstream sources of rates in order of preference, "archive" (listing and XML table) or "api" (JSON api),
+    # empty list looks tables up in the archive without hedging and circuit breaker
+    nbp_sources: list[str] = ["archive", "api"]
+    # a call slower than the percentile of recent latencies of its source (or than the delay in seconds, until enough
+    # calls are observed) is hedged with a call to the next source
+    nbp_hedge_percentile: float = 0.9
+    nbp_hedge_delay: float = 2.0
+    # circuit of a source opens when the share of failed calls among the last window calls reaches the rate, and lets
+    # a probe call through after the timeout in seconds
+    nbp_breaker_failure_rate: float = 0.5
+    nbp_breaker_window: int = 20
+    nbp_breaker_min_calls: int = 10
+    nbp_breaker_reset_timeout: float = 30.0
+
     @property
     def database_url(self) -> str:
         url = (
@@ -1,27 +1,230 @@
-from datetime import date
+from datetime import date, datetime, timedelta
 from decimal import Decimal
-from typing import Optional
+from typing import Any, AsyncIterator, Callable, Iterable, Optional
 
-from sqlalchemy import and_, select
+from sqlalchemy import Date, DateTime, and_, bindparam, cast, func, or_, select
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.sql import ColumnElement
+from sqlalchemy.types import TypeEngine
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from currency_exchange.database.tables import ExchangeRate
-from currency_exchange.enums import Currency
-from currency_exchange.exceptions import ExchangeRateRecordDoesNotExist
+from currency_exchange.database.tables import ExchangeRate, RateTable, RateTableMonth
+from currency_exchange.database.types import CurrencyCode, ScaledDecimal
+from currency_exchange.enums import FOREIGN_CURRENCIES, Currency
+from currency_exchange.exceptions import (
+    ExchangeRateRecordDoesNotExist,
+    MonthTablesRecordDoesNotExist,
+)
+
+exchange_rate_table = ExchangeRate.__table__
+
+
+def _is_final_rate() -> ColumnElement:
+    """Stored rate never changes if it was published, or it was unavailable when fetched after its day ended."""
+    return or_(
+        exchange_rate_table.c.rate.isnot(None),
+        exchange_rate_table.c.rate_date < cast(exchange_rate_table.c.fetched_at, Date),
+    )
+
+
+def _is_valid_rate(stale_before: Any) -> ColumnElement:
+    """Stored rate is valid unless it's null fetched on its day (the table could be published later) before
+    `stale_before`, stale rows are treated as missing and fetched again."""
+    return or_(_is_final_rate(), exchange_rate_table.c.fetched_at > stale_before)
+
+
+# Core statement selecting only the rate column, it skips ORM entity loading and its compiled form is cached
+_GET_RATE_QUERY = select(exchange_rate_table.c.rate).where(
+    and_(
+        exchange_rate_table.c.rate_date == bindparam("rate_date"),
+        exchange_rate_table.c.currency == bindparam("currency"),
+        _is_valid_rate(bindparam("stale_before")),
+    )
+)
+
+
+def _array_param(name: str, item_type: TypeEngine) -> ColumnElement:
+    return cast(bindparam(name, type_=ARRAY(item_type)), ARRAY(item_type))
+
+
+# rows are passed as one array parameter per column, so statements have the same parameters for any number of rows,
+# they are prepared once and rows aren't split into chunks to stay below asyncpg limit of 32767 parameters
+_RATE_KEYS = (
+    func.unnest(_array_param("rate_dates", Date), _array_param("currencies", CurrencyCode()))
+    .table_valued("rate_date", "currency")
+    .render_derived(name="keys")
+)
+_GET_RATES_QUERY = (
+    select(exchange_rate_table.c.rate_date, exchange_rate_table.c.currency, exchange_rate_table.c.rate)
+    .join_from(
+        exchange_rate_table,
+        _RATE_KEYS,
+        and_(
+            exchange_rate_table.c.rate_date == _RATE_KEYS.c.rate_date,
+            exchange_rate_table.c.currency == _RATE_KEYS.c.currency,
+        ),
+    )
+    .where(_is_valid_rate(bindparam("stale_before")))
+)
+
+_INSERTED_RATES = (
+    func.unnest(
+        _array_param("rate_dates", Date),
+        _array_param("currencies", CurrencyCode()),
+        _array_param("rates", ScaledDecimal()),
+    )
+    .table_valued("rate_date", "currency", "rate")
+    .render_derived(name="rows")
+)
+_INSERT_RATES_QUERY = insert(ExchangeRate).from_select(
+    ["rate_date", "currency", "rate", "fetched_at"],
+    select(
+        _INSERTED_RATES.c.rate_date,
+        _INSERTED_RATES.c.currency,
+        _INSERTED_RATES.c.rate,
+        cast(bindparam("fetched_at"), DateTime),
+    ),
+)
+_INSERT_RATES_QUERY = _INSERT_RATES_QUERY.on_conflict_do_update(
+    index_elements=[ExchangeRate.rate_date, ExchangeRate.currency],
+    set_={"rate": _INSERT_RATES_QUERY.excluded.rate, "fetched_at": _INSERT_RATES_QUERY.excluded.fetched_at},
+    # concurrent requests may insert the same rates, the first stored rate wins and the rest are no-ops
+    where=exchange_rate_table.c.rate.is_(None),
+)
 
 
 class ExchangeRateRepository:
-    def __init__(self, session: AsyncSession):
+    def __init__(
+        self,
+        session: AsyncSession,
+        unavailable_rate_ttl: timedelta,
+        clock: Callable[[], datetime] = datetime.now,
+    ):
         self.session = session
+        # null rates fetched on their day are valid for `unavailable_rate_ttl`, those fetched later forever
+        self.unavailable_rate_ttl = unavailable_rate_ttl
+        self._clock = clock
+
+    def _stale_before(self) -> datetime:
+        return self._clock() - self.unavailable_rate_ttl
 
-    async def insert_exchange_rate(self, rate_date: date, currency: Currency, rate: Optional[Decimal]) -> None:
-        exchange_rate = ExchangeRate(rate_date=rate_date, currency=currency, rate=rate)
-        self.session.add(exchange_rate)
+    async def insert_exchange_rates(self, rates: dict[tuple[date, Currency], Optional[Decimal]]) -> None:
+        """Insert rates, replacing stored null values, e.g. stored for today before NBP published the table.
+
+        Stored rates are never replaced, published rates don't change.
+        """
+        if not rates:
+            return
+        params = {
+            "rate_dates": [rate_date for rate_date, _ in rates],
+            "currencies": [currency for _, currency in rates],
+            "rates": list(rates.values()),
+            "fetched_at": self._clock(),
+        }
+        await self.session.execute(_INSERT_RATES_QUERY, params)
         await self.session.commit()
 
-    async def get_exchange_rate(self, rate_date: date, currency: Currency) -> ExchangeRate:
-        query = select(ExchangeRate).where(and_(ExchangeRate.rate_date == rate_date, ExchangeRate.currency == currency))
-        result = (await self.session.execute(query)).scalar_one_or_none()
-        if not result:
+    async def get_rate(self, rate_date: date, currency: Currency) -> Optional[Decimal]:
+        """Get stored rate, `None` means the rate is unavailable for the date."""
+        params = {"rate_date": rate_date, "currency": currency, "stale_before": self._stale_before()}
+        row = (await self.session.execute(_GET_RATE_QUERY, params)).first()
+        if row is None:
             raise ExchangeRateRecordDoesNotExist()
-        return result
+        return row.rate
+
+    async def get_exchange_rates(
+        self, keys: Iterable[tuple[date, Currency]]
+    ) -> dict[tuple[date, Currency], Optional[Decimal]]:
+        """Get rates stored for given (rate_date, currency) pairs, pairs without (valid) record are omitted."""
+        keys = list(keys)
+        if not keys:
+            return {}
+        params = {
+            "rate_dates": [rate_date for rate_date, _ in keys],
+            "currencies": [currency for _, currency in keys],
+            "stale_before": self._stale_before(),
+        }
+        result = await self.session.execute(_GET_RATES_QUERY, params)
+        return {(rate_date, currency): rate for rate_date, currency, rate in result}
+
+    async def get_rates_in_range(
+        self, currency: Currency, date_from: date, date_to: date
+    ) -> dict[date, Optional[Decimal]]:
+        """Get stored rates of the currency for days in range (inclusive), ordered by date, days without (valid)
+        record are omitted."""
+        query = (
+            select(exchange_rate_table.c.rate_date, exchange_rate_table.c.rate)
+            .where(
+                and_(
+                    exchange_rate_table.c.rate_date >= date_from,
+                    exchange_rate_table.c.rate_date <= date_to,
+                    exchange_rate_table.c.currency == currency,
+                    _is_valid_rate(self._stale_before()),
+                )
+            )
+            .order_by(exchange_rate_table.c.rate_date)
+        )
+        return dict((await self.session.execute(query)).all())
+
+    async def get_complete_dates(self, date_from: date, date_to: date) -> set[date]:
+        """Get dates from the range which have valid records (rate or null) of all foreign currencies."""
+        query = (
+            select(exchange_rate_table.c.rate_date)
+            .where(
+                and_(
+                    exchange_rate_table.c.rate_date >= date_from,
+                    exchange_rate_table.c.rate_date <= date_to,
+                    _is_valid_rate(self._stale_before()),
+                )
+            )
+            .group_by(exchange_rate_table.c.rate_date)
+            .having(func.count() >= len(FOREIGN_CURRENCIES))
+        )
+        return set((await self.session.execute(query)).scalars())
+
+    async def iter_final_rates(self) -> AsyncIterator[tuple[date, Currency, Optional[Decimal]]]:
+        """Stream stored rates which never change, ordered by date and currency."""
+        query = (
+            select(exchange_rate_table.c.rate_date, exchange_rate_table.c.currency, exchange_rate_table.c.rate)
+            .where(_is_final_rate())
+            .order_by(exchange_rate_table.c.rate_date, exchange_rate_table.c.currency)
+        )
+        async for rate_date, currency, rate in await self.session.stream(query):
+            yield rate_date, currency, rate
+
+
+class RateTableRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def save_month_tables(self, year: int, month: int, tables: dict[date, str], fetched_at: datetime) -> None:
+        if tables:
+            tables_query = (
+                insert(RateTable)
+                .values([{"table_date": table_date, "table_id": table_id} for table_date, table_id in tables.items()])
+                .on_conflict_do_nothing(index_elements=[RateTable.table_date])
+            )
+            await self.session.execute(tables_query)
+
+        month_query = insert(RateTableMonth).values(year=year, month=month, fetched_at=fetched_at)
+        month_query = month_query.on_conflict_do_update(
+            index_elements=[RateTableMonth.year, RateTableMonth.month], set_={"fetched_at": fetched_at}
+        )
+        await self.session.execute(month_query)
+        await self.session.commit()
+
+    async def get_month_tables(self, year: int, month: int) -> tuple[dict[date, str], datetime]:
+        month_query = select(RateTableMonth.fetched_at).where(
+            and_(RateTableMonth.year == year, RateTableMonth.month == month)
+        )
+        fetched_at = (await self.session.execute(month_query)).scalar_one_or_none()
+        if fetched_at is None:
+            raise MonthTablesRecordDoesNotExist()
+
+        first_day = date(year, month, 1)
+        next_month_first_day = date(year + month // 12, month % 12 + 1, 1)
+        tables_query = select(RateTable.table_date, RateTable.table_id).where(
+            and_(RateTable.table_date >= first_day, RateTable.table_date < next_month_first_day)
+        )
+        tables = dict((await self.session.execute(tables_query)).all())
+        return tables, fetched_at
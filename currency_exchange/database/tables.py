@@ -1,15 +1,36 @@
-from datetime import date
+from datetime import date, datetime
 from decimal import Decimal
 from typing import Optional
 
-from sqlalchemy import Column
-from sqlalchemy import Enum as EnumType
+from sqlalchemy import Column, Index
 from sqlmodel import Field, SQLModel
 
+from currency_exchange.database.types import CurrencyCode, ScaledDecimal
 from currency_exchange.enums import Currency
 
 
 class ExchangeRate(SQLModel, table=True):
+    # covering index allows index-only scans of rate lookups, without visiting the table heap, ordered by currency so
+    # rates of a currency in a range of days are contiguous, the small BRIN index serves scans of all currencies in a
+    # range of days, rows are inserted roughly in order of days
+    __table_args__ = (
+        Index("ix_exchangerate_lookup", "currency", "rate_date", postgresql_include=["rate", "fetched_at"]),
+        Index("ix_exchangerate_rate_date_brin", "rate_date", postgresql_using="brin"),
+    )
+
     rate_date: date = Field(primary_key=True)
-    currency: Currency = Field(primary_key=True, sa_column=Column(EnumType(Currency)))
-    rate: Optional[Decimal]
+    currency: Currency = Field(sa_column=Column(CurrencyCode(), primary_key=True))
+    rate: Optional[Decimal] = Field(sa_column=Column(ScaledDecimal(), nullable=True))
+    # null rates fetched before the day ended are valid only for a while, the table may get published later
+    fetched_at: datetime
+
+
+class RateTable(SQLModel, table=True):
+    table_date: date = Field(primary_key=True)
+    table_id: str
+
+
+class RateTableMonth(SQLModel, table=True):
+    year: int = Field(primary_key=True)
+    month: int = Field(primary_key=True)
+    fetched_at: datetime
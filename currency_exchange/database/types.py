@@ -0,0 +1,44 @@
+"""Compact column types, values are stored as small integers which are cheaper to compare, index and decode than
+postgres enums and numerics."""
+from decimal import Decimal
+from typing import Any, Optional
+
+from sqlalchemy import BigInteger, SmallInteger
+from sqlalchemy.types import TypeDecorator
+
+from currency_exchange.enums import CURRENCY_NUMERIC_CODES, Currency
+
+# NBP rates per unit have at most 8 decimal digits (4 digits of rates quoted per 10 000 units)
+RATE_SCALE = 8
+
+_CURRENCIES_BY_CODE = {code: currency for currency, code in CURRENCY_NUMERIC_CODES.items()}
+
+
+class CurrencyCode(TypeDecorator):
+    """Currency stored as its ISO 4217 numeric code in a smallint, new currencies don't need a schema migration."""
+
+    impl = SmallInteger
+    cache_ok = True
+
+    def process_bind_param(self, value: Optional[Currency], dialect: Any) -> Optional[int]:
+        return None if value is None else CURRENCY_NUMERIC_CODES[Currency(value)]
+
+    def process_result_value(self, value: Optional[int], dialect: Any) -> Optional[Currency]:
+        return None if value is None else _CURRENCIES_BY_CODE[value]
+
+
+class ScaledDecimal(TypeDecorator):
+    """Decimal stored as a bigint scaled by 10**scale, digits beyond the scale are rounded half to even."""
+
+    impl = BigInteger
+    cache_ok = True
+
+    def __init__(self, scale: int = RATE_SCALE):
+        super().__init__()
+        self.scale = scale
+
+    def process_bind_param(self, value: Optional[Decimal], dialect: Any) -> Optional[int]:
+        return None if value is None else int(Decimal(value).scaleb(self.scale).to_integral_value())
+
+    def process_result_value(self, value: Optional[int], dialect: Any) -> Optional[Decimal]:
+        return None if value is None else Decimal(value).scaleb(-self.scale)
@@ -1,32 +1,245 @@
-from fastapi import Depends
-from sqlalchemy.ext.asyncio import create_async_engine
+from datetime import timedelta
+from functools import lru_cache, partial
+from typing import Optional
+
+import httpx
+from fastapi import Depends, Request
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from currency_exchange.config import AppConfig
-from currency_exchange.database.repositories import ExchangeRateRepository
+from currency_exchange.database.repositories import (
+    ExchangeRateRepository,
+    RateTableRepository,
+)
+from currency_exchange.metrics import Metrics
+from currency_exchange.services.circuit_breaker import CircuitBreaker
 from currency_exchange.services.currency_exchange import CurrencyExchangeService
+from currency_exchange.services.exchange_rate_cache import ExchangeRateCache
 from currency_exchange.services.nbp_api import NBPApiService
+from currency_exchange.services.nbp_parsers import get_parser
+from currency_exchange.services.rate_snapshot import RateSnapshot
+from currency_exchange.services.rate_sources import (
+    ArchiveRateSource,
+    HedgedRateSource,
+    JsonApiRateSource,
+)
+from currency_exchange.services.rate_table_index import (
+    MonthTablesCache,
+    RateTableIndexService,
+)
+from currency_exchange.services.shared_cache import (
+    SharedCache,
+    create_shared_cache_backend,
+)
+from currency_exchange.services.table_prefetch import (
+    AdvisoryLockLeaderElection,
+    TablePrefetcher,
+)
+from currency_exchange.services.warmup import Warmup
+
+
+def create_db_engine(config: AppConfig) -> AsyncEngine:
+    connect_args = {"prepared_statement_cache_size": config.db_prepared_statement_cache_size}
+    if config.db_statement_timeout:
+        connect_args["server_settings"] = {"statement_timeout": str(config.db_statement_timeout)}
+    return create_async_engine(
+        config.database_url,
+        echo=config.db_echo,
+        future=True,
+        pool_size=config.db_pool_size,
+        max_overflow=config.db_max_overflow,
+        pool_recycle=config.db_pool_recycle,
+        connect_args=connect_args,
+    )
+
+
+app_config = AppConfig()
+exchange_rate_cache = ExchangeRateCache(
+    max_size=app_config.rate_cache_size, negative_ttl=app_config.unavailable_rate_ttl
+)
+month_tables_cache = MonthTablesCache()
+metrics = Metrics()
+if app_config.metrics_enabled:
+    metrics.enable()
+
+
+@lru_cache(maxsize=None)
+def get_db_engine() -> AsyncEngine:
+    """Engine shared by the application, created on first use (in application startup) rather than on import, which
+    loads the database driver."""
+    return create_db_engine(app_config)
+
+
+@lru_cache(maxsize=None)
+def get_async_session_factory() -> sessionmaker:
+    return sessionmaker(bind=get_db_engine(), class_=AsyncSession, expire_on_commit=False)
+
+
+def create_exchange_rate_repository(config: AppConfig, session: AsyncSession) -> ExchangeRateRepository:
+    return ExchangeRateRepository(session, unavailable_rate_ttl=timedelta(seconds=config.unavailable_rate_ttl))
+
+
+def create_nbp_api_service(config: AppConfig) -> NBPApiService:
+    """Create NBP api service with pooled http client, it should be shared by the application and closed on exit."""
+    client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=config.nbp_max_connections,
+            max_keepalive_connections=config.nbp_max_keepalive_connections,
+            keepalive_expiry=config.nbp_keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(config.nbp_timeout, connect=config.nbp_connect_timeout),
+    )
+    return NBPApiService(
+        client,
+        retries=config.nbp_retries,
+        retry_backoff=config.nbp_retry_backoff,
+        parser=get_parser(config.nbp_parser),
+        parse_in_thread_threshold=config.nbp_parse_in_thread_threshold,
+        metrics=metrics,
+    )
+
+
+def create_rate_source(
+    config: AppConfig, nbp_api_service: NBPApiService, shared_cache: Optional[SharedCache] = None
+) -> Optional[HedgedRateSource]:
+    """Create upstream of rates from configured sources, its latency and circuit state are shared by all requests."""
+    if not config.nbp_sources:
+        return None
+    sources = []
+    for name in config.nbp_sources:
+        if name == ArchiveRateSource.name:
+            sources.append(
+                ArchiveRateSource(
+                    get_async_session_factory(),
+                    nbp_api_service,
+                    month_tables_cache,
+                    current_month_ttl=timedelta(seconds=config.current_month_tables_ttl),
+                    shared_cache=shared_cache,
+                )
+            )
+        elif name == JsonApiRateSource.name:
+            sources.append(JsonApiRateSource(nbp_api_service))
+        else:
+            raise ValueError(f"Unknown NBP rate source '{name}', available sources: archive, api.")
+    return HedgedRateSource(
+        sources,
+        hedge_percentile=config.nbp_hedge_percentile,
+        hedge_delay=config.nbp_hedge_delay,
+        breaker_factory=lambda: CircuitBreaker(
+            failure_rate=config.nbp_breaker_failure_rate,
+            window=config.nbp_breaker_window,
+            min_calls=config.nbp_breaker_min_calls,
+            reset_timeout=config.nbp_breaker_reset_timeout,
+        ),
+        unavailable_recheck_window=timedelta(seconds=config.current_month_tables_ttl),
+    )
+
+
+def create_shared_cache(config: AppConfig) -> Optional[SharedCache]:
+    """Create cache shared by workers if configured, it should be shared by the application and closed on exit."""
+    if config.shared_cache_url is None:
+        return None
+    return SharedCache(
+        create_shared_cache_backend(config.shared_cache_url),
+        negative_ttl=config.unavailable_rate_ttl,
+        lock_timeout=config.shared_cache_lock_timeout,
+    )
 
-async_engine = create_async_engine(AppConfig().database_url, echo=True, future=True)
+
+def create_table_prefetcher(
+    config: AppConfig, nbp_api_service: NBPApiService, shared_cache: Optional[SharedCache] = None
+) -> TablePrefetcher:
+    return TablePrefetcher(
+        get_async_session_factory(),
+        partial(create_exchange_rate_repository, config),
+        nbp_api_service,
+        exchange_rate_cache,
+        AdvisoryLockLeaderElection(get_db_engine()),
+        shared_cache=shared_cache,
+        start=config.prefetch_start,
+        deadline=config.prefetch_deadline,
+        poll_interval=config.prefetch_poll_interval,
+    )
+
+
+def create_warmup(config: AppConfig, nbp_api_service: NBPApiService) -> Warmup:
+    return Warmup(
+        get_async_session_factory(),
+        partial(create_exchange_rate_repository, config),
+        nbp_api_service.parser,
+        exchange_rate_cache,
+        rate_days=config.warmup_rate_days,
+        retry_interval=config.warmup_retry_interval,
+        load_parser=config.warmup_load_parser,
+    )
 
 
 async def get_async_db_session() -> AsyncSession:
-    async_session = sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
-    async with async_session() as session:
+    session_factory = get_async_session_factory()
+    async with session_factory() as session:
         yield session
 
 
 async def get_exchange_rate_repository(session: AsyncSession = Depends(get_async_db_session)) -> ExchangeRateRepository:
-    return ExchangeRateRepository(session)
+    return create_exchange_rate_repository(app_config, session)
+
+
+async def get_rate_table_repository(session: AsyncSession = Depends(get_async_db_session)) -> RateTableRepository:
+    return RateTableRepository(session)
+
+
+async def get_nbp_api_service(request: Request) -> NBPApiService:
+    return request.app.state.nbp_api_service
+
 
+async def get_shared_cache(request: Request) -> Optional[SharedCache]:
+    return request.app.state.shared_cache
 
-async def get_nbp_api_service() -> NBPApiService:
-    return NBPApiService()
+
+async def get_rate_source(request: Request) -> Optional[HedgedRateSource]:
+    return request.app.state.rate_source
+
+
+async def get_warmup(request: Request) -> Optional[Warmup]:
+    return request.app.state.warmup
+
+
+async def get_rate_snapshot(request: Request) -> Optional[RateSnapshot]:
+    return request.app.state.rate_snapshot
+
+
+async def get_rate_table_index_service(
+    rate_table_repository: RateTableRepository = Depends(get_rate_table_repository),
+    nbp_api_service: NBPApiService = Depends(get_nbp_api_service),
+    shared_cache: Optional[SharedCache] = Depends(get_shared_cache),
+) -> RateTableIndexService:
+    return RateTableIndexService(
+        rate_table_repository,
+        nbp_api_service,
+        month_tables_cache,
+        current_month_ttl=timedelta(seconds=app_config.current_month_tables_ttl),
+        shared_cache=shared_cache,
+    )
 
 
 async def get_currency_exchange_service(
     exchange_rate_repository: ExchangeRateRepository = Depends(get_exchange_rate_repository),
     nbp_api_service: NBPApiService = Depends(get_nbp_api_service),
+    rate_table_index_service: RateTableIndexService = Depends(get_rate_table_index_service),
+    shared_cache: Optional[SharedCache] = Depends(get_shared_cache),
+    rate_source: Optional[HedgedRateSource] = Depends(get_rate_source),
+    rate_snapshot: Optional[RateSnapshot] = Depends(get_rate_snapshot),
 ) -> CurrencyExchangeService:
-    return CurrencyExchangeService(exchange_rate_repository, nbp_api_service)
+    return CurrencyExchangeService(
+        exchange_rate_repository,
+        nbp_api_service,
+        rate_table_index_service,
+        exchange_rate_cache,
+        last_available_rate=app_config.last_available_rate,
+        shared_cache=shared_cache,
+        metrics=metrics,
+        rate_snapshot=rate_snapshot,
+        rate_source=rate_source,
+    )
@@ -1,16 +1,33 @@
-from datetime import datetime
+from datetime import date, datetime
 from http import HTTPStatus
+from typing import AsyncIterator, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel, Field, root_validator
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError, conlist, validator
+from starlette.types import Receive, Scope, Send
 
-from currency_exchange.dependencies import get_currency_exchange_service
+from currency_exchange.dependencies import app_config, get_currency_exchange_service
+from currency_exchange.endpoints.http_cache import (
+    cache_headers,
+    etag_matches,
+    is_historical,
+    make_etag,
+    not_modified_response,
+)
 from currency_exchange.enums import Currency
 from currency_exchange.exceptions import ExchangeRateUnavailable
-from currency_exchange.services.currency_exchange import CurrencyExchangeService
+from currency_exchange.services.currency_exchange import (
+    CurrencyExchangeService,
+    ExchangeOrder,
+    ExchangeResult,
+)
 
 router = APIRouter()
 
+EXCHANGE_RATE_UNAVAILABLE_DETAIL = "Exchange rate unavailable for requested day."
+INVALID_EXCHANGE_REQUEST_DETAIL = "Invalid exchange request."
+
 
 class CurrencyExchangeRequest(BaseModel):
     exchange_date: str = Field(regex=r"\d{4}-\d{2}-\d{2}")
@@ -18,15 +35,40 @@ class CurrencyExchangeRequest(BaseModel):
     out_currency: Currency
     amount: float
 
-    @root_validator()
-    def validate_pln_in_or_out(cls, values: dict):
-        if Currency.PLN not in {values["in_currency"], values["out_currency"]}:
-            raise ValueError(f"{values}One of 'in_currency', 'out_currency' has to be PLN.")
-        return values
+    @validator("exchange_date")
+    def exchange_date_exists(cls, value: str) -> str:  # pylint: disable=no-self-argument
+        # the regex lets through days which don't exist, e.g. 2010-13-45, they fail validation here instead of parsing
+        datetime.strptime(value, "%Y-%m-%d")
+        return value
+
+    def parsed_exchange_date(self) -> date:
+        return datetime.strptime(self.exchange_date, "%Y-%m-%d").date()
+
+    def to_exchange_order(self) -> ExchangeOrder:
+        return ExchangeOrder(
+            amount=self.amount,
+            in_currency=self.in_currency,
+            out_currency=self.out_currency,
+            exchange_date=self.parsed_exchange_date(),
+        )
 
 
 class CurrencyExchangeResponse(BaseModel):
     amount: float
+    # units of out currency per one unit of in currency
+    rate: float
+
+
+class CurrencyExchangeBatchItemResponse(BaseModel):
+    amount: Optional[float]
+    rate: Optional[float]
+    error: Optional[str]
+
+    @classmethod
+    def from_result(cls, result: Optional[ExchangeResult]) -> "CurrencyExchangeBatchItemResponse":
+        if result is None:
+            return cls(error=EXCHANGE_RATE_UNAVAILABLE_DETAIL)
+        return cls(amount=result.amount, rate=result.rate)
 
 
 @router.post("/exchange", response_model=CurrencyExchangeResponse, status_code=HTTPStatus.OK)
@@ -34,11 +76,147 @@ async def exchange(
     data: CurrencyExchangeRequest, service: CurrencyExchangeService = Depends(get_currency_exchange_service)
 ) -> CurrencyExchangeResponse:
 
-    exchange_date = datetime.strptime(data.exchange_date, "%Y-%m-%d").date()
+    exchange_date = data.parsed_exchange_date()
     try:
         result = await service.exchange(amount=data.amount, in_currency=data.in_currency, out_currency=data.out_currency, exchange_date=exchange_date)
     except ExchangeRateUnavailable as err:
         raise HTTPException(
-            status_code=HTTPStatus.NOT_FOUND, detail="Exchange rate unavailable for requested day."
+            status_code=HTTPStatus.NOT_FOUND, detail=EXCHANGE_RATE_UNAVAILABLE_DETAIL
         ) from err
-    return CurrencyExchangeResponse(amount=result)
+    return CurrencyExchangeResponse(amount=result.amount, rate=result.rate)
+
+
+@router.get(
+    "/exchange",
+    response_model=CurrencyExchangeResponse,
+    status_code=HTTPStatus.OK,
+    responses={HTTPStatus.NOT_MODIFIED.value: {"description": "Not modified"}},
+)
+async def exchange_get(
+    exchange_date: date,
+    in_currency: Currency,
+    out_currency: Currency,
+    amount: float,
+    if_none_match: Optional[str] = Header(default=None),
+    service: CurrencyExchangeService = Depends(get_currency_exchange_service),
+) -> Response:
+    """Cacheable variant of `POST /exchange`, responses for past days are immutable.
+
+    Etag of past days depends on the request only, so conditional requests are answered without resolving the rate.
+    """
+    etag = make_etag("exchange", exchange_date, in_currency.value, out_currency.value, repr(amount))
+    if app_config.last_available_rate:
+        etag = make_etag(etag, "last_available_rate")
+    historical = is_historical(exchange_date)
+    if historical and etag_matches(if_none_match, etag):
+        return not_modified_response(etag, exchange_date)
+
+    try:
+        result = await service.exchange(
+            amount=amount, in_currency=in_currency, out_currency=out_currency, exchange_date=exchange_date
+        )
+    except ExchangeRateUnavailable as err:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=EXCHANGE_RATE_UNAVAILABLE_DETAIL) from err
+
+    if not historical:
+        # today's rate may be still unpublished, so the etag depends on the rate
+        etag = make_etag(etag, result.rate)
+        if etag_matches(if_none_match, etag):
+            return not_modified_response(etag, exchange_date)
+    response = CurrencyExchangeResponse(amount=result.amount, rate=result.rate)
+    return JSONResponse(response.dict(), headers=cache_headers(etag, exchange_date))
+
+
+@router.post("/exchange/batch", response_model=list[CurrencyExchangeBatchItemResponse], status_code=HTTPStatus.OK)
+async def exchange_batch(
+    data: conlist(CurrencyExchangeRequest, min_items=1, max_items=10_000),
+    service: CurrencyExchangeService = Depends(get_currency_exchange_service),
+) -> list[CurrencyExchangeBatchItemResponse]:
+    results = await service.exchange_many([item.to_exchange_order() for item in data])
+    return [CurrencyExchangeBatchItemResponse.from_result(result) for result in results]
+
+
+class RequestStreamingResponse(StreamingResponse):
+    """Streaming response which content is produced while the request body is still being read.
+
+    Unlike `StreamingResponse` it doesn't listen for client disconnect, as it would consume request body messages.
+    Disconnect is detected by the request stream instead.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+async def _iter_ndjson_lines(stream: AsyncIterator[bytes], max_line_length: int) -> AsyncIterator[Optional[bytes]]:
+    """Split byte stream into non-empty lines, lines longer than `max_line_length` are discarded and yield `None`."""
+    buffer = b""
+    discarding = False
+    async for chunk in stream:
+        *lines, rest = (buffer + chunk).split(b"\n")
+        for line in lines:
+            if discarding:
+                # end of a line which was already discarded
+                discarding = False
+            elif len(line) > max_line_length:
+                yield None
+            elif line.strip():
+                yield line
+        buffer = rest
+        if len(buffer) > max_line_length:
+            if not discarding:
+                yield None
+            buffer = b""
+            discarding = True
+    if buffer.strip() and not discarding:
+        yield buffer
+
+
+async def _exchange_ndjson(
+    lines: AsyncIterator[Optional[bytes]], service: CurrencyExchangeService, chunk_size: int
+) -> AsyncIterator[bytes]:
+    chunk = []
+    async for line in lines:
+        chunk.append(line)
+        if len(chunk) >= chunk_size:
+            yield await _exchange_ndjson_chunk(chunk, service)
+            chunk = []
+    if chunk:
+        yield await _exchange_ndjson_chunk(chunk, service)
+
+
+async def _exchange_ndjson_chunk(lines: list[Optional[bytes]], service: CurrencyExchangeService) -> bytes:
+    orders = {}
+    for index, line in enumerate(lines):
+        if line is None:
+            continue
+        try:
+            orders[index] = CurrencyExchangeRequest.parse_raw(line).to_exchange_order()
+        except ValidationError:
+            continue
+    results = dict(zip(orders, await service.exchange_many(list(orders.values()))))
+
+    response_items = []
+    for index in range(len(lines)):
+        if index in results:
+            response_item = CurrencyExchangeBatchItemResponse.from_result(results[index])
+        else:
+            response_item = CurrencyExchangeBatchItemResponse(error=INVALID_EXCHANGE_REQUEST_DETAIL)
+        response_items.append(response_item.json() + "\n")
+    return "".join(response_items).encode()
+
+
+@router.post("/exchange/stream", response_class=RequestStreamingResponse, status_code=HTTPStatus.OK)
+async def exchange_stream(
+    request: Request, service: CurrencyExchangeService = Depends(get_currency_exchange_service)
+) -> RequestStreamingResponse:
+    """Exchange NDJSON stream of exchange requests, responds with NDJSON stream of results in the same order.
+
+    Request body is consumed in chunks of `stream_chunk_size` lines as the response is sent, so memory usage doesn't
+    depend on body size and slow clients throttle reading of the request.
+    """
+    lines = _iter_ndjson_lines(request.stream(), app_config.stream_max_line_length)
+    return RequestStreamingResponse(
+        _exchange_ndjson(lines, service, app_config.stream_chunk_size), media_type="application/x-ndjson"
+    )
@@ -0,0 +1,19 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends
+from pydantic import BaseModel
+
+from currency_exchange.dependencies import get_warmup
+from currency_exchange.services.warmup import Warmup
+
+router = APIRouter()
+
+
+class ReadinessResponse(BaseModel):
+    # "cold" until the worker warmed up in the background, it serves requests either way, only slower when cold
+    status: str
+
+
+@router.get("/ready", response_model=ReadinessResponse, include_in_schema=False)
+async def get_ready(warmup: Optional[Warmup] = Depends(get_warmup)) -> ReadinessResponse:
+    return ReadinessResponse(status="warm" if warmup is not None and warmup.warm else "cold")
@@ -0,0 +1,47 @@
+import hashlib
+from datetime import date, datetime, time, timezone
+from email.utils import format_datetime
+from http import HTTPStatus
+from typing import Any, Optional
+
+from fastapi import Response
+
+from currency_exchange.dependencies import app_config
+
+# bump when representation of cached responses changes, so clients don't keep stale ones
+_ETAG_VERSION = 1
+
+
+def is_historical(rate_date: date) -> bool:
+    """Rates of past days are published and never change, today's table may be still not published."""
+    return rate_date < date.today()
+
+
+def make_etag(*parts: Any) -> str:
+    key = "|".join(str(part) for part in (_ETAG_VERSION, *parts))
+    return f'"{hashlib.sha1(key.encode()).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check `If-None-Match` request header against the etag, with weak comparison as required for GET requests."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def cache_headers(etag: str, last_modified: date) -> dict[str, str]:
+    if is_historical(last_modified):
+        cache_control = f"public, max-age={app_config.http_cache_max_age}, immutable"
+    else:
+        cache_control = f"public, max-age={app_config.http_cache_today_max_age}"
+    return {
+        "ETag": etag,
+        "Last-Modified": format_datetime(datetime.combine(last_modified, time(), timezone.utc), usegmt=True),
+        "Cache-Control": cache_control,
+    }
+
+
+def not_modified_response(etag: str, last_modified: date) -> Response:
+    return Response(status_code=HTTPStatus.NOT_MODIFIED, headers=cache_headers(etag, last_modified))
@@ -0,0 +1,10 @@
+from fastapi import APIRouter, Response
+
+from currency_exchange.dependencies import metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics() -> Response:
+    return Response(metrics.generate_latest(), media_type=metrics.content_type)
@@ -0,0 +1,133 @@
+from datetime import date
+from http import HTTPStatus
+from typing import AsyncIterator, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+
+from currency_exchange.dependencies import app_config, get_currency_exchange_service
+from currency_exchange.endpoints.exchange import EXCHANGE_RATE_UNAVAILABLE_DETAIL
+from currency_exchange.endpoints.http_cache import (
+    cache_headers,
+    etag_matches,
+    is_historical,
+    make_etag,
+    not_modified_response,
+)
+from currency_exchange.enums import Currency
+from currency_exchange.services.currency_exchange import (
+    CurrencyExchangeService,
+    RatePoint,
+)
+
+router = APIRouter()
+
+PLN_RATES_DETAIL = "Rates are quoted in PLN, choose a foreign currency."
+INVALID_DATE_RANGE_DETAIL = "Invalid date range."
+RATE_NOT_FETCHED_DETAIL = "Exchange rate couldn't be fetched from NBP, try again later."
+# responses with rates not fetched from NBP are complete once NBP responds again
+UNRESOLVED_CACHE_HEADERS = {"Cache-Control": "no-cache"}
+
+
+class RateResponse(BaseModel):
+    rate_date: date
+    # PLN per one unit of the currency
+    rate: Optional[float]
+    table_date: Optional[date]
+    # false if the rate couldn't be fetched from NBP, `null` rate then doesn't mean the day has no published table
+    resolved: bool
+
+    @classmethod
+    def from_point(cls, point: RatePoint) -> "RateResponse":
+        return cls(rate_date=point.rate_date, rate=point.rate, table_date=point.table_date, resolved=point.resolved)
+
+
+async def _rates_ndjson(points: list[RatePoint], chunk_size: int) -> AsyncIterator[bytes]:
+    for offset in range(0, len(points), chunk_size):
+        lines = [RateResponse.from_point(point).json() + "\n" for point in points[offset : offset + chunk_size]]
+        yield "".join(lines).encode()
+
+
+@router.get(
+    "/rates/{currency}",
+    response_class=StreamingResponse,
+    status_code=HTTPStatus.OK,
+    responses={HTTPStatus.NOT_MODIFIED.value: {"description": "Not modified"}},
+)
+async def rates(  # pylint: disable=too-many-arguments
+    currency: Currency,
+    date_from: date = Query(alias="from"),
+    date_to: date = Query(alias="to"),
+    fallback: bool = False,
+    if_none_match: Optional[str] = Header(default=None),
+    service: CurrencyExchangeService = Depends(get_currency_exchange_service),
+) -> Response:
+    """Stream NDJSON time series of daily rates of the currency in range `from` - `to` (inclusive, up to today).
+
+    With `fallback` weekends and holidays get the last published rate, `table_date` tells which table it comes from.
+    Series of past days are immutable and cacheable, unless rates of some days couldn't be fetched from NBP.
+    """
+    if currency == Currency.PLN:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=PLN_RATES_DETAIL)
+    if date_from > date_to or (date_to - date_from).days >= app_config.rates_max_range_days:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=INVALID_DATE_RANGE_DETAIL)
+
+    historical = is_historical(date_to)
+    etag = make_etag("rates", currency.value, date_from, date_to, fallback)
+    if historical and etag_matches(if_none_match, etag):
+        return not_modified_response(etag, date_to)
+
+    # the range is resolved before the response starts, so the cache policy reflects whether all rates were fetched and
+    # a failure in the middle of the range fails the response instead of truncating it
+    points = [point async for point in service.get_rate_series(currency, date_from, date_to, fallback=fallback)]
+    headers = None
+    if historical:
+        if all(point.resolved for point in points):
+            headers = cache_headers(etag, date_to)
+        else:
+            headers = UNRESOLVED_CACHE_HEADERS
+    return StreamingResponse(
+        _rates_ndjson(points, app_config.stream_chunk_size), media_type="application/x-ndjson", headers=headers
+    )
+
+
+@router.get(
+    "/rates/{currency}/{rate_date}",
+    response_model=RateResponse,
+    status_code=HTTPStatus.OK,
+    responses={HTTPStatus.NOT_MODIFIED.value: {"description": "Not modified"}},
+)
+async def rate(
+    currency: Currency,
+    rate_date: date,
+    fallback: bool = False,
+    if_none_match: Optional[str] = Header(default=None),
+    service: CurrencyExchangeService = Depends(get_currency_exchange_service),
+) -> Response:
+    """Rate of the currency for a single day, PLN per one unit. Rates of past days are immutable and cacheable."""
+    if currency == Currency.PLN:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=PLN_RATES_DETAIL)
+
+    etag = make_etag("rate", currency.value, rate_date, fallback)
+    historical = is_historical(rate_date)
+    if historical and etag_matches(if_none_match, etag):
+        return not_modified_response(etag, rate_date)
+
+    point = None
+    async for point in service.get_rate_series(currency, rate_date, rate_date, fallback=fallback):
+        pass
+    if point is not None and not point.resolved:
+        raise HTTPException(
+            status_code=HTTPStatus.SERVICE_UNAVAILABLE, detail=RATE_NOT_FETCHED_DETAIL, headers=UNRESOLVED_CACHE_HEADERS
+        )
+    if point is None or point.rate is None:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=EXCHANGE_RATE_UNAVAILABLE_DETAIL)
+
+    if not historical:
+        # today's table may be still unpublished, so the etag depends on the rate
+        etag = make_etag(etag, point.rate, point.table_date)
+        if etag_matches(if_none_match, etag):
+            return not_modified_response(etag, rate_date)
+    return JSONResponse(jsonable_encoder(RateResponse.from_point(point)), headers=cache_headers(etag, rate_date))
@@ -7,3 +7,16 @@ class Currency(str, Enum):
     CHF = "CHF"
     JPY = "JPY"
     PLN = "PLN"
+
+
+# currencies with exchange rates published by NBP, rates are expressed in PLN
+FOREIGN_CURRENCIES = tuple(currency for currency in Currency if currency != Currency.PLN)
+
+# ISO 4217 numeric codes, currencies are stored in the database by them
+CURRENCY_NUMERIC_CODES = {
+    Currency.USD: 840,
+    Currency.EUR: 978,
+    Currency.CHF: 756,
+    Currency.JPY: 392,
+    Currency.PLN: 985,
+}
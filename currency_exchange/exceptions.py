@@ -1,3 +1,6 @@
+import httpx
+
+
 class BaseCustomException(Exception):
     """Base Exception for other custom exceptions."""
 
@@ -8,3 +11,22 @@ class ExchangeRateUnavailable(BaseCustomException):
 
 class ExchangeRateRecordDoesNotExist(BaseCustomException):
     """Exception raised when exchange rate is not available in the database."""
+
+
+class ExchangeRateNotCached(BaseCustomException):
+    """Exception raised when exchange rate is not present in the in-memory cache."""
+
+
+class MonthTablesRecordDoesNotExist(BaseCustomException):
+    """Exception raised when NBP tables listing for some month is not available in the database."""
+
+
+class MonthTablesNotCached(BaseCustomException):
+    """Exception raised when NBP tables listing for some month is not present in the in-memory cache."""
+
+
+class UpstreamCircuitOpen(BaseCustomException, httpx.HTTPError):
+    """Exception raised instead of calling NBP while circuit breakers of all rate sources are open.
+
+    It is an `httpx.HTTPError`, so callers handle it like any failed NBP api call.
+    """
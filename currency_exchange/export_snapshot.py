@@ -0,0 +1,43 @@
+"""Export stored exchange rates into a snapshot file mapped by the application workers (see `RATE_SNAPSHOT_PATH`).
+
+Only rates which never change are exported, so the export can be rerun at any time, e.g. daily after a backfill.
+Running workers keep the previous snapshot until restarted.
+
+Usage: python -m currency_exchange.export_snapshot /var/lib/currency_exchange/rates.bin
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from currency_exchange.dependencies import (
+    app_config,
+    create_exchange_rate_repository,
+    get_async_session_factory,
+    get_db_engine,
+)
+from currency_exchange.services.rate_snapshot import write_rate_snapshot
+
+logger = logging.getLogger(__name__)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Export stored exchange rates into a snapshot file.")
+    parser.add_argument("path", help="snapshot file, replaced atomically")
+    return parser.parse_args()
+
+
+async def main(args: argparse.Namespace) -> int:
+    start = time.perf_counter()
+    session_factory = get_async_session_factory()
+    async with session_factory() as session:
+        rates = [rate async for rate in create_exchange_rate_repository(app_config, session).iter_final_rates()]
+    await get_db_engine().dispose()
+    exported = write_rate_snapshot(args.path, rates)
+    logger.info("Exported %d rates to %s in %.1fs", exported, args.path, time.perf_counter() - start)
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    raise SystemExit(asyncio.run(main(parse_args())))
@@ -0,0 +1,193 @@
+"""Prometheus metrics of the application, requires optional `prometheus_client` dependency.
+
+Metrics are collected only when enabled, otherwise stage timers are a shared no-op context manager and the request
+middleware isn't installed, so disabled metrics cost one attribute check per timed stage. `prometheus_client` is
+imported when metrics are enabled, a worker without metrics doesn't load it.
+"""
+# pylint: disable=import-outside-toplevel
+import time
+from contextlib import nullcontext
+from typing import Any, ContextManager, Iterator, Optional
+
+import httpx
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from currency_exchange.services.circuit_breaker import CLOSED, HALF_OPEN, OPEN
+from currency_exchange.services.exchange_rate_cache import ExchangeRateCache
+
+_NULL_TIMER = nullcontext()
+
+REQUEST_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STAGE_LATENCY_BUCKETS = (0.00001, 0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+
+class Metrics:
+    def __init__(self):
+        self.enabled = False
+        self.registry = None
+        self.db_engine: Optional[AsyncEngine] = None
+        self.http_client: Optional[httpx.AsyncClient] = None
+        self.rate_cache: Optional[ExchangeRateCache] = None
+        # `HedgedRateSource`, not imported as it depends on this module through `NBPApiService`
+        self.rate_source: Optional[Any] = None
+
+    def enable(self) -> None:
+        try:
+            import prometheus_client
+        except ImportError as exc:  # pragma: no cover
+            raise RuntimeError("Metrics require 'prometheus_client' package, install with 'metrics' extra.") from exc
+        self.registry = prometheus_client.CollectorRegistry()
+        self.request_latency = prometheus_client.Histogram(
+            "http_request_duration_seconds",
+            "Latency of HTTP requests by route template.",
+            ["method", "route", "status"],
+            buckets=REQUEST_LATENCY_BUCKETS,
+            registry=self.registry,
+        )
+        self.stage_latency = prometheus_client.Histogram(
+            "exchange_stage_duration_seconds",
+            "Latency of stages of exchange rate resolution.",
+            ["stage"],
+            buckets=STAGE_LATENCY_BUCKETS,
+            registry=self.registry,
+        )
+        self.registry.register(_ResourcesCollector(self))
+        self.enabled = True
+
+    def watch(
+        self,
+        db_engine: Optional[AsyncEngine] = None,
+        http_client: Optional[httpx.AsyncClient] = None,
+        rate_cache: Optional[ExchangeRateCache] = None,
+        rate_source: Optional[Any] = None,
+    ) -> None:
+        """Set resources which pool, cache and upstream statistics are reported on each scrape."""
+        if db_engine is not None:
+            self.db_engine = db_engine
+        if http_client is not None:
+            self.http_client = http_client
+        if rate_cache is not None:
+            self.rate_cache = rate_cache
+        if rate_source is not None:
+            self.rate_source = rate_source
+
+    def time_stage(self, stage: str) -> ContextManager[Any]:
+        if not self.enabled:
+            return _NULL_TIMER
+        return self.stage_latency.labels(stage).time()
+
+    def observe_request(self, method: str, route: str, status: int, duration: float) -> None:
+        self.request_latency.labels(method, route, str(status)).observe(duration)
+
+    def generate_latest(self) -> bytes:
+        import prometheus_client
+
+        return prometheus_client.generate_latest(self.registry)
+
+    @property
+    def content_type(self) -> str:
+        import prometheus_client
+
+        return prometheus_client.CONTENT_TYPE_LATEST
+
+
+def _http_pool_connections(client: httpx.AsyncClient) -> list:
+    # httpx doesn't expose pool statistics, connections are read from the underlying httpcore pool
+    return list(getattr(getattr(client._transport, "_pool", None), "connections", []))  # pylint: disable=W0212
+
+
+class _ResourcesCollector:
+    """Reports state of database and NBP http connection pools, of the rate cache and of NBP rate sources at scrape
+    time."""
+
+    def __init__(self, metrics: Metrics):
+        self.metrics = metrics
+
+    def collect(self) -> Iterator[Any]:
+        from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+        if self.metrics.db_engine is not None:
+            pool = self.metrics.db_engine.sync_engine.pool
+            yield GaugeMetricFamily("db_pool_size", "Configured size of database connection pool.", value=pool.size())
+            yield GaugeMetricFamily(
+                "db_pool_checked_out", "Database connections currently in use.", value=pool.checkedout()
+            )
+            yield GaugeMetricFamily(
+                "db_pool_overflow", "Database connections opened above pool size.", value=max(pool.overflow(), 0)
+            )
+        if self.metrics.http_client is not None:
+            connections = _http_pool_connections(self.metrics.http_client)
+            yield GaugeMetricFamily("nbp_http_pool_connections", "Open NBP http connections.", value=len(connections))
+            yield GaugeMetricFamily(
+                "nbp_http_pool_idle_connections",
+                "Idle NBP http connections.",
+                value=sum(connection.is_idle() for connection in connections),
+            )
+        if self.metrics.rate_cache is not None:
+            stats = self.metrics.rate_cache.stats()
+            yield GaugeMetricFamily("rate_cache_size", "Entries in in-memory rate cache.", value=stats["size"])
+            for name in ("hits", "misses", "evictions"):
+                yield CounterMetricFamily(f"rate_cache_{name}", f"Rate cache {name}.", value=stats[name])
+        if self.metrics.rate_source is not None:
+            yield from self._collect_rate_source(self.metrics.rate_source)
+
+    @staticmethod
+    def _collect_rate_source(rate_source: Any) -> Iterator[Any]:
+        from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+        calls = CounterMetricFamily(
+            "nbp_source_calls", "Calls of NBP rate sources by outcome.", labels=["source", "outcome"]
+        )
+        for (source, outcome), value in sorted(rate_source.counters.items()):
+            calls.add_metric([source, outcome], value)
+        yield calls
+        states = GaugeMetricFamily(
+            "nbp_circuit_state", "Current state of circuit of NBP rate source.", labels=["source", "state"]
+        )
+        transitions = CounterMetricFamily(
+            "nbp_circuit_transitions",
+            "Transitions of circuit of NBP rate source into state.",
+            labels=["source", "state"],
+        )
+        for source, breaker in rate_source.breakers.items():
+            current = breaker.state
+            for state in (CLOSED, OPEN, HALF_OPEN):
+                states.add_metric([source, state], int(state == current))
+                transitions.add_metric([source, state], breaker.transitions[state])
+        yield states
+        yield transitions
+
+
+class MetricsMiddleware:
+    """Observes latency of HTTP requests, labeled by route template to keep label cardinality bounded."""
+
+    def __init__(self, app: ASGIApp, metrics: Metrics):
+        self.app = app
+        self.metrics = metrics
+        self._routes: Optional[dict[Any, str]] = None
+
+    def _route(self, scope: Scope) -> str:
+        if self._routes is None:
+            self._routes = {route.endpoint: route.path for route in scope["app"].routes if hasattr(route, "endpoint")}
+        return self._routes.get(scope.get("endpoint"), "unmatched")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # router sets matched endpoint into the scope
+            self.metrics.observe_request(scope["method"], self._route(scope), status, time.perf_counter() - start)
@@ -0,0 +1,27 @@
+"""Exchange rate per unit
+
+Rates were stored as quoted in NBP tables, JPY is quoted per 100 units. Rates are now normalized to PLN per one unit.
+
+Revision ID: 3d8a6b0e2c17
+Revises: 9c2e4d1a6f30
+Create Date: 2026-10-18 23:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = "3d8a6b0e2c17"
+down_revision = "9c2e4d1a6f30"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("UPDATE exchangerate SET rate = rate * 0.01 WHERE currency = 'JPY' AND rate IS NOT NULL")
+
+
+def downgrade():
+    op.execute("UPDATE exchangerate SET rate = rate * 100 WHERE currency = 'JPY' AND rate IS NOT NULL")
@@ -0,0 +1,38 @@
+"""Rate table index
+
+Revision ID: 5b1f0c2d7a94
+Revises: e033ed3b820f
+Create Date: 2026-10-18 20:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = "5b1f0c2d7a94"
+down_revision = "e033ed3b820f"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "ratetable",
+        sa.Column("table_date", sa.Date(), nullable=False),
+        sa.Column("table_id", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.PrimaryKeyConstraint("table_date"),
+    )
+    op.create_table(
+        "ratetablemonth",
+        sa.Column("year", sa.Integer(), nullable=False),
+        sa.Column("month", sa.Integer(), nullable=False),
+        sa.Column("fetched_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("year", "month"),
+    )
+
+
+def downgrade():
+    op.drop_table("ratetablemonth")
+    op.drop_table("ratetable")
@@ -0,0 +1,37 @@
+"""Exchange rate fetched at
+
+Unavailable (null) rates are valid only for a while when they were fetched before the day ended, so the time of fetch is
+stored. Existing rows get the time of the migration. The covering index includes the column for index-only lookups.
+
+Revision ID: 7e4a2c9d1b58
+Revises: 3d8a6b0e2c17
+Create Date: 2026-10-19 10:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = "7e4a2c9d1b58"
+down_revision = "3d8a6b0e2c17"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "exchangerate", sa.Column("fetched_at", sa.DateTime(), nullable=False, server_default=sa.func.localtimestamp())
+    )
+    op.alter_column("exchangerate", "fetched_at", server_default=None)
+    op.drop_index("ix_exchangerate_lookup", table_name="exchangerate")
+    op.create_index(
+        "ix_exchangerate_lookup", "exchangerate", ["rate_date", "currency"], postgresql_include=["rate", "fetched_at"]
+    )
+
+
+def downgrade():
+    op.drop_index("ix_exchangerate_lookup", table_name="exchangerate")
+    op.create_index("ix_exchangerate_lookup", "exchangerate", ["rate_date", "currency"], postgresql_include=["rate"])
+    op.drop_column("exchangerate", "fetched_at")
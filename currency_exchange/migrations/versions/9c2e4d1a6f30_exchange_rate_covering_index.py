@@ -0,0 +1,25 @@
+"""Exchange rate covering index
+
+Revision ID: 9c2e4d1a6f30
+Revises: 5b1f0c2d7a94
+Create Date: 2026-10-18 21:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = "9c2e4d1a6f30"
+down_revision = "5b1f0c2d7a94"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_exchangerate_lookup", "exchangerate", ["rate_date", "currency"], postgresql_include=["rate"])
+
+
+def downgrade():
+    op.drop_index("ix_exchangerate_lookup", table_name="exchangerate")
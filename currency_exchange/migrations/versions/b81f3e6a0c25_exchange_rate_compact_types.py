@@ -0,0 +1,51 @@
+"""Exchange rate compact types
+
+Currency is stored as its ISO 4217 numeric code in a smallint instead of the postgres enum, and rate as a bigint scaled
+by 10**8 instead of an unbounded numeric. The covering lookup index is ordered by currency first, so rates of a currency
+in a range of days are read from a contiguous part of it.
+
+Revision ID: b81f3e6a0c25
+Revises: 7e4a2c9d1b58
+Create Date: 2026-10-19 16:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = "b81f3e6a0c25"
+down_revision = "7e4a2c9d1b58"
+branch_labels = None
+depends_on = None
+
+CURRENCY_CODES = {"USD": 840, "EUR": 978, "CHF": 756, "JPY": 392, "PLN": 985}
+
+
+def upgrade():
+    op.drop_index("ix_exchangerate_lookup", table_name="exchangerate")
+    codes = " ".join(f"WHEN '{currency}' THEN {code}" for currency, code in CURRENCY_CODES.items())
+    op.alter_column(
+        "exchangerate",
+        "currency",
+        type_=sa.SmallInteger(),
+        postgresql_using=f"CASE currency::text {codes} END",
+    )
+    op.alter_column("exchangerate", "rate", type_=sa.BigInteger(), postgresql_using="round(rate * 100000000)::bigint")
+    op.execute("DROP TYPE currency")
+    op.create_index(
+        "ix_exchangerate_lookup", "exchangerate", ["currency", "rate_date"], postgresql_include=["rate", "fetched_at"]
+    )
+
+
+def downgrade():
+    op.drop_index("ix_exchangerate_lookup", table_name="exchangerate")
+    currency_type = sa.Enum(*CURRENCY_CODES, name="currency")
+    currency_type.create(op.get_bind())
+    codes = " ".join(f"WHEN {code} THEN '{currency}'::currency" for currency, code in CURRENCY_CODES.items())
+    op.alter_column("exchangerate", "currency", type_=currency_type, postgresql_using=f"CASE currency {codes} END")
+    op.alter_column("exchangerate", "rate", type_=sa.Numeric(), postgresql_using="round(rate / 100000000.0, 8)")
+    op.create_index(
+        "ix_exchangerate_lookup", "exchangerate", ["rate_date", "currency"], postgresql_include=["rate", "fetched_at"]
+    )
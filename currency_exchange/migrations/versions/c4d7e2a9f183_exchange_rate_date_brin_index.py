@@ -0,0 +1,29 @@
+"""Exchange rate date BRIN index
+
+Block range index on rate_date for scans of all currencies in a range of days, e.g. by the backfill and exports. Rows
+are inserted in order of days (backfill and daily fetches), so block ranges stay narrow, while the index takes a few
+pages instead of a btree over the whole table.
+
+Revision ID: c4d7e2a9f183
+Revises: b81f3e6a0c25
+Create Date: 2026-10-20 10:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = "c4d7e2a9f183"
+down_revision = "b81f3e6a0c25"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_exchangerate_rate_date_brin", "exchangerate", ["rate_date"], postgresql_using="brin")
+
+
+def downgrade():
+    op.drop_index("ix_exchangerate_rate_date_brin", table_name="exchangerate")
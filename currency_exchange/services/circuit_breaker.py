@@ -0,0 +1,98 @@
+import time
+from collections import Counter, deque
+from typing import Callable, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Stops calls to a failing upstream, so requests fast-fail instead of waiting for its timeouts.
+
+    Outcomes of the last `window` calls are kept, once at least `min_calls` of them are known and the share of failures
+    reaches `failure_rate` the circuit opens and calls aren't allowed. After `reset_timeout` seconds a single probe call
+    is allowed (half open), its success closes the circuit and its failure opens it again.
+    """
+
+    def __init__(
+        self,
+        failure_rate: float = 0.5,
+        window: int = 20,
+        min_calls: int = 10,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._outcomes: deque[bool] = deque(maxlen=window)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        # number of transitions into each state
+        self.transitions: Counter[str] = Counter()
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._transition(HALF_OPEN)
+        return self._state
+
+    def _transition(self, state: str) -> None:
+        self._state = state
+        self._probing = False
+        self.transitions[state] += 1
+        if state == OPEN:
+            self._opened_at = self._clock()
+        else:
+            self._outcomes.clear()
+
+    def allow_request(self) -> bool:
+        """Whether a call may be made now, in half open state only the first caller gets to probe."""
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        if self._state == HALF_OPEN:
+            self._transition(CLOSED)
+        elif self._state == CLOSED:
+            self._outcomes.append(True)
+
+    def record_failure(self) -> None:
+        if self._state == HALF_OPEN:
+            self._transition(OPEN)
+        elif self._state == CLOSED:
+            self._outcomes.append(False)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_calls and failures >= self.failure_rate * len(self._outcomes):
+                self._transition(OPEN)
+
+    def record_cancelled(self) -> None:
+        """Call was abandoned without an outcome, a cancelled probe lets the next caller probe."""
+        if self._state == HALF_OPEN:
+            self._probing = False
+
+
+class LatencyWindow:
+    """Latencies of the last `size` successful calls, for hedging on a percentile of recent latency."""
+
+    def __init__(self, size: int = 100, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._latencies: deque[float] = deque(maxlen=size)
+
+    def add(self, latency: float) -> None:
+        self._latencies.append(latency)
+
+    def percentile(self, percentile: float) -> Optional[float]:
+        """Latency below which `percentile` (0-1) of recent calls finished, `None` until there are enough samples."""
+        if len(self._latencies) < self.min_samples:
+            return None
+        latencies = sorted(self._latencies)
+        return latencies[min(int(percentile * len(latencies)), len(latencies) - 1)]
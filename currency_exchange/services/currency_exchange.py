@@ -1,46 +1,382 @@
-from datetime import date
+import asyncio
+from contextlib import AsyncExitStack
+from datetime import date, timedelta
 from decimal import Decimal
+from typing import AsyncIterator, NamedTuple, Optional, Sequence
 
 import httpx
 
 from currency_exchange.database.repositories import ExchangeRateRepository
-from currency_exchange.enums import Currency
+from currency_exchange.enums import FOREIGN_CURRENCIES, Currency
 from currency_exchange.exceptions import (
+    ExchangeRateNotCached,
     ExchangeRateRecordDoesNotExist,
     ExchangeRateUnavailable,
 )
+from currency_exchange.metrics import Metrics
+from currency_exchange.services.exchange_rate_cache import ExchangeRateCache, RateKey
 from currency_exchange.services.nbp_api import NBPApiService
+from currency_exchange.services.rate_snapshot import RateSnapshot
+from currency_exchange.services.rate_sources import RateSource
+from currency_exchange.services.rate_table_index import RateTableIndexService
+from currency_exchange.services.shared_cache import SharedCache
+
+
+class ExchangeOrder(NamedTuple):
+    amount: float
+    in_currency: Currency
+    out_currency: Currency
+    exchange_date: date
+
+
+class ExchangeResult(NamedTuple):
+    amount: float
+    # units of out currency per one unit of in currency
+    rate: Decimal
+
+
+class RatePoint(NamedTuple):
+    rate_date: date
+    # PLN per one unit of the currency, `None` if unavailable
+    rate: Optional[Decimal]
+    # date of the table the rate was published in, earlier than `rate_date` if the rate falls back to the last one
+    table_date: Optional[date]
+    # false if NBP fetch of the day failed, the rate is then unknown rather than unavailable, as well as rates of days
+    # which may fall back to it
+    resolved: bool = True
+
+
+def date_range(date_from: date, date_to: date) -> list[date]:
+    return [date_from + timedelta(days=days) for days in range((date_to - date_from).days + 1)]
 
 
 class CurrencyExchangeService:
-    def __init__(self, exchange_rate_repository: ExchangeRateRepository, nbp_api_service: NBPApiService):
+    # longest period without published table (e.g. Christmas and New Year), rates older than that aren't fallen back to
+    FALLBACK_PERIOD = timedelta(days=7)
+
+    def __init__(
+        self,
+        exchange_rate_repository: ExchangeRateRepository,
+        nbp_api_service: NBPApiService,
+        rate_table_index_service: RateTableIndexService,
+        exchange_rate_cache: Optional[ExchangeRateCache] = None,
+        concurrent_table_fetches: int = 10,
+        last_available_rate: bool = False,
+        shared_cache: Optional[SharedCache] = None,
+        metrics: Optional[Metrics] = None,
+        rate_snapshot: Optional[RateSnapshot] = None,
+        rate_source: Optional[RateSource] = None,
+    ):
         self.exchange_rate_repository = exchange_rate_repository
         self.nbp_api_service = nbp_api_service
+        self.rate_table_index_service = rate_table_index_service
+        self.exchange_rate_cache = exchange_rate_cache if exchange_rate_cache is not None else ExchangeRateCache()
+        self.concurrent_table_fetches = concurrent_table_fetches
+        # exchange with rates of the last table published on or before the exchange date (e.g. Friday's on weekend)
+        self.last_available_rate = last_available_rate
+        # optional tier between in-memory cache and database, shared by all workers
+        self.shared_cache = shared_cache
+        self.metrics = metrics if metrics is not None else Metrics()
+        # immutable rates shared by workers of the host, looked up before the in-memory cache
+        self.rate_snapshot = rate_snapshot
+        # upstream of missing rates, without it tables are looked up in NBP archive with `rate_table_index_service`
+        self.rate_source = rate_source
+
+    def _get_cached_rate(self, rate_date: date, currency: Currency) -> Optional[Decimal]:
+        if self.rate_snapshot is not None:
+            try:
+                return self.rate_snapshot.get(rate_date, currency)
+            except ExchangeRateNotCached:
+                pass
+        with self.metrics.time_stage("cache"):
+            return self.exchange_rate_cache.get(rate_date, currency)
 
     async def _get_exchange_rate(self, rate_date: date, currency: Currency) -> Decimal:
         try:
-            exchange_rate = await self.exchange_rate_repository.get_exchange_rate(rate_date, currency)
-            if exchange_rate.rate is None:
-                raise ExchangeRateUnavailable()
-            return exchange_rate.rate
+            rate = self._get_cached_rate(rate_date, currency)
+        except ExchangeRateNotCached:
+            rate = await self._load_exchange_rate(rate_date, currency)
+        if rate is None:
+            raise ExchangeRateUnavailable()
+        return rate
+
+    async def _get_shared_rates(self, keys: set[RateKey]) -> dict[RateKey, Optional[Decimal]]:
+        if self.shared_cache is None or not keys:
+            return {}
+        with self.metrics.time_stage("shared_cache"):
+            rates = await self.shared_cache.get_rates(keys)
+        for (rate_date, currency), rate in rates.items():
+            self.exchange_rate_cache.set(rate_date, currency, rate)
+        return rates
+
+    async def _set_shared_rates(self, rates: dict[RateKey, Optional[Decimal]]) -> None:
+        if self.shared_cache is not None and rates:
+            await self.shared_cache.set_rates(rates)
+
+    async def _load_exchange_rate(self, rate_date: date, currency: Currency) -> Optional[Decimal]:
+        shared_rates = await self._get_shared_rates({(rate_date, currency)})
+        if shared_rates:
+            return shared_rates[(rate_date, currency)]
+
+        try:
+            with self.metrics.time_stage("db"):
+                rate = await self.exchange_rate_repository.get_rate(rate_date, currency)
+            self.exchange_rate_cache.set(rate_date, currency, rate)
+            await self._set_shared_rates({(rate_date, currency): rate})
+            return rate
         except ExchangeRateRecordDoesNotExist:
+            pass
+
+        rates = await self.fetch_exchange_rates({rate_date})
+        try:
+            return rates[(rate_date, currency)]
+        except KeyError as err:
+            # api call failed and rate wasn't stored
+            raise ExchangeRateUnavailable() from err
+
+    async def _get_exchange_rates(self, keys: set[RateKey]) -> dict[RateKey, Optional[Decimal]]:
+        """Resolve rates of many (rate_date, currency) pairs with one database query and one NBP fetch per date.
+
+        Pairs that couldn't be resolved, because NBP api call failed, are omitted.
+        """
+        rates = {}
+        missing_keys = set()
+        for key in keys:
+            try:
+                rates[key] = self._get_cached_rate(*key)
+            except ExchangeRateNotCached:
+                missing_keys.add(key)
+        if not missing_keys:
+            return rates
+
+        shared_rates = await self._get_shared_rates(missing_keys)
+        rates.update(shared_rates)
+        missing_keys -= shared_rates.keys()
+        if not missing_keys:
+            return rates
+
+        with self.metrics.time_stage("db"):
+            stored_rates = await self.exchange_rate_repository.get_exchange_rates(missing_keys)
+        for (rate_date, currency), rate in stored_rates.items():
+            self.exchange_rate_cache.set(rate_date, currency, rate)
+        await self._set_shared_rates(stored_rates)
+        rates.update(stored_rates)
+
+        missing_keys -= stored_rates.keys()
+        if missing_keys:
+            fetched_rates = await self.fetch_exchange_rates({rate_date for rate_date, _ in missing_keys})
+            rates.update({key: fetched_rates[key] for key in missing_keys if key in fetched_rates})
+        return rates
+
+    async def fetch_exchange_rates(self, rate_dates: set[date]) -> dict[RateKey, Optional[Decimal]]:
+        """Fetch rates of all currencies from NBP tables for given dates and store them in database and cache.
+
+        Dates for which NBP api call failed are omitted and not stored. With shared cache the fills are serialized
+        between workers by a lock per date, dates filled by another worker in the meantime are taken from the cache.
+        """
+        if self.shared_cache is None:
+            return await self._fetch_exchange_rates(rate_dates)
+
+        async with AsyncExitStack() as stack:
+            # locks are taken in order of dates, so workers filling overlapping dates can't deadlock
+            for rate_date in sorted(rate_dates):
+                await stack.enter_async_context(self.shared_cache.fill_lock(f"rates:{rate_date.isoformat()}"))
+            rates = await self._get_shared_rates(
+                {(rate_date, currency) for rate_date in rate_dates for currency in FOREIGN_CURRENCIES}
+            )
+            filled_dates = {
+                rate_date
+                for rate_date in rate_dates
+                if all((rate_date, currency) in rates for currency in FOREIGN_CURRENCIES)
+            }
+            fetched_rates = await self._fetch_exchange_rates(rate_dates - filled_dates)
+            await self._set_shared_rates(fetched_rates)
+        rates.update(fetched_rates)
+        return rates
+
+    async def _fetch_rates_from_archive(self, rate_dates: set[date]) -> dict[RateKey, Optional[Decimal]]:
+        rates = {}
+        table_ids = {}
+        for rate_date in sorted(rate_dates):
             try:
-                rate = await self.nbp_api_service.get_exchange_rate(rate_date, currency)
+                table_ids[rate_date] = await self.rate_table_index_service.get_table_id(rate_date)
             except ExchangeRateUnavailable:
-                # if exchange rate is unavailable for specific date then insert null value to database
-                await self.exchange_rate_repository.insert_exchange_rate(rate_date, currency, None)
-                raise
-            except httpx.HTTPError as err:
-                # if api call failed raise exception, but don't save null value of the exchange rate
-                raise ExchangeRateUnavailable() from err
-            await self.exchange_rate_repository.insert_exchange_rate(rate_date, currency, rate)
-        return rate
+                # if exchange rate is unavailable for specific date then insert null values to database
+                rates.update({(rate_date, currency): None for currency in FOREIGN_CURRENCIES})
+            except httpx.HTTPError:
+                # if api call failed skip the date, but don't save null value of the exchange rate
+                continue
+
+        # tables are downloaded concurrently, but in chunks to not exhaust NBP api client connection pool
+        table_items = list(table_ids.items())
+        for offset in range(0, len(table_items), self.concurrent_table_fetches):
+            chunk = table_items[offset : offset + self.concurrent_table_fetches]
+            results = await asyncio.gather(
+                *(self.nbp_api_service.get_exchange_rates_from_table(table_id) for _, table_id in chunk),
+                return_exceptions=True,
+            )
+            for (rate_date, _), table_rates in zip(chunk, results):
+                if isinstance(table_rates, httpx.HTTPError):
+                    continue
+                if isinstance(table_rates, BaseException):
+                    raise table_rates
+                rates.update({(rate_date, currency): table_rates.get(currency) for currency in FOREIGN_CURRENCIES})
+        return rates
+
+    async def _fetch_rates_from_source(self, rate_dates: set[date]) -> dict[RateKey, Optional[Decimal]]:
+        rates = {}
+        ordered_dates = sorted(rate_dates)
+        for offset in range(0, len(ordered_dates), self.concurrent_table_fetches):
+            chunk = ordered_dates[offset : offset + self.concurrent_table_fetches]
+            results = await asyncio.gather(
+                *(self.rate_source.get_rates(rate_date) for rate_date in chunk), return_exceptions=True
+            )
+            for rate_date, table_rates in zip(chunk, results):
+                if isinstance(table_rates, ExchangeRateUnavailable):
+                    rates.update({(rate_date, currency): None for currency in FOREIGN_CURRENCIES})
+                    continue
+                if isinstance(table_rates, httpx.HTTPError):
+                    continue
+                if isinstance(table_rates, BaseException):
+                    raise table_rates
+                rates.update({(rate_date, currency): table_rates.get(currency) for currency in FOREIGN_CURRENCIES})
+        return rates
+
+    async def _fetch_exchange_rates(self, rate_dates: set[date]) -> dict[RateKey, Optional[Decimal]]:
+        if self.rate_source is not None:
+            rates = await self._fetch_rates_from_source(rate_dates)
+        else:
+            rates = await self._fetch_rates_from_archive(rate_dates)
+        with self.metrics.time_stage("insert"):
+            await self.exchange_rate_repository.insert_exchange_rates(rates)
+        for (rate_date, currency), rate in rates.items():
+            self.exchange_rate_cache.set(rate_date, currency, rate)
+        return rates
+
+    async def _get_rates_in_range(
+        self, currency: Currency, date_from: date, date_to: date
+    ) -> dict[date, Optional[Decimal]]:
+        rates = await self.exchange_rate_repository.get_rates_in_range(currency, date_from, date_to)
+        missing_dates = set(date_range(date_from, date_to)) - rates.keys()
+        if missing_dates:
+            fetched_rates = await self.fetch_exchange_rates(missing_dates)
+            for rate_date in missing_dates:
+                if (rate_date, currency) in fetched_rates:
+                    rates[rate_date] = fetched_rates[(rate_date, currency)]
+        return rates
+
+    async def get_rate_series(
+        self, currency: Currency, date_from: date, date_to: date, fallback: bool = False, chunk_days: int = 366
+    ) -> AsyncIterator[RatePoint]:
+        """Yield rate of the currency for each day of the range, days up to today only.
+
+        Range is resolved in chunks of `chunk_days` with one database query each, days missing in the database are
+        fetched from NBP in bulk. With `fallback` days without published table (weekends, holidays) get the last rate
+        published before them, otherwise their rate is `None`. Days which NBP fetch failed are not `resolved`.
+        """
+        date_to = min(date_to, date.today())
+        last_point = None
+        last_unresolved_date = None
+        chunk_from = date_from - self.FALLBACK_PERIOD if fallback else date_from
+        while chunk_from <= date_to:
+            chunk_to = min(chunk_from + timedelta(days=chunk_days - 1), date_to)
+            rates = await self._get_rates_in_range(currency, chunk_from, chunk_to)
+            for rate_date in date_range(chunk_from, chunk_to):
+                rate = rates.get(rate_date)
+                if rate_date not in rates:
+                    point = RatePoint(rate_date, None, None, resolved=False)
+                    last_unresolved_date = rate_date
+                elif rate is not None:
+                    point = last_point = RatePoint(rate_date, rate, rate_date)
+                elif fallback:
+                    # the day falls back to the last table, which may be published on a day not resolved since then
+                    resolved = (
+                        last_unresolved_date is None
+                        or rate_date - last_unresolved_date > self.FALLBACK_PERIOD
+                        or (last_point is not None and last_point.table_date > last_unresolved_date)
+                    )
+                    if last_point is not None and rate_date - last_point.table_date <= self.FALLBACK_PERIOD:
+                        point = RatePoint(rate_date, last_point.rate, last_point.table_date, resolved)
+                    else:
+                        point = RatePoint(rate_date, None, None, resolved)
+                else:
+                    point = RatePoint(rate_date, None, None)
+                if rate_date >= date_from:
+                    yield point
+            chunk_from = chunk_to + timedelta(days=1)
+
+    @staticmethod
+    def _rate_keys(order: ExchangeOrder) -> set[RateKey]:
+        if order.in_currency == order.out_currency:
+            return set()
+        currencies = {order.in_currency, order.out_currency} - {Currency.PLN}
+        return {(order.exchange_date, currency) for currency in currencies}
+
+    @staticmethod
+    def _convert(order: ExchangeOrder, rates: dict[RateKey, Optional[Decimal]]) -> Optional[ExchangeResult]:
+        """Convert amount through PLN, rates of foreign currencies are PLN per unit, `None` if a rate is unavailable."""
+        if order.in_currency == order.out_currency:
+            return ExchangeResult(amount=order.amount, rate=Decimal(1))
+
+        value = Decimal(order.amount)
+        rate = Decimal(1)
+        if order.in_currency != Currency.PLN:
+            in_rate = rates.get((order.exchange_date, order.in_currency))
+            if in_rate is None:
+                return None
+            value *= in_rate
+            rate *= in_rate
+        if order.out_currency != Currency.PLN:
+            out_rate = rates.get((order.exchange_date, order.out_currency))
+            if out_rate is None:
+                return None
+            value /= out_rate
+            rate /= out_rate
+        return ExchangeResult(amount=float(value), rate=rate)
+
+    async def _get_last_table_date(self, rate_date: date) -> date:
+        try:
+            return await self.rate_table_index_service.get_last_table_date(rate_date)
+        except httpx.HTTPError as err:
+            raise ExchangeRateUnavailable() from err
+
+    async def _resolve_last_available_dates(self, orders: Sequence[ExchangeOrder]) -> list[ExchangeOrder]:
+        """Move exchange dates of orders to dates of the last published tables, unresolved dates are kept."""
+        table_dates = {}
+        for rate_date in sorted({order.exchange_date for order in orders if self._rate_keys(order)}):
+            try:
+                table_dates[rate_date] = await self._get_last_table_date(rate_date)
+            except ExchangeRateUnavailable:
+                continue
+        return [
+            order._replace(exchange_date=table_dates.get(order.exchange_date, order.exchange_date)) for order in orders
+        ]
+
+    async def exchange(
+        self, amount: float, in_currency: Currency, out_currency: Currency, exchange_date: date
+    ) -> ExchangeResult:
+        """Exchange amount between any supported currencies, cross exchange rate is triangulated through PLN."""
+        order = ExchangeOrder(amount, in_currency, out_currency, exchange_date)
+        if self.last_available_rate and in_currency != out_currency:
+            order = order._replace(exchange_date=await self._get_last_table_date(exchange_date))
+        keys = self._rate_keys(order)
+        if len(keys) <= 1:
+            rates = {
+                (rate_date, currency): await self._get_exchange_rate(rate_date, currency)
+                for rate_date, currency in keys
+            }
+        else:
+            # rates of both legs are resolved together, with one database query and at most one NBP table fetch
+            rates = await self._get_exchange_rates(keys)
+
+        result = self._convert(order, rates)
+        if result is None:
+            raise ExchangeRateUnavailable()
+        return result
 
-    async def exchange(self, amount: float, in_currency: Currency, out_currency: Currency, exchange_date: date) -> float:
-        if in_currency == Currency.PLN:
-            exchange_rate = await self._get_exchange_rate(exchange_date, out_currency)
-            return float(Decimal(amount) / exchange_rate)
-        if out_currency == Currency.PLN:
-            exchange_rate = await self._get_exchange_rate(exchange_date, in_currency)
-            return float(Decimal(amount) * exchange_rate)
-        raise ValueError("in_currency or out_currency argument has to be PLN.")
+    async def exchange_many(self, orders: Sequence[ExchangeOrder]) -> list[Optional[ExchangeResult]]:
+        """Exchange many amounts at once, results are in order of `orders` and `None` marks unavailable rate."""
+        if self.last_available_rate:
+            orders = await self._resolve_last_available_dates(orders)
+        rates = await self._get_exchange_rates(set().union(*(self._rate_keys(order) for order in orders)))
+        return [self._convert(order, rates) for order in orders]
@@ -0,0 +1,96 @@
+import math
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Callable, Optional
+
+from currency_exchange.enums import Currency
+from currency_exchange.exceptions import ExchangeRateNotCached
+
+RateKey = tuple[date, Currency]
+
+
+def is_unavailable_rate_final(rate_date: date, fetched_at: datetime) -> bool:
+    """NBP publishes tables on their day, so a rate unavailable when fetched after the day ended never changes."""
+    return fetched_at.date() > rate_date
+
+
+class ExchangeRateCache:
+    """Bounded in-memory LRU cache of exchange rates keyed by (rate_date, currency).
+
+    Published rates never change, so positive entries live until evicted. Entries with `None` rate
+    (rate unavailable for the date) of past days live until evicted as well, while those of today
+    expire after `negative_ttl` seconds, because today's table may still get published.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 10_000,
+        negative_ttl: float = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+        wall_clock: Callable[[], datetime] = datetime.now,
+    ):
+        self.max_size = max_size
+        self.negative_ttl = negative_ttl
+        self._clock = clock
+        self._wall_clock = wall_clock
+        self._rates: OrderedDict[RateKey, Decimal] = OrderedDict()
+        self._unavailable: OrderedDict[RateKey, float] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._rates) + len(self._unavailable)
+
+    def get(self, rate_date: date, currency: Currency) -> Optional[Decimal]:
+        key = (rate_date, currency)
+        rate = self._rates.get(key)
+        if rate is not None:
+            self._rates.move_to_end(key)
+            self.hits += 1
+            return rate
+
+        expires_at = self._unavailable.get(key)
+        if expires_at is not None:
+            if expires_at > self._clock():
+                self._unavailable.move_to_end(key)
+                self.hits += 1
+                return None
+            del self._unavailable[key]
+
+        self.misses += 1
+        raise ExchangeRateNotCached()
+
+    def set(self, rate_date: date, currency: Currency, rate: Optional[Decimal]) -> None:
+        key = (rate_date, currency)
+        if rate is None:
+            self._rates.pop(key, None)
+            if is_unavailable_rate_final(rate_date, self._wall_clock()):
+                self._unavailable[key] = math.inf
+            else:
+                self._unavailable[key] = self._clock() + self.negative_ttl
+            self._unavailable.move_to_end(key)
+        else:
+            self._unavailable.pop(key, None)
+            self._rates[key] = rate
+            self._rates.move_to_end(key)
+        self._evict()
+
+    def clear(self) -> None:
+        self._rates.clear()
+        self._unavailable.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {"size": len(self), "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def _evict(self) -> None:
+        while len(self) > self.max_size:
+            # unavailable entries are cheap to recompute and short-lived, so they are dropped first
+            if self._unavailable:
+                self._unavailable.popitem(last=False)
+            else:
+                self._rates.popitem(last=False)
+            self.evictions += 1
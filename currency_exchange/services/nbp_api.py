@@ -1,60 +1,112 @@
-import re
-from datetime import date, datetime
+import asyncio
+from datetime import date
 from decimal import Decimal
+from typing import Callable, Optional, TypeVar
 
-import bs4
 import httpx
 
 from currency_exchange.enums import Currency
 from currency_exchange.exceptions import ExchangeRateUnavailable
+from currency_exchange.metrics import Metrics
+from currency_exchange.services.nbp_parsers import (
+    LxmlParser,
+    NBPParser,
+    parse_json_table,
+)
+from currency_exchange.services.single_flight import SingleFlight
+
+T = TypeVar("T")
 
 
 class NBPApiService:
-    _DATE_REGEX = re.compile(r"\d{4}-\d{2}-\d{2}")
-    _RATE_TABLE_ID_REGEX = re.compile(r"a\d{3}z\d{6}")
     _NBP_URL = "https://www.nbp.pl/transfer.aspx?c=/ascx/ListABCH.ascx&Typ=a&p=rok;mies&navid=archa"
+    _NBP_JSON_API_URL = "https://api.nbp.pl/api/exchangerates/tables/A/{rate_date}/?format=json"
+
+    _RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+    def __init__(
+        self,
+        client: Optional[httpx.AsyncClient] = None,
+        single_flight: Optional[SingleFlight] = None,
+        retries: int = 0,
+        retry_backoff: float = 0.5,
+        parser: Optional[NBPParser] = None,
+        parse_in_thread_threshold: int = 64 * 1024,
+        metrics: Optional[Metrics] = None,
+    ):
+        self.client = client if client is not None else httpx.AsyncClient()
+        self.single_flight = single_flight if single_flight is not None else SingleFlight()
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.parser = parser if parser is not None else LxmlParser()
+        self.parse_in_thread_threshold = parse_in_thread_threshold
+        self.metrics = metrics if metrics is not None else Metrics()
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+    async def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Send request, retrying with exponential backoff on transport errors and transient error responses."""
+        attempt = 0
+        while True:
+            try:
+                resp = await self.client.request(method, url, **kwargs)
+            except httpx.TransportError:
+                if attempt >= self.retries:
+                    raise
+            else:
+                if resp.status_code not in self._RETRY_STATUS_CODES or attempt >= self.retries:
+                    resp.raise_for_status()
+                    return resp
+            await asyncio.sleep(self.retry_backoff * 2**attempt)
+            attempt += 1
 
-    def __init__(self):
-        self.client = httpx.AsyncClient()
+    async def _parse(self, parse: Callable[[bytes], T], content: bytes) -> T:
+        """Parse response content, large documents are parsed in a worker thread to not block the event loop."""
+        with self.metrics.time_stage("parse"):
+            if len(content) > self.parse_in_thread_threshold:
+                return await asyncio.to_thread(parse, content)
+            return parse(content)
 
     @staticmethod
     def table_url(table_id: str) -> str:
         return f"https://www.nbp.pl/kursy/xml/{table_id}.xml"
 
-    async def _get_tables_from_month(self, year: int, month: int) -> dict[date, str]:
-        resp = await self.client.get(self._NBP_URL)
-        resp.raise_for_status()
-        soup = bs4.BeautifulSoup(resp.text, "html.parser")
+    async def get_tables_from_month(self, year: int, month: int) -> dict[date, str]:
+        return await self.single_flight.call(("month", year, month), lambda: self._fetch_tables_from_month(year, month))
 
-        inputs = soup.findAll("input")
-        data = {input_element["name"]: input_element.get("value", "") for input_element in inputs}
+    async def _fetch_tables_from_month(self, year: int, month: int) -> dict[date, str]:
+        with self.metrics.time_stage("archive_fetch"):
+            resp = await self._request("GET", self._NBP_URL)
+        data = await self._parse(self.parser.parse_archive_form, resp.content)
         data["rok"] = str(year % 100).zfill(2)
         data["mies"] = str(month).zfill(2)
 
-        resp = await self.client.post(self._NBP_URL, data=data)
-        resp.raise_for_status()
-        soup = bs4.BeautifulSoup(resp.text, "html.parser")
-
-        table = soup.find("ul", {"class": "archl"})
-        result = {}
-        for row in table.find_all("li"):
-            rate_date = self._DATE_REGEX.findall(row.text)[0]
-            rate_date = datetime.strptime(rate_date, "%Y-%m-%d").date()
-            rate_table_id = self._RATE_TABLE_ID_REGEX.findall(row.a["href"])[0]
-            result[rate_date] = rate_table_id
-        return result
-
-    async def _get_exchange_rate_from_table(self, table_id: str, currency: Currency) -> Decimal:
-        resp = await self.client.get(self.table_url(table_id))
-        resp.raise_for_status()
-        soup = bs4.BeautifulSoup(resp.text, "xml")
-        return Decimal(soup.find("kod_waluty", text=currency).parent.find("kurs_sredni").text.replace(",", "."))
-
-    async def get_exchange_rate(self, rate_date: date, currency: Currency) -> Decimal:
-        rates_dict = await self._get_tables_from_month(rate_date.year, rate_date.month)
-        try:
-            rates_table_id = rates_dict[rate_date]
-        except KeyError as err:
-            raise ExchangeRateUnavailable() from err
+        with self.metrics.time_stage("archive_fetch"):
+            resp = await self._request("POST", self._NBP_URL, data=data)
+        return await self._parse(self.parser.parse_archive_tables, resp.content)
+
+    async def get_exchange_rates_from_table(self, table_id: str) -> dict[Currency, Decimal]:
+        return await self.single_flight.call(
+            ("table", table_id), lambda: self._fetch_exchange_rates_from_table(table_id)
+        )
+
+    async def _fetch_exchange_rates_from_table(self, table_id: str) -> dict[Currency, Decimal]:
+        with self.metrics.time_stage("table_fetch"):
+            resp = await self._request("GET", self.table_url(table_id))
+        return await self._parse(self.parser.parse_table, resp.content)
 
-        return await self._get_exchange_rate_from_table(rates_table_id, currency)
+    async def get_exchange_rates_by_date(self, rate_date: date) -> dict[Currency, Decimal]:
+        """Get rates of table A published on the date from NBP JSON api, it doesn't need the archive table listing."""
+        return await self.single_flight.call(("api", rate_date), lambda: self._fetch_exchange_rates_by_date(rate_date))
+
+    async def _fetch_exchange_rates_by_date(self, rate_date: date) -> dict[Currency, Decimal]:
+        try:
+            with self.metrics.time_stage("table_fetch"):
+                resp = await self._request("GET", self._NBP_JSON_API_URL.format(rate_date=rate_date.isoformat()))
+        except httpx.HTTPStatusError as err:
+            # api responds with 404 for days without published table
+            if err.response.status_code == httpx.codes.NOT_FOUND:
+                raise ExchangeRateUnavailable() from err
+            raise
+        return await self._parse(parse_json_table, resp.content)
@@ -0,0 +1,159 @@
+"""Parsers of NBP responses.
+
+bs4 and lxml are imported by the first parse (or by `NBPParser.load`), they are slow to import and workers serving
+rates from cache and database never parse, so the imports are kept out of worker startup.
+"""
+# pylint: disable=import-outside-toplevel
+import json
+import re
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+from decimal import Decimal
+from io import BytesIO
+from typing import TYPE_CHECKING, Callable, Optional
+
+from currency_exchange.enums import FOREIGN_CURRENCIES, Currency
+
+if TYPE_CHECKING:
+    from lxml import html
+
+SUPPORTED_CURRENCY_CODES = {currency.value for currency in FOREIGN_CURRENCIES}
+
+_DATE_REGEX = re.compile(r"\d{4}-\d{2}-\d{2}")
+_RATE_TABLE_ID_REGEX = re.compile(r"a\d{3}z\d{6}")
+
+
+def _parse_rate(mid_rate: str, multiplier: Optional[str]) -> Decimal:
+    """Rates in tables are quoted per `multiplier` units (e.g. 100 JPY), they are normalized to PLN per one unit."""
+    rate = Decimal(mid_rate.replace(",", "."))
+    if multiplier and multiplier.strip() != "1":
+        rate /= Decimal(multiplier)
+    return rate
+
+
+def _parse_archive_row(text: str, href: str) -> tuple[date, str]:
+    rate_date = datetime.strptime(_DATE_REGEX.findall(text)[0], "%Y-%m-%d").date()
+    return rate_date, _RATE_TABLE_ID_REGEX.findall(href)[0]
+
+
+class NBPParser(ABC):
+    """Parser of NBP archive pages and exchange rate tables, content is passed as raw bytes of the response."""
+
+    name: str
+
+    def load(self) -> None:
+        """Import the parsing library ahead of the first parse."""
+
+    @abstractmethod
+    def parse_archive_form(self, content: bytes) -> dict[str, str]:
+        ...
+
+    @abstractmethod
+    def parse_archive_tables(self, content: bytes) -> dict[date, str]:
+        ...
+
+    @abstractmethod
+    def parse_table(self, content: bytes) -> dict[Currency, Decimal]:
+        ...
+
+
+class BeautifulSoupParser(NBPParser):
+    name = "bs4"
+
+    def load(self) -> None:
+        import bs4  # pylint: disable=unused-import
+        import lxml.etree  # pylint: disable=unused-import
+
+    def parse_archive_form(self, content: bytes) -> dict[str, str]:
+        import bs4
+
+        soup = bs4.BeautifulSoup(content, "html.parser")
+        return {element["name"]: element.get("value", "") for element in soup.find_all("input") if element.get("name")}
+
+    def parse_archive_tables(self, content: bytes) -> dict[date, str]:
+        import bs4
+
+        soup = bs4.BeautifulSoup(content, "html.parser")
+        table = soup.find("ul", {"class": "archl"})
+        return dict(_parse_archive_row(row.text, row.a["href"]) for row in table.find_all("li"))
+
+    def parse_table(self, content: bytes) -> dict[Currency, Decimal]:
+        import bs4
+
+        soup = bs4.BeautifulSoup(content, "xml")
+        result = {}
+        for position in soup.find_all("pozycja"):
+            currency_code = position.find("kod_waluty").text
+            if currency_code in SUPPORTED_CURRENCY_CODES:
+                multiplier = position.find("przelicznik")
+                result[Currency(currency_code)] = _parse_rate(
+                    position.find("kurs_sredni").text, multiplier.text if multiplier is not None else None
+                )
+        return result
+
+
+class LxmlParser(NBPParser):
+    """Parser built directly on libxml2, table XML is parsed incrementally and parsed elements are freed right away."""
+
+    name = "lxml"
+
+    def __init__(self, encoding: str = "utf-8"):
+        # libxml2 falls back to latin-1 for html without charset declaration, while NBP pages are encoded in utf-8
+        self.encoding = encoding
+
+    def load(self) -> None:
+        import lxml.etree  # pylint: disable=unused-import
+        import lxml.html  # pylint: disable=unused-import
+
+    def _parse_html(self, content: bytes) -> "html.HtmlElement":
+        from lxml import html
+
+        # lxml parser instances must not be shared between threads, so a new one is created for each document
+        return html.fromstring(content, parser=html.HTMLParser(encoding=self.encoding))
+
+    def parse_archive_form(self, content: bytes) -> dict[str, str]:
+        document = self._parse_html(content)
+        return {
+            element.get("name"): element.get("value", "") for element in document.iter("input") if element.get("name")
+        }
+
+    def parse_archive_tables(self, content: bytes) -> dict[date, str]:
+        document = self._parse_html(content)
+        rows = document.xpath("//ul[contains(concat(' ', normalize-space(@class), ' '), ' archl ')]/li")
+        return dict(_parse_archive_row(row.text_content(), row.find(".//a").get("href")) for row in rows)
+
+    def parse_table(self, content: bytes) -> dict[Currency, Decimal]:
+        from lxml import etree
+
+        result = {}
+        for _, position in etree.iterparse(BytesIO(content), tag="pozycja"):
+            currency_code = position.findtext("kod_waluty")
+            if currency_code in SUPPORTED_CURRENCY_CODES:
+                result[Currency(currency_code)] = _parse_rate(
+                    position.findtext("kurs_sredni"), position.findtext("przelicznik")
+                )
+            position.clear()
+        return result
+
+
+def parse_json_table(content: bytes) -> dict[Currency, Decimal]:
+    """Parse table A from NBP JSON api (`/api/exchangerates/tables/A/{date}`), rates are quoted per one unit."""
+    tables = json.loads(content, parse_float=Decimal)
+    return {
+        Currency(rate["code"]): Decimal(rate["mid"])
+        for rate in tables[0]["rates"]
+        if rate["code"] in SUPPORTED_CURRENCY_CODES
+    }
+
+
+PARSERS: dict[str, Callable[[], NBPParser]] = {
+    BeautifulSoupParser.name: BeautifulSoupParser,
+    LxmlParser.name: LxmlParser,
+}
+
+
+def get_parser(name: str) -> NBPParser:
+    try:
+        return PARSERS[name]()
+    except KeyError as err:
+        raise ValueError(f"Unknown NBP parser '{name}', available parsers: {', '.join(PARSERS)}.") from err
@@ -0,0 +1,152 @@
+"""Read-only snapshot of stored exchange rates in a fixed-width binary file, shared by workers through `mmap`.
+
+Layout (little-endian):
+
+- header: magic, format version, scale (decimal digits of rates), ordinal of the first day, number of days and of
+  currencies, followed by 3 byte currency codes, padded to 8 bytes
+- rates: `days x currencies` matrix of int64 rates scaled by 10**scale, row per day
+- validity bitmap: bit per matrix cell, set if the rate is known
+
+A valid cell with rate 0 means the rate is unavailable for the day. Only rates which never change are exported,
+published rates and rates unavailable on past days, so the snapshot never goes stale.
+"""
+import mmap
+import os
+import struct
+import tempfile
+from datetime import date
+from decimal import Decimal
+from typing import Iterable, Optional
+
+from currency_exchange.enums import FOREIGN_CURRENCIES, Currency
+from currency_exchange.exceptions import ExchangeRateNotCached
+from currency_exchange.services.exchange_rate_cache import RateKey
+
+MAGIC = b"NBPRATES"
+VERSION = 1
+# NBP rates per unit have at most 8 decimal digits (4 digits of rates quoted per 10 000 units)
+SCALE = 8
+
+_HEADER = struct.Struct("<8sHHIIH")
+_RATE = struct.Struct("<q")
+_CODE_LENGTH = 3
+
+
+def _padded(size: int) -> int:
+    return (size + 7) // 8 * 8
+
+
+def _header_size(currencies: int) -> int:
+    return _padded(_HEADER.size + currencies * _CODE_LENGTH)
+
+
+def write_rate_snapshot(
+    path: str,
+    rates: Iterable[tuple[date, Currency, Optional[Decimal]]],
+    currencies: Optional[Iterable[Currency]] = None,
+) -> int:
+    """Write rates to the snapshot file, returns number of exported rates.
+
+    The file is replaced atomically, workers which have the previous snapshot mapped keep reading it until reopened.
+    """
+    currencies = list(currencies if currencies is not None else FOREIGN_CURRENCIES)
+    columns = {currency: column for column, currency in enumerate(currencies)}
+    cells: dict[RateKey, int] = {}
+    for rate_date, currency, rate in rates:
+        if currency in columns:
+            cells[(rate_date, currency)] = 0 if rate is None else int(rate.scaleb(SCALE).to_integral_value())
+
+    first_day = min((rate_date for rate_date, _ in cells), default=date.today())
+    last_day = max((rate_date for rate_date, _ in cells), default=first_day - date.resolution)
+    days = (last_day - first_day).days + 1
+    values = bytearray(days * len(currencies) * 8)
+    bitmap = bytearray((days * len(currencies) + 7) // 8)
+    for (rate_date, currency), value in cells.items():
+        index = (rate_date - first_day).days * len(currencies) + columns[currency]
+        _RATE.pack_into(values, index * _RATE.size, value)
+        bitmap[index // 8] |= 1 << (index % 8)
+
+    header = _HEADER.pack(MAGIC, VERSION, SCALE, first_day.toordinal(), days, len(currencies))
+    header += b"".join(currency.value.encode() for currency in currencies)
+    header = header.ljust(_header_size(len(currencies)), b"\0")
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".rates-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(header)
+            file.write(values)
+            file.write(bitmap)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return len(cells)
+
+
+class RateSnapshot:
+    """Exchange rates of a snapshot file mapped read-only into memory, pages are shared by all processes of the host.
+
+    Lookup is an index into the rates matrix, rates missing in the snapshot raise `ExchangeRateNotCached`.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.scale, first_ordinal, self.days, currencies = _HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION:
+            self._mmap.close()
+            raise ValueError(f"'{path}' isn't an exchange rate snapshot of version {VERSION}.")
+
+        codes = self._mmap[_HEADER.size : _HEADER.size + currencies * _CODE_LENGTH]
+        self.currencies = [
+            Currency(codes[offset : offset + _CODE_LENGTH].decode()) for offset in range(0, len(codes), _CODE_LENGTH)
+        ]
+        self._columns = {currency: column for column, currency in enumerate(self.currencies)}
+        self.first_day = date.fromordinal(first_ordinal)
+        self._first_ordinal = first_ordinal
+
+        cells = self.days * currencies
+        values_offset = _header_size(currencies)
+        bitmap_offset = values_offset + cells * 8
+        view = memoryview(self._mmap)
+        # rates are decoded with explicit little-endian layout of the file, whatever the byte order of the host
+        self._values = view[values_offset:bitmap_offset]
+        self._bitmap = view[bitmap_offset : bitmap_offset + (cells + 7) // 8]
+
+    @property
+    def values(self) -> memoryview:
+        """Bytes of the rates matrix of the mapped file, little-endian int64, row per day."""
+        return self._values
+
+    @property
+    def bitmap(self) -> memoryview:
+        return self._bitmap
+
+    def __len__(self) -> int:
+        return sum(bin(byte).count("1") for byte in self._bitmap)
+
+    def get(self, rate_date: date, currency: Currency) -> Optional[Decimal]:
+        day = rate_date.toordinal() - self._first_ordinal
+        column = self._columns.get(currency)
+        if column is None or not 0 <= day < self.days:
+            raise ExchangeRateNotCached()
+        index = day * len(self.currencies) + column
+        if not self._bitmap[index >> 3] & (1 << (index & 7)):
+            raise ExchangeRateNotCached()
+        (value,) = _RATE.unpack_from(self._values, index * _RATE.size)
+        return Decimal(value).scaleb(-self.scale) if value else None
+
+    def close(self) -> None:
+        self._values.release()
+        self._bitmap.release()
+        self._mmap.close()
+
+
+def load_rate_snapshot(path: Optional[str]) -> Optional[RateSnapshot]:
+    """Map the snapshot if the path is set and the file exists, a worker without snapshot warms up from the database."""
+    if path is None or not os.path.exists(path):
+        return None
+    return RateSnapshot(path)
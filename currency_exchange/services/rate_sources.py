@@ -0,0 +1,196 @@
+"""Interchangeable upstream sources of NBP table A rates, with hedged requests and circuit breakers over them.
+
+- `ArchiveRateSource` looks the table up in the archive listing and downloads its XML
+- `JsonApiRateSource` asks NBP JSON api for the table of the date
+
+Both raise `ExchangeRateUnavailable` for days without published table and `httpx.HTTPError` on failed calls.
+"""
+import asyncio
+import logging
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Callable, Optional, Protocol, Sequence
+
+import httpx
+from sqlalchemy.orm import sessionmaker
+
+from currency_exchange.database.repositories import RateTableRepository
+from currency_exchange.enums import Currency
+from currency_exchange.exceptions import ExchangeRateUnavailable, UpstreamCircuitOpen
+from currency_exchange.services.circuit_breaker import CircuitBreaker, LatencyWindow
+from currency_exchange.services.nbp_api import NBPApiService
+from currency_exchange.services.rate_table_index import (
+    MonthTablesCache,
+    RateTableIndexService,
+)
+from currency_exchange.services.shared_cache import SharedCache
+
+logger = logging.getLogger(__name__)
+
+
+class RateSource(Protocol):
+    name: str
+
+    async def get_rates(self, rate_date: date) -> dict[Currency, Decimal]:
+        ...
+
+
+class ArchiveRateSource:
+    name = "archive"
+
+    def __init__(
+        self,
+        session_factory: sessionmaker,
+        nbp_api_service: NBPApiService,
+        month_tables_cache: MonthTablesCache,
+        current_month_ttl: timedelta = timedelta(minutes=10),
+        shared_cache: Optional[SharedCache] = None,
+    ):
+        self.session_factory = session_factory
+        self.nbp_api_service = nbp_api_service
+        self.month_tables_cache = month_tables_cache
+        self.current_month_ttl = current_month_ttl
+        self.shared_cache = shared_cache
+
+    async def get_rates(self, rate_date: date) -> dict[Currency, Decimal]:
+        # listing is looked up on its own session, lookups run concurrently and a hedged one may get cancelled,
+        # the session doesn't connect at all if the listing is cached
+        async with self.session_factory() as session:
+            rate_table_index_service = RateTableIndexService(
+                RateTableRepository(session),
+                self.nbp_api_service,
+                self.month_tables_cache,
+                current_month_ttl=self.current_month_ttl,
+                shared_cache=self.shared_cache,
+            )
+            table_id = await rate_table_index_service.get_table_id(rate_date)
+        return await self.nbp_api_service.get_exchange_rates_from_table(table_id)
+
+
+class JsonApiRateSource:
+    name = "api"
+
+    def __init__(self, nbp_api_service: NBPApiService):
+        self.nbp_api_service = nbp_api_service
+
+    async def get_rates(self, rate_date: date) -> dict[Currency, Decimal]:
+        return await self.nbp_api_service.get_exchange_rates_by_date(rate_date)
+
+
+class HedgedRateSource:
+    """Asks sources in order of preference, hedging slow calls and skipping sources with open circuit.
+
+    When a call doesn't finish within `hedge_percentile` of recent latencies of its source (`hedge_delay` seconds until
+    enough calls are observed), the next source is asked too and the first answer wins, the other call is cancelled.
+    A failed call fails over to the next source at once. Failures open the circuit breaker of the source, while all of
+    them are open calls fast-fail with `UpstreamCircuitOpen`, and rates are served only from caches and database.
+    A date without table is final, except for dates within `unavailable_recheck_window` of now, the archive may answer
+    from a cached listing of the current month older than a table published meanwhile. For them the other sources are
+    waited for or started before the rate is reported unavailable.
+
+    Outcomes are counted per source in `counters`: "success", "unavailable" (no table for the date), "error",
+    "rejected" (circuit open), "hedged" (call started as a hedge) and "cancelled" (call lost the race).
+    """
+
+    def __init__(
+        self,
+        sources: Sequence[RateSource],
+        hedge_percentile: float = 0.9,
+        hedge_delay: float = 2.0,
+        breaker_factory: Callable[[], CircuitBreaker] = CircuitBreaker,
+        latency_window_factory: Callable[[], LatencyWindow] = LatencyWindow,
+        unavailable_recheck_window: timedelta = timedelta(minutes=10),
+        clock: Callable[[], datetime] = datetime.now,
+    ):
+        self.sources = list(sources)
+        self.hedge_percentile = hedge_percentile
+        self.hedge_delay = hedge_delay
+        self.breakers = {source.name: breaker_factory() for source in self.sources}
+        self.latencies = {source.name: latency_window_factory() for source in self.sources}
+        self.counters: Counter[tuple[str, str]] = Counter()
+        self.unavailable_recheck_window = unavailable_recheck_window
+        self._clock = clock
+
+    def _is_unavailable_final(self, rate_date: date) -> bool:
+        return rate_date < (self._clock() - self.unavailable_recheck_window).date()
+
+    def _hedge_delay(self, source: RateSource) -> float:
+        delay = self.latencies[source.name].percentile(self.hedge_percentile)
+        return delay if delay is not None else self.hedge_delay
+
+    async def _call(self, source: RateSource, rate_date: date) -> dict[Currency, Decimal]:
+        start = time.perf_counter()
+        breaker = self.breakers[source.name]
+        try:
+            rates = await source.get_rates(rate_date)
+        except ExchangeRateUnavailable:
+            self.counters[(source.name, "unavailable")] += 1
+            breaker.record_success()
+            raise
+        except httpx.HTTPError:
+            self.counters[(source.name, "error")] += 1
+            breaker.record_failure()
+            raise
+        except asyncio.CancelledError:
+            self.counters[(source.name, "cancelled")] += 1
+            breaker.record_cancelled()
+            raise
+        self.counters[(source.name, "success")] += 1
+        breaker.record_success()
+        self.latencies[source.name].add(time.perf_counter() - start)
+        return rates
+
+    def _start_next(
+        self,
+        rate_date: date,
+        candidates: list[RateSource],
+        pending: dict[asyncio.Task, RateSource],
+        hedged: bool = False,
+    ) -> bool:
+        while candidates:
+            source = candidates.pop(0)
+            if self.breakers[source.name].allow_request():
+                pending[asyncio.create_task(self._call(source, rate_date))] = source
+                if hedged:
+                    self.counters[(source.name, "hedged")] += 1
+                return True
+            self.counters[(source.name, "rejected")] += 1
+        return False
+
+    async def get_rates(self, rate_date: date) -> dict[Currency, Decimal]:
+        candidates = list(self.sources)
+        pending: dict[asyncio.Task, RateSource] = {}
+        if not self._start_next(rate_date, candidates, pending):
+            raise UpstreamCircuitOpen(f"Circuits of all NBP rate sources are open, rates of {rate_date} not fetched.")
+
+        error: Optional[BaseException] = None
+        unavailable: Optional[ExchangeRateUnavailable] = None
+        try:
+            while pending:
+                # the latest started call is the one hedged
+                timeout = self._hedge_delay(list(pending.values())[-1]) if candidates else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self._start_next(rate_date, candidates, pending, hedged=True)
+                    continue
+                for task in done:
+                    source = pending.pop(task)
+                    try:
+                        return task.result()
+                    except ExchangeRateUnavailable as err:
+                        if self._is_unavailable_final(rate_date):
+                            raise
+                        unavailable = err
+                    except httpx.HTTPError as err:
+                        logger.warning("Fetch of rates of %s from %s failed: %r", rate_date, source.name, err)
+                        error = err
+                if not pending:
+                    self._start_next(rate_date, candidates, pending)
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.wait(pending)
+        raise unavailable if unavailable is not None else error
@@ -0,0 +1,186 @@
+import bisect
+from datetime import date, datetime, timedelta
+from typing import Callable, Optional
+
+from currency_exchange.database.repositories import RateTableRepository
+from currency_exchange.exceptions import (
+    ExchangeRateUnavailable,
+    MonthTablesNotCached,
+    MonthTablesRecordDoesNotExist,
+)
+from currency_exchange.services.nbp_api import NBPApiService
+from currency_exchange.services.shared_cache import SharedCache
+
+
+def _previous_month(year: int, month: int) -> tuple[int, int]:
+    return (year, month - 1) if month > 1 else (year - 1, 12)
+
+
+def is_month_listing_complete(year: int, month: int, fetched_at: datetime) -> bool:
+    """Listing fetched after the month ended is complete and never changes."""
+    return fetched_at >= datetime(year + month // 12, month % 12 + 1, 1)
+
+
+def is_month_listing_fresh(year: int, month: int, fetched_at: datetime, now: datetime, ttl: timedelta) -> bool:
+    """Listing fetched after the month ended is complete and never changes, otherwise it is fresh for `ttl`."""
+    if is_month_listing_complete(year, month, fetched_at):
+        return True
+    return now < fetched_at + ttl
+
+
+class MonthTablesCache:
+    """In-memory layer of NBP tables listings (table date -> table id) keyed by (year, month).
+
+    Dates of all cached tables are also kept sorted, to find the last table published before a date with bisect.
+    """
+
+    def __init__(self):
+        self._months: dict[tuple[int, int], tuple[dict[date, str], datetime]] = {}
+        self._table_dates: list[date] = []
+
+    def get(self, year: int, month: int) -> tuple[dict[date, str], datetime]:
+        try:
+            return self._months[(year, month)]
+        except KeyError as err:
+            raise MonthTablesNotCached() from err
+
+    def set(self, year: int, month: int, tables: dict[date, str], fetched_at: datetime) -> None:
+        self._months[(year, month)] = (tables, fetched_at)
+        start = bisect.bisect_left(self._table_dates, date(year, month, 1))
+        end = bisect.bisect_left(self._table_dates, date(year + month // 12, month % 12 + 1, 1))
+        self._table_dates[start:end] = sorted(tables)
+
+    def get_last_table_date(self, rate_date: date) -> date:
+        """Date of the last cached table published on or before `rate_date`.
+
+        Raises `MonthTablesNotCached` unless listings of all months from the table to `rate_date` are cached, as
+        a table could be published in a month which isn't cached.
+        """
+        index = bisect.bisect_right(self._table_dates, rate_date)
+        if index == 0:
+            raise MonthTablesNotCached()
+        table_date = self._table_dates[index - 1]
+        year, month = rate_date.year, rate_date.month
+        while (year, month) >= (table_date.year, table_date.month):
+            if (year, month) not in self._months:
+                raise MonthTablesNotCached()
+            year, month = _previous_month(year, month)
+        return table_date
+
+    def clear(self) -> None:
+        self._months.clear()
+        self._table_dates.clear()
+
+
+class RateTableIndexService:
+    """Resolves dates to NBP table ids using in-memory cache, then database and scraping NBP archive as last resort."""
+
+    # months searched back for the last published table, NBP publishes tables at least once a month
+    LAST_TABLE_LOOKBACK_MONTHS = 2
+
+    def __init__(
+        self,
+        rate_table_repository: RateTableRepository,
+        nbp_api_service: NBPApiService,
+        month_tables_cache: MonthTablesCache,
+        current_month_ttl: timedelta = timedelta(minutes=10),
+        clock: Callable[[], datetime] = datetime.now,
+        shared_cache: Optional[SharedCache] = None,
+    ):
+        self.rate_table_repository = rate_table_repository
+        self.nbp_api_service = nbp_api_service
+        self.month_tables_cache = month_tables_cache
+        self.current_month_ttl = current_month_ttl
+        self._clock = clock
+        self.shared_cache = shared_cache
+
+    def _is_fresh(self, year: int, month: int, fetched_at: datetime) -> bool:
+        return is_month_listing_fresh(year, month, fetched_at, self._clock(), self.current_month_ttl)
+
+    async def _get_shared_month_tables(self, year: int, month: int) -> Optional[dict[date, str]]:
+        if self.shared_cache is None:
+            return None
+        try:
+            tables, fetched_at = await self.shared_cache.get_month_tables(year, month)
+        except MonthTablesNotCached:
+            return None
+        if not self._is_fresh(year, month, fetched_at):
+            return None
+        self.month_tables_cache.set(year, month, tables, fetched_at)
+        return tables
+
+    async def _set_shared_month_tables(
+        self, year: int, month: int, tables: dict[date, str], fetched_at: datetime
+    ) -> None:
+        if self.shared_cache is None:
+            return
+        ttl = None if is_month_listing_complete(year, month, fetched_at) else self.current_month_ttl.total_seconds()
+        await self.shared_cache.set_month_tables(year, month, tables, fetched_at, ttl=ttl)
+
+    async def get_month_tables(self, year: int, month: int) -> dict[date, str]:
+        try:
+            tables, fetched_at = self.month_tables_cache.get(year, month)
+            if self._is_fresh(year, month, fetched_at):
+                return tables
+        except MonthTablesNotCached:
+            pass
+
+        tables = await self._get_shared_month_tables(year, month)
+        if tables is not None:
+            return tables
+
+        try:
+            tables, fetched_at = await self.rate_table_repository.get_month_tables(year, month)
+            if self._is_fresh(year, month, fetched_at):
+                self.month_tables_cache.set(year, month, tables, fetched_at)
+                await self._set_shared_month_tables(year, month, tables, fetched_at)
+                return tables
+        except MonthTablesRecordDoesNotExist:
+            pass
+
+        if self.shared_cache is None:
+            return await self._fetch_month_tables(year, month)
+        async with self.shared_cache.fill_lock(f"tables:{year}:{month}"):
+            # another worker may have scraped the listing while the lock was awaited
+            tables = await self._get_shared_month_tables(year, month)
+            if tables is None:
+                tables = await self._fetch_month_tables(year, month)
+        return tables
+
+    async def _fetch_month_tables(self, year: int, month: int) -> dict[date, str]:
+        fetched_at = self._clock()
+        tables = await self.nbp_api_service.get_tables_from_month(year, month)
+        await self.rate_table_repository.save_month_tables(year, month, tables, fetched_at)
+        self.month_tables_cache.set(year, month, tables, fetched_at)
+        await self._set_shared_month_tables(year, month, tables, fetched_at)
+        return tables
+
+    async def get_table_id(self, rate_date: date) -> str:
+        tables = await self.get_month_tables(rate_date.year, rate_date.month)
+        try:
+            return tables[rate_date]
+        except KeyError as err:
+            raise ExchangeRateUnavailable() from err
+
+    async def get_last_table_date(self, rate_date: date) -> date:
+        """Date of the last table published on or before `rate_date`, e.g. Friday's table for a weekend.
+
+        Served from memory if listings of the months are cached, otherwise missing months are loaded with one database
+        query (or NBP archive scrape) each.
+        """
+        if rate_date > self._clock().date():
+            raise ExchangeRateUnavailable()
+
+        year, month = rate_date.year, rate_date.month
+        # current month listing has to be fresh, a table may have been published since it was cached
+        await self.get_month_tables(year, month)
+        for _ in range(self.LAST_TABLE_LOOKBACK_MONTHS):
+            try:
+                return self.month_tables_cache.get_last_table_date(rate_date)
+            except MonthTablesNotCached:
+                year, month = _previous_month(year, month)
+                await self.get_month_tables(year, month)
+        try:
+            return self.month_tables_cache.get_last_table_date(rate_date)
+        except MonthTablesNotCached as err:
+            raise ExchangeRateUnavailable() from err
@@ -0,0 +1,218 @@
+import asyncio
+import json
+import logging
+import time
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+from decimal import Decimal
+from typing import AsyncIterator, Callable, Iterable, Optional
+
+from currency_exchange.enums import Currency
+from currency_exchange.exceptions import MonthTablesNotCached
+from currency_exchange.services.exchange_rate_cache import (
+    RateKey,
+    is_unavailable_rate_final,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class SharedCacheBackend(ABC):
+    """Key-value store shared by all application workers, keys and values are strings."""
+
+    @abstractmethod
+    async def get_many(self, keys: list[str]) -> list[Optional[str]]:
+        ...
+
+    @abstractmethod
+    async def set_many(self, items: dict[str, str], ttl: Optional[float] = None) -> None:
+        ...
+
+    @abstractmethod
+    @asynccontextmanager
+    async def lock(self, name: str, timeout: float) -> AsyncIterator[bool]:
+        """Async context manager holding lock `name` for at most `timeout` seconds, waiting at most `timeout`
+        seconds to acquire it. Yields whether the lock was acquired."""
+        yield False
+
+    async def aclose(self) -> None:
+        pass
+
+
+class InMemorySharedCacheBackend(SharedCacheBackend):
+    """Process local stand-in of the shared store, for tests and single worker deployments."""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._values: dict[str, tuple[str, Optional[float]]] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._lock_users: dict[str, int] = {}
+
+    async def get_many(self, keys: list[str]) -> list[Optional[str]]:
+        now = self._clock()
+        result = []
+        for key in keys:
+            value, expires_at = self._values.get(key, (None, None))
+            if expires_at is not None and expires_at <= now:
+                del self._values[key]
+                value = None
+            result.append(value)
+        return result
+
+    async def set_many(self, items: dict[str, str], ttl: Optional[float] = None) -> None:
+        expires_at = self._clock() + ttl if ttl is not None else None
+        for key, value in items.items():
+            self._values[key] = (value, expires_at)
+
+    @asynccontextmanager
+    async def lock(self, name: str, timeout: float) -> AsyncIterator[bool]:
+        lock = self._locks.setdefault(name, asyncio.Lock())
+        self._lock_users[name] = self._lock_users.get(name, 0) + 1
+        try:
+            try:
+                await asyncio.wait_for(lock.acquire(), timeout)
+                acquired = True
+            except asyncio.TimeoutError:
+                acquired = False
+            try:
+                yield acquired
+            finally:
+                if acquired:
+                    lock.release()
+        finally:
+            self._lock_users[name] -= 1
+            if not self._lock_users[name]:
+                del self._lock_users[name]
+                del self._locks[name]
+
+
+class RedisSharedCacheBackend(SharedCacheBackend):
+    """Store on Redis (or compatible server), requires optional `redis` dependency, which is imported only when the
+    backend is configured."""
+
+    def __init__(self, url: str):
+        # pylint: disable=import-outside-toplevel
+        try:
+            from redis import asyncio as aioredis
+            from redis.exceptions import LockError
+        except ImportError as exc:  # pragma: no cover
+            raise RuntimeError("Redis shared cache requires 'redis' package, install with 'redis' extra.") from exc
+        self.client = aioredis.Redis.from_url(url)
+        self._lock_error = LockError
+
+    async def get_many(self, keys: list[str]) -> list[Optional[str]]:
+        if not keys:
+            return []
+        return [value.decode() if value is not None else None for value in await self.client.mget(keys)]
+
+    async def set_many(self, items: dict[str, str], ttl: Optional[float] = None) -> None:
+        if not items:
+            return
+        async with self.client.pipeline(transaction=False) as pipeline:
+            for key, value in items.items():
+                pipeline.set(key, value, px=int(ttl * 1000) if ttl is not None else None)
+            await pipeline.execute()
+
+    @asynccontextmanager
+    async def lock(self, name: str, timeout: float) -> AsyncIterator[bool]:
+        lock = self.client.lock(name, timeout=timeout, blocking_timeout=timeout)
+        acquired = await lock.acquire()
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                try:
+                    await lock.release()
+                except self._lock_error:
+                    # lock expired while held, it may be already taken by another worker
+                    pass
+
+    async def aclose(self) -> None:
+        await self.client.close()
+
+
+def create_shared_cache_backend(url: str) -> SharedCacheBackend:
+    if url == "memory://":
+        return InMemorySharedCacheBackend()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisSharedCacheBackend(url)
+    raise ValueError(f"Unsupported shared cache url '{url}'.")
+
+
+class SharedCache:
+    """Exchange rates and NBP tables listings cached in a store shared by all workers.
+
+    Unavailable rates of today expire after `negative_ttl` seconds like in `ExchangeRateCache`. Fills of missing entries
+    from NBP are serialized between workers with `fill_lock`, so a cold date is scraped once instead of once per worker.
+    """
+
+    def __init__(
+        self,
+        backend: SharedCacheBackend,
+        negative_ttl: float = 300.0,
+        lock_timeout: float = 30.0,
+        prefix: str = "currency_exchange",
+        clock: Callable[[], datetime] = datetime.now,
+    ):
+        self.backend = backend
+        self.negative_ttl = negative_ttl
+        self.lock_timeout = lock_timeout
+        self.prefix = prefix
+        self._clock = clock
+
+    async def aclose(self) -> None:
+        await self.backend.aclose()
+
+    def _rate_key(self, rate_date: date, currency: Currency) -> str:
+        return f"{self.prefix}:rate:{rate_date.isoformat()}:{currency.value}"
+
+    def _month_tables_key(self, year: int, month: int) -> str:
+        return f"{self.prefix}:tables:{year}:{month}"
+
+    async def get_rates(self, keys: Iterable[RateKey]) -> dict[RateKey, Optional[Decimal]]:
+        """Get cached rates, keys which aren't cached are omitted and `None` means the rate is unavailable."""
+        keys = list(keys)
+        values = await self.backend.get_many([self._rate_key(rate_date, currency) for rate_date, currency in keys])
+        return {key: Decimal(value) if value else None for key, value in zip(keys, values) if value is not None}
+
+    async def set_rates(self, rates: dict[RateKey, Optional[Decimal]]) -> None:
+        now = self._clock()
+        permanent = {}
+        unavailable = {}
+        for (rate_date, currency), rate in rates.items():
+            if rate is not None:
+                permanent[self._rate_key(rate_date, currency)] = str(rate)
+            elif is_unavailable_rate_final(rate_date, now):
+                permanent[self._rate_key(rate_date, currency)] = ""
+            else:
+                unavailable[self._rate_key(rate_date, currency)] = ""
+        if permanent:
+            await self.backend.set_many(permanent)
+        if unavailable:
+            await self.backend.set_many(unavailable, ttl=self.negative_ttl)
+
+    async def get_month_tables(self, year: int, month: int) -> tuple[dict[date, str], datetime]:
+        (value,) = await self.backend.get_many([self._month_tables_key(year, month)])
+        if value is None:
+            raise MonthTablesNotCached()
+        data = json.loads(value)
+        tables = {date.fromisoformat(table_date): table_id for table_date, table_id in data["tables"].items()}
+        return tables, datetime.fromisoformat(data["fetched_at"])
+
+    async def set_month_tables(
+        self, year: int, month: int, tables: dict[date, str], fetched_at: datetime, ttl: Optional[float] = None
+    ) -> None:
+        data = {
+            "tables": {table_date.isoformat(): table_id for table_date, table_id in tables.items()},
+            "fetched_at": fetched_at.isoformat(),
+        }
+        await self.backend.set_many({self._month_tables_key(year, month): json.dumps(data)}, ttl=ttl)
+
+    @asynccontextmanager
+    async def fill_lock(self, name: str) -> AsyncIterator[None]:
+        """Lock held while filling missing entries from NBP, if it can't be acquired in time the fill proceeds."""
+        async with self.backend.lock(f"{self.prefix}:lock:{name}", self.lock_timeout) as acquired:
+            if not acquired:
+                logger.warning("Shared cache lock %s not acquired in %.1fs, filling anyway", name, self.lock_timeout)
+            yield
@@ -0,0 +1,34 @@
+import asyncio
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Coalesces concurrent calls sharing the same key into a single in-flight coroutine.
+
+    The first caller for a key starts the work, every caller arriving while it is still running awaits the same
+    task and gets its result or exception. Once the task finishes the key is forgotten, so results are not cached.
+    """
+
+    def __init__(self):
+        self._in_flight: dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._in_flight)
+
+    async def call(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done_task: self._forget(key, done_task))
+        # shield, so a cancelled waiter doesn't cancel the work shared with other waiters
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            # mark exception as retrieved, waiters may have been cancelled before the task finished
+            task.exception()
@@ -0,0 +1,182 @@
+"""Background prefetch of today's NBP table, so requests after publication don't pay the cold scrape penalty."""
+import asyncio
+import logging
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Callable, Optional
+
+import httpx
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from currency_exchange.database.repositories import ExchangeRateRepository
+from currency_exchange.enums import FOREIGN_CURRENCIES
+from currency_exchange.exceptions import ExchangeRateUnavailable
+from currency_exchange.services.exchange_rate_cache import ExchangeRateCache, RateKey
+from currency_exchange.services.nbp_api import NBPApiService
+from currency_exchange.services.shared_cache import SharedCache
+
+logger = logging.getLogger(__name__)
+
+# key of the postgres advisory lock held by the worker elected to fetch, spells "NBP"
+PREFETCH_LOCK_KEY = 0x4E4250
+
+
+class AdvisoryLockLeaderElection:
+    """Leader election between workers with a postgres session advisory lock.
+
+    The leader holds the lock on a dedicated connection for as long as it runs, when the worker dies the connection
+    closes and the lock is taken over by another worker on its next attempt.
+    """
+
+    def __init__(self, engine: AsyncEngine, key: int = PREFETCH_LOCK_KEY):
+        self.engine = engine
+        self.key = key
+        self._connection: Optional[AsyncConnection] = None
+
+    async def is_leader(self) -> bool:
+        if self._connection is not None:
+            try:
+                await self._connection.execute(text("SELECT 1"))
+                return True
+            except Exception:  # pylint: disable=broad-except
+                # the lock is gone with the connection, it must not be returned to the pool
+                logger.warning("Leader connection lost, giving up leadership", exc_info=True)
+                await self._connection.invalidate()
+                await self._connection.close()
+                self._connection = None
+
+        connection = await self.engine.connect()
+        try:
+            # outside of a transaction, the connection idles between ticks
+            await connection.execution_options(isolation_level="AUTOCOMMIT")
+            acquired = (await connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key})).scalar()
+        except BaseException:
+            await connection.close()
+            raise
+        if acquired:
+            self._connection = connection
+        else:
+            await connection.close()
+        return acquired
+
+    async def release(self) -> None:
+        if self._connection is None:
+            return
+        try:
+            # session locks outlive pooled connections, so the lock is released explicitly
+            await self._connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.key})
+        finally:
+            await self._connection.close()
+            self._connection = None
+
+
+class TablePrefetcher:
+    """Polls NBP for today's table between `start` and `deadline` (server local time) every `poll_interval` seconds.
+
+    The elected worker fetches the table from NBP JSON api once it is published and stores rates of all currencies,
+    replacing null rates stored by requests before the publication. Other workers wait until the rates are stored and
+    load them into their cache. Polling stops for the day once rates are loaded, or at the deadline on holidays.
+    """
+
+    def __init__(
+        self,
+        session_factory: sessionmaker,
+        repository_factory: Callable[[AsyncSession], ExchangeRateRepository],
+        nbp_api_service: NBPApiService,
+        exchange_rate_cache: ExchangeRateCache,
+        leader_election: AdvisoryLockLeaderElection,
+        shared_cache: Optional[SharedCache] = None,
+        start: time = time(11, 45),
+        deadline: time = time(16, 0),
+        poll_interval: float = 60.0,
+        clock: Callable[[], datetime] = datetime.now,
+    ):
+        self.session_factory = session_factory
+        self.repository_factory = repository_factory
+        self.nbp_api_service = nbp_api_service
+        self.exchange_rate_cache = exchange_rate_cache
+        self.leader_election = leader_election
+        self.shared_cache = shared_cache
+        self.start = start
+        self.deadline = deadline
+        self.poll_interval = poll_interval
+        self._clock = clock
+        self._loaded_date: Optional[date] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _is_polling_time(self, now: datetime) -> bool:
+        return now.weekday() < 5 and self.start <= now.time() <= self.deadline and self._loaded_date != now.date()
+
+    async def run_once(self) -> bool:
+        """Single poll, returns whether today's rates were loaded by it."""
+        now = self._clock()
+        if not self._is_polling_time(now):
+            return False
+
+        today = now.date()
+        async with self.session_factory() as session:
+            repository = self.repository_factory(session)
+            if await self.leader_election.is_leader():
+                rates = await self._fetch_rates(today, repository)
+            else:
+                rates = await self._load_stored_rates(today, repository)
+        if rates is None:
+            return False
+
+        for (rate_date, currency), rate in rates.items():
+            self.exchange_rate_cache.set(rate_date, currency, rate)
+        self._loaded_date = today
+        logger.info("Rates of %s prefetched", today)
+        return True
+
+    async def _fetch_rates(
+        self, rate_date: date, repository: ExchangeRateRepository
+    ) -> Optional[dict[RateKey, Optional[Decimal]]]:
+        try:
+            table_rates = await self.nbp_api_service.get_exchange_rates_by_date(rate_date)
+        except ExchangeRateUnavailable:
+            # not published yet
+            return None
+        except httpx.HTTPError:
+            logger.warning("Prefetch of rates of %s failed", rate_date, exc_info=True)
+            return None
+
+        rates = {(rate_date, currency): table_rates.get(currency) for currency in FOREIGN_CURRENCIES}
+        await repository.insert_exchange_rates(rates)
+        if self.shared_cache is not None:
+            await self.shared_cache.set_rates(rates)
+        return rates
+
+    @staticmethod
+    async def _load_stored_rates(
+        rate_date: date, repository: ExchangeRateRepository
+    ) -> Optional[dict[RateKey, Optional[Decimal]]]:
+        rates = await repository.get_exchange_rates((rate_date, currency) for currency in FOREIGN_CURRENCIES)
+        if len(rates) < len(FOREIGN_CURRENCIES) or any(rate is None for rate in rates.values()):
+            # the leader hasn't stored the published table yet
+            return None
+        return rates
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Prefetch of today's rates failed")
+            await asyncio.sleep(self.poll_interval)
+
+    def start_polling(self) -> None:
+        self._task = asyncio.create_task(self.run())
+
+    async def stop_polling(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.leader_election.release()
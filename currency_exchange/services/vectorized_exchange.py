@@ -0,0 +1,108 @@
+"""Vectorized exchange of many amounts at once for batch and reconciliation jobs, requires optional `numpy` dependency.
+
+Rates are gathered from a dense `days x currencies` matrix, built from stored rates or from a rate snapshot, and all
+conversions, cross exchanges through PLN included, are computed with a few array operations.
+
+Rounding: conversions are computed in float64, `amount * in_rate / out_rate` with PLN rate 1, each operation rounded
+to nearest as in IEEE 754. Results may differ from the `Decimal` path of `CurrencyExchangeService` by a few units in
+the last place. With `decimals` amounts are rounded half to even to that many decimal places (`numpy.round`, which
+rounds the binary value, so a decimal tie like 0.125 may not be a tie in float64).
+"""
+from datetime import date
+from decimal import Decimal
+from typing import Iterable, NamedTuple, Optional, Sequence, Union
+
+from currency_exchange.enums import FOREIGN_CURRENCIES, Currency
+from currency_exchange.services.rate_snapshot import RateSnapshot
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+
+class ExchangeArrays(NamedTuple):
+    # converted amounts, NaN where a rate is unavailable
+    amounts: "np.ndarray"
+    # units of out currency per one unit of in currency, NaN where a rate is unavailable
+    rates: "np.ndarray"
+    available: "np.ndarray"
+
+
+class RateMatrix:
+    """Rates of currencies (PLN per unit) for consecutive days from `first_day`, NaN where the rate is unavailable or
+    unknown. PLN has a column of ones, so exchanges from and to PLN don't need special cases."""
+
+    def __init__(self, first_day: date, currencies: Sequence[Currency], values: "np.ndarray"):
+        if np is None:
+            raise RuntimeError("Vectorized exchange requires 'numpy' package, install with 'numpy' extra.")
+        self.first_day = first_day
+        self.currencies = [*currencies, Currency.PLN]
+        self._columns = {currency: column for column, currency in enumerate(self.currencies)}
+        self.values = np.column_stack([values, np.ones(len(values))])
+
+    @property
+    def days(self) -> int:
+        return len(self.values)
+
+    @classmethod
+    def from_rates(
+        cls,
+        rates: Iterable[tuple[date, Currency, Optional[Decimal]]],
+        currencies: Sequence[Currency] = FOREIGN_CURRENCIES,
+    ) -> "RateMatrix":
+        """Build the matrix from (rate_date, currency, rate) rows, e.g. `ExchangeRateRepository.iter_final_rates`."""
+        if np is None:
+            raise RuntimeError("Vectorized exchange requires 'numpy' package, install with 'numpy' extra.")
+        columns = {currency: column for column, currency in enumerate(currencies)}
+        rows = [(rate_date, columns[currency], rate) for rate_date, currency, rate in rates if currency in columns]
+        first_day = min((rate_date for rate_date, _, _ in rows), default=date.today())
+        last_day = max((rate_date for rate_date, _, _ in rows), default=first_day)
+        values = np.full(((last_day - first_day).days + 1, len(currencies)), np.nan)
+        for rate_date, column, rate in rows:
+            if rate is not None:
+                values[(rate_date - first_day).days, column] = float(rate)
+        return cls(first_day, currencies, values)
+
+    @classmethod
+    def from_snapshot(cls, snapshot: RateSnapshot) -> "RateMatrix":
+        """Build the matrix from the scaled integer rates of a snapshot, read straight from the mapped file."""
+        if np is None:
+            raise RuntimeError("Vectorized exchange requires 'numpy' package, install with 'numpy' extra.")
+        shape = (snapshot.days, len(snapshot.currencies))
+        scaled = np.frombuffer(snapshot.values, dtype="<i8").reshape(shape)
+        known = np.unpackbits(np.frombuffer(snapshot.bitmap, dtype=np.uint8), count=scaled.size, bitorder="little")
+        values = np.where((known.reshape(shape) == 1) & (scaled != 0), scaled / 10**snapshot.scale, np.nan)
+        return cls(snapshot.first_day, snapshot.currencies, values)
+
+    def day_indexes(self, dates: Union[Sequence[date], "np.ndarray"]) -> "np.ndarray":
+        """Indexes of days into the matrix, days outside of it get indexes out of range and unavailable rates."""
+        return (np.asarray(dates, dtype="datetime64[D]") - np.datetime64(self.first_day, "D")).astype(np.int64)
+
+    def currency_indexes(self, currencies: Union[Sequence[Currency], "np.ndarray"]) -> "np.ndarray":
+        """Indexes of currencies (or their ISO codes) into the matrix, looked up once per distinct code."""
+        codes, inverse = np.unique(np.asarray(currencies, dtype=object), return_inverse=True)
+        lookup = np.array([self._columns[Currency(code)] for code in codes], dtype=np.int64)
+        return lookup[inverse].reshape(-1)
+
+    def exchange(
+        self,
+        amounts: "np.ndarray",
+        day_indexes: "np.ndarray",
+        in_currencies: "np.ndarray",
+        out_currencies: "np.ndarray",
+        decimals: Optional[int] = None,
+    ) -> ExchangeArrays:
+        """Exchange amounts on days between currencies, all given as equally long arrays of amounts and of indexes
+        from `day_indexes` and `currency_indexes`. Cross exchanges are triangulated through PLN."""
+        amounts = np.asarray(amounts, dtype=np.float64)
+        in_day = (day_indexes >= 0) & (day_indexes < self.days)
+        rows = np.where(in_day, day_indexes, 0)
+        rates = self.values[rows, in_currencies] / self.values[rows, out_currencies]
+        rates[~in_day] = np.nan
+        # same currency exchange doesn't need a rate, like in `CurrencyExchangeService`
+        rates[in_currencies == out_currencies] = 1.0
+        converted = amounts * rates
+        if decimals is not None:
+            converted = np.round(converted, decimals)
+        return ExchangeArrays(amounts=converted, rates=rates, available=~np.isnan(rates))
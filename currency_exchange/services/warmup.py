@@ -0,0 +1,91 @@
+"""Background warm-up of a worker after startup, so its first requests don't pay for the first database connection and
+cold cache."""
+import asyncio
+import logging
+import time
+from datetime import date, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy.orm import sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from currency_exchange.database.repositories import ExchangeRateRepository
+from currency_exchange.enums import FOREIGN_CURRENCIES
+from currency_exchange.services.exchange_rate_cache import ExchangeRateCache
+from currency_exchange.services.nbp_parsers import NBPParser
+
+logger = logging.getLogger(__name__)
+
+
+class Warmup:
+    """Opens the first database connection and loads stored rates of the last `rate_days` days into the in-memory
+    cache. With `load_parser` it also imports the NBP parser, which workers serving from cache and database never use.
+
+    Runs in the background while the worker already serves requests, which are only slower until it is `warm`.
+    A failed warm-up is retried every `retry_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        session_factory: sessionmaker,
+        repository_factory: Callable[[AsyncSession], ExchangeRateRepository],
+        parser: NBPParser,
+        exchange_rate_cache: ExchangeRateCache,
+        rate_days: int = 31,
+        retry_interval: float = 5.0,
+        clock: Callable[[], date] = date.today,
+        load_parser: bool = False,
+    ):
+        self.session_factory = session_factory
+        self.repository_factory = repository_factory
+        self.parser = parser
+        self.exchange_rate_cache = exchange_rate_cache
+        self.rate_days = rate_days
+        self.retry_interval = retry_interval
+        self._clock = clock
+        self.load_parser = load_parser
+        self.warm = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self) -> None:
+        start = time.perf_counter()
+        if self.load_parser:
+            # imported in a thread, so requests waiting for the database keep being served meanwhile
+            await asyncio.to_thread(self.parser.load)
+
+        today = self._clock()
+        keys = [
+            (today - timedelta(days=days), currency)
+            for days in range(self.rate_days)
+            for currency in FOREIGN_CURRENCIES
+        ]
+        async with self.session_factory() as session:
+            # the pool opens its first connection even without rates to load
+            await session.connection()
+            rates = await self.repository_factory(session).get_exchange_rates(keys)
+        for (rate_date, currency), rate in rates.items():
+            self.exchange_rate_cache.set(rate_date, currency, rate)
+
+        self.warm = True
+        logger.info("Worker warmed up in %.2fs, %d rates cached", time.perf_counter() - start, len(rates))
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+                return
+            except Exception:  # pylint: disable=broad-except
+                logger.warning("Warm-up failed, retrying in %.0fs", self.retry_interval, exc_info=True)
+            await asyncio.sleep(self.retry_interval)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
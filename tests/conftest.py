@@ -1,6 +1,8 @@
 # pylint: disable=redefined-outer-name
 import asyncio
 from asyncio import AbstractEventLoop
+from functools import partial
+from typing import Callable
 
 import pytest
 import pytest_asyncio
@@ -14,10 +16,25 @@ from sqlmodel.ext.asyncio.session import AsyncSession
 
 from currency_exchange.asgi import setup_application
 from currency_exchange.config import AppConfig
-from currency_exchange.database.repositories import ExchangeRateRepository
-from currency_exchange.dependencies import get_async_db_session
+from currency_exchange.database.repositories import (
+    ExchangeRateRepository,
+    RateTableRepository,
+)
+from currency_exchange.dependencies import (
+    create_exchange_rate_repository,
+    get_async_db_session,
+    get_nbp_api_service,
+    get_rate_snapshot,
+    get_rate_source,
+    get_shared_cache,
+    get_warmup,
+)
 from currency_exchange.services.currency_exchange import CurrencyExchangeService
 from currency_exchange.services.nbp_api import NBPApiService
+from currency_exchange.services.rate_table_index import (
+    MonthTablesCache,
+    RateTableIndexService,
+)
 
 
 @pytest.fixture(scope="session")
@@ -64,13 +81,21 @@ async def async_session(app_config: AppConfig) -> AsyncSession:
 
 
 @pytest.fixture
-def test_app(async_session: AsyncSession) -> FastAPI:
+def test_app(async_session: AsyncSession, nbp_api_service: NBPApiService) -> FastAPI:
     app = setup_application()
 
     async def test_get_async_db_session() -> AsyncSession:
         yield async_session
 
+    async def test_get_nbp_api_service() -> NBPApiService:
+        return nbp_api_service
+
     app.dependency_overrides[get_async_db_session] = test_get_async_db_session
+    app.dependency_overrides[get_nbp_api_service] = test_get_nbp_api_service
+    app.dependency_overrides[get_shared_cache] = lambda: None
+    app.dependency_overrides[get_rate_source] = lambda: None
+    app.dependency_overrides[get_warmup] = lambda: None
+    app.dependency_overrides[get_rate_snapshot] = lambda: None
     return app
 
 
@@ -86,12 +111,33 @@ def nbp_api_service() -> NBPApiService:
 
 
 @pytest.fixture
-def exchange_rate_repository(async_session: AsyncSession) -> ExchangeRateRepository:
-    return ExchangeRateRepository(async_session)
+def exchange_rate_repository_factory(app_config: AppConfig) -> Callable[[AsyncSession], ExchangeRateRepository]:
+    return partial(create_exchange_rate_repository, app_config)
+
+
+@pytest.fixture
+def exchange_rate_repository(
+    async_session: AsyncSession, exchange_rate_repository_factory: Callable[[AsyncSession], ExchangeRateRepository]
+) -> ExchangeRateRepository:
+    return exchange_rate_repository_factory(async_session)
+
+
+@pytest.fixture
+def rate_table_repository(async_session: AsyncSession) -> RateTableRepository:
+    return RateTableRepository(async_session)
+
+
+@pytest.fixture
+def rate_table_index_service(
+    rate_table_repository: RateTableRepository, nbp_api_service: NBPApiService
+) -> RateTableIndexService:
+    return RateTableIndexService(rate_table_repository, nbp_api_service, MonthTablesCache())
 
 
 @pytest.fixture
 def currency_exchange_service(
-    exchange_rate_repository: ExchangeRateRepository, nbp_api_service: NBPApiService
+    exchange_rate_repository: ExchangeRateRepository,
+    nbp_api_service: NBPApiService,
+    rate_table_index_service: RateTableIndexService,
 ) -> CurrencyExchangeService:
-    return CurrencyExchangeService(exchange_rate_repository, nbp_api_service)
+    return CurrencyExchangeService(exchange_rate_repository, nbp_api_service, rate_table_index_service)
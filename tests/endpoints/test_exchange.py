@@ -1,3 +1,5 @@
+import json
+from datetime import date
 from decimal import Decimal
 from http import HTTPStatus
 from typing import Any
@@ -46,6 +48,192 @@ async def test_exchange__not_found(async_client: AsyncClient):
     assert resp.status_code == HTTPStatus.NOT_FOUND, resp.json()
 
 
-async def test_exchange_missing_pln__bad_request(async_client: AsyncClient):
-    resp = await async_client.post("/exchange", json={"date": "2010-01-10", "in_currency": "USD", "out_currency": "EUR", "amount": 1000})
+async def test_exchange_cross_currency__ok(async_client: AsyncClient):
+    rates = {(date(2010, 1, 11), Currency.USD): Decimal("2.821"), (date(2010, 1, 11), Currency.EUR): Decimal("4.0771")}
+    payload = {"exchange_date": "2010-01-11", "in_currency": "USD", "out_currency": "EUR", "amount": 1000}
+
+    with patch(
+        "currency_exchange.services.currency_exchange.CurrencyExchangeService._get_exchange_rates", return_value=rates
+    ) as mock:
+        resp = await async_client.post("/exchange", json=payload)
+
+    assert resp.status_code == HTTPStatus.OK, resp.json()
+    mock.assert_awaited_once_with(set(rates))
+    assert resp.json() == {
+        "amount": float(Decimal(1000) * Decimal("2.821") / Decimal("4.0771")),
+        "rate": float(Decimal("2.821") / Decimal("4.0771")),
+    }
+
+
+async def test_exchange_batch__ok(async_client: AsyncClient):
+    rates = {(date(2010, 1, 11), Currency.USD): Decimal("2.821"), (date(2010, 1, 10), Currency.USD): None}
+    payload = [
+        {"exchange_date": "2010-01-11", "in_currency": "USD", "out_currency": "PLN", "amount": 1000},
+        {"exchange_date": "2010-01-10", "in_currency": "USD", "out_currency": "PLN", "amount": 1000},
+        {"exchange_date": "2010-01-11", "in_currency": "PLN", "out_currency": "USD", "amount": 1000},
+    ]
+
+    with patch(
+        "currency_exchange.services.currency_exchange.CurrencyExchangeService._get_exchange_rates", return_value=rates
+    ) as mock:
+        resp = await async_client.post("/exchange/batch", json=payload)
+
+    assert resp.status_code == HTTPStatus.OK, resp.json()
+    mock.assert_awaited_once_with({(date(2010, 1, 11), Currency.USD), (date(2010, 1, 10), Currency.USD)})
+    assert resp.json() == [
+        {"amount": float(Decimal(1000) * Decimal("2.821")), "rate": 2.821, "error": None},
+        {"amount": None, "rate": None, "error": "Exchange rate unavailable for requested day."},
+        {"amount": float(Decimal(1000) / Decimal("2.821")), "rate": float(1 / Decimal("2.821")), "error": None},
+    ]
+
+
+async def test_exchange_batch_nonexistent_date__bad_request(async_client: AsyncClient):
+    payload = [
+        {"exchange_date": "2010-01-11", "in_currency": "USD", "out_currency": "PLN", "amount": 1000},
+        {"exchange_date": "2010-13-45", "in_currency": "USD", "out_currency": "PLN", "amount": 1000},
+        {"exchange_date": "2010-01-11", "in_currency": "PLN", "out_currency": "USD", "amount": 1000},
+    ]
+
+    with patch("currency_exchange.services.currency_exchange.CurrencyExchangeService._get_exchange_rates") as mock:
+        resp = await async_client.post("/exchange/batch", json=payload)
+
+    assert resp.status_code == HTTPStatus.UNPROCESSABLE_ENTITY, resp.json()
+    assert resp.json()["detail"][0]["loc"] == ["body", 1, "exchange_date"]
+    mock.assert_not_awaited()
+
+
+async def test_exchange_batch_empty__bad_request(async_client: AsyncClient):
+    resp = await async_client.post("/exchange/batch", json=[])
     assert resp.status_code == HTTPStatus.UNPROCESSABLE_ENTITY, resp.json()
+
+
+async def test_exchange_stream__ok(async_client: AsyncClient):
+    rates = {(date(2010, 1, 11), Currency.USD): Decimal("2.821"), (date(2010, 1, 10), Currency.USD): None}
+    lines = [
+        b'{"exchange_date": "2010-01-11", "in_currency": "USD", "out_currency": "PLN", "amount": 1000}',
+        b'{"exchange_date": "2010-01-10", "in_currency": "USD", "out_currency": "PLN", "amount": 1000}',
+        b"",
+        b'{"exchange_date": "2010-01-11", "in_currency": "XXX", "out_currency": "PLN", "amount": 1000}',
+        b"not a json",
+        b'{"exchange_date": "2010-01-11", "in_currency": "PLN", "out_currency": "USD", "amount": 1000}',
+    ]
+
+    async def body():
+        content = b"\n".join(lines)
+        for offset in range(0, len(content), 7):
+            yield content[offset : offset + 7]
+
+    with patch(
+        "currency_exchange.services.currency_exchange.CurrencyExchangeService._get_exchange_rates", return_value=rates
+    ), patch("currency_exchange.endpoints.exchange.app_config.stream_chunk_size", 2):
+        resp = await async_client.post("/exchange/stream", content=body())
+
+    assert resp.status_code == HTTPStatus.OK
+    assert resp.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in resp.text.splitlines()] == [
+        {"amount": float(Decimal(1000) * Decimal("2.821")), "rate": 2.821, "error": None},
+        {"amount": None, "rate": None, "error": "Exchange rate unavailable for requested day."},
+        {"amount": None, "rate": None, "error": "Invalid exchange request."},
+        {"amount": None, "rate": None, "error": "Invalid exchange request."},
+        {"amount": float(Decimal(1000) / Decimal("2.821")), "rate": float(1 / Decimal("2.821")), "error": None},
+    ]
+
+
+async def test_exchange_stream_nonexistent_date__error(async_client: AsyncClient):
+    rates = {(date(2010, 1, 11), Currency.USD): Decimal("2.821")}
+    content = b"\n".join(
+        [
+            b'{"exchange_date": "2010-13-45", "in_currency": "USD", "out_currency": "PLN", "amount": 1000}',
+            b'{"exchange_date": "2010-01-11", "in_currency": "USD", "out_currency": "PLN", "amount": 1000}',
+        ]
+    )
+
+    with patch(
+        "currency_exchange.services.currency_exchange.CurrencyExchangeService._get_exchange_rates", return_value=rates
+    ):
+        resp = await async_client.post("/exchange/stream", content=content)
+
+    assert resp.status_code == HTTPStatus.OK
+    assert [json.loads(line) for line in resp.text.splitlines()] == [
+        {"amount": None, "rate": None, "error": "Invalid exchange request."},
+        {"amount": float(Decimal(1000) * Decimal("2.821")), "rate": 2.821, "error": None},
+    ]
+
+
+async def test_exchange_stream_too_long_line__error(async_client: AsyncClient):
+    content = b'{"amount": "' + b"1" * 10_000 + b'"}\n{}'
+    resp = await async_client.post("/exchange/stream", content=content)
+
+    assert resp.status_code == HTTPStatus.OK
+    assert [json.loads(line) for line in resp.text.splitlines()] == [
+        {"amount": None, "rate": None, "error": "Invalid exchange request."},
+        {"amount": None, "rate": None, "error": "Invalid exchange request."},
+    ]
+
+
+@pytest.mark.parametrize("chunk_size", [7, 10_000])
+async def test_exchange_stream_too_long_valid_line__error(async_client: AsyncClient, chunk_size: int):
+    rates = {(date(2010, 1, 11), Currency.USD): Decimal("2.821")}
+    line = b'{"exchange_date": "2010-01-11", "in_currency": "USD", "out_currency": "PLN", "amount": 1000}'
+    # valid request padded over the limit, ended by a newline within a chunk or split across chunks
+    content = b"\n".join([line + b" " * 100, line, b""])
+
+    async def body():
+        for offset in range(0, len(content), chunk_size):
+            yield content[offset : offset + chunk_size]
+
+    with patch(
+        "currency_exchange.services.currency_exchange.CurrencyExchangeService._get_exchange_rates", return_value=rates
+    ), patch("currency_exchange.endpoints.exchange.app_config.stream_max_line_length", 100):
+        resp = await async_client.post("/exchange/stream", content=body())
+
+    assert resp.status_code == HTTPStatus.OK
+    assert [json.loads(line) for line in resp.text.splitlines()] == [
+        {"amount": None, "rate": None, "error": "Invalid exchange request."},
+        {"amount": float(Decimal(1000) * Decimal("2.821")), "rate": 2.821, "error": None},
+    ]
+
+
+async def test_exchange_get__historical_cacheable(async_client: AsyncClient):
+    params = {"exchange_date": "2010-01-11", "in_currency": "USD", "out_currency": "PLN", "amount": 1000}
+    with patch(
+        "currency_exchange.services.currency_exchange.CurrencyExchangeService._get_exchange_rate",
+        return_value=Decimal("2.821"),
+    ):
+        resp = await async_client.get("/exchange", params=params)
+
+    assert resp.status_code == HTTPStatus.OK
+    assert resp.json() == {"amount": float(Decimal(1000) * Decimal("2.821")), "rate": 2.821}
+    assert "immutable" in resp.headers["cache-control"]
+    assert resp.headers["last-modified"] == "Mon, 11 Jan 2010 00:00:00 GMT"
+
+    # conditional request is answered without resolving the rate
+    with patch(
+        "currency_exchange.services.currency_exchange.CurrencyExchangeService.exchange",
+        side_effect=AssertionError("rate shouldn't be resolved"),
+    ):
+        resp = await async_client.get("/exchange", params=params, headers={"If-None-Match": resp.headers["etag"]})
+        assert resp.status_code == HTTPStatus.NOT_MODIFIED
+
+        params["amount"] = 100
+        with pytest.raises(AssertionError):
+            await async_client.get("/exchange", params=params, headers={"If-None-Match": resp.headers["etag"]})
+
+
+async def test_exchange_get__today_short_cache(async_client: AsyncClient):
+    params = {"exchange_date": date.today().isoformat(), "in_currency": "PLN", "out_currency": "EUR", "amount": 1}
+    with patch(
+        "currency_exchange.services.currency_exchange.CurrencyExchangeService._get_exchange_rate",
+        return_value=Decimal("4.0771"),
+    ) as mock:
+        resp = await async_client.get("/exchange", params=params)
+        assert resp.status_code == HTTPStatus.OK
+        assert resp.headers["cache-control"] == "public, max-age=60"
+
+        resp = await async_client.get("/exchange", params=params, headers={"If-None-Match": resp.headers["etag"]})
+        assert resp.status_code == HTTPStatus.NOT_MODIFIED
+        assert mock.await_count == 2
+
+        mock.return_value = Decimal("4.08")
+        resp = await async_client.get("/exchange", params=params, headers={"If-None-Match": resp.headers["etag"]})
+        assert resp.status_code == HTTPStatus.OK
@@ -0,0 +1,38 @@
+from http import HTTPStatus
+from typing import Callable
+
+from fastapi import FastAPI
+from httpx import AsyncClient
+from sqlalchemy.orm import sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from currency_exchange.database.repositories import ExchangeRateRepository
+from currency_exchange.dependencies import get_warmup
+from currency_exchange.services.exchange_rate_cache import ExchangeRateCache
+from currency_exchange.services.nbp_parsers import LxmlParser
+from currency_exchange.services.warmup import Warmup
+
+
+async def test_ready__cold_until_warmed_up(
+    test_app: FastAPI,
+    async_client: AsyncClient,
+    async_session: AsyncSession,
+    exchange_rate_repository_factory: Callable[[AsyncSession], ExchangeRateRepository],
+):
+    warmup = Warmup(
+        sessionmaker(bind=async_session.bind, class_=AsyncSession, expire_on_commit=False),
+        exchange_rate_repository_factory,
+        LxmlParser(),
+        ExchangeRateCache(),
+    )
+    test_app.dependency_overrides[get_warmup] = lambda: warmup
+
+    resp = await async_client.get("/ready")
+    assert resp.status_code == HTTPStatus.OK
+    assert resp.json() == {"status": "cold"}
+
+    await warmup.run_once()
+
+    resp = await async_client.get("/ready")
+    assert resp.status_code == HTTPStatus.OK
+    assert resp.json() == {"status": "warm"}
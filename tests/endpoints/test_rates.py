@@ -0,0 +1,107 @@
+import json
+from datetime import date
+from decimal import Decimal
+from http import HTTPStatus
+from unittest.mock import patch
+
+import httpx
+import pytest
+from httpx import AsyncClient
+
+from currency_exchange.enums import FOREIGN_CURRENCIES
+from currency_exchange.exceptions import ExchangeRateUnavailable
+
+
+async def test_rates__streamed_with_fallback(async_client: AsyncClient, exchange_rate_repository):
+    await exchange_rate_repository.insert_exchange_rates(
+        {
+            (rate_date, currency): rate
+            for rate_date, rate in [
+                (date(2010, 1, 8), Decimal("2.8")),
+                (date(2010, 1, 9), None),
+                (date(2010, 1, 10), None),
+                (date(2010, 1, 11), Decimal("2.821")),
+            ]
+            for currency in FOREIGN_CURRENCIES
+        }
+    )
+
+    with patch(
+        "currency_exchange.services.rate_table_index.RateTableIndexService.get_table_id",
+        side_effect=ExchangeRateUnavailable(),
+    ), patch("currency_exchange.endpoints.rates.app_config.stream_chunk_size", 2):
+        resp = await async_client.get("/rates/USD", params={"from": "2010-01-08", "to": "2010-01-11", "fallback": True})
+
+    assert resp.status_code == HTTPStatus.OK
+    assert resp.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in resp.text.splitlines()] == [
+        {"rate_date": "2010-01-08", "rate": 2.8, "table_date": "2010-01-08", "resolved": True},
+        {"rate_date": "2010-01-09", "rate": 2.8, "table_date": "2010-01-08", "resolved": True},
+        {"rate_date": "2010-01-10", "rate": 2.8, "table_date": "2010-01-08", "resolved": True},
+        {"rate_date": "2010-01-11", "rate": 2.821, "table_date": "2010-01-11", "resolved": True},
+    ]
+
+
+@pytest.mark.parametrize(
+    "currency, params",
+    [
+        ("PLN", {"from": "2010-01-08", "to": "2010-01-11"}),
+        ("USD", {"from": "2010-01-11", "to": "2010-01-08"}),
+        ("USD", {"from": "1990-01-01", "to": "2010-01-08"}),
+    ],
+)
+async def test_rates__invalid_request(async_client: AsyncClient, currency: str, params: dict[str, str]):
+    resp = await async_client.get(f"/rates/{currency}", params=params)
+
+    assert resp.status_code == HTTPStatus.BAD_REQUEST
+
+
+async def test_rate__single_day_cacheable(async_client: AsyncClient, exchange_rate_repository):
+    await exchange_rate_repository.insert_exchange_rates(
+        {(date(2010, 1, 11), currency): Decimal("2.821") for currency in FOREIGN_CURRENCIES}
+    )
+
+    resp = await async_client.get("/rates/USD/2010-01-11")
+
+    assert resp.status_code == HTTPStatus.OK
+    assert resp.json() == {"rate_date": "2010-01-11", "rate": 2.821, "table_date": "2010-01-11", "resolved": True}
+    assert "immutable" in resp.headers["cache-control"]
+
+    with patch(
+        "currency_exchange.services.currency_exchange.CurrencyExchangeService.get_rate_series",
+        side_effect=AssertionError("rate shouldn't be resolved"),
+    ):
+        resp = await async_client.get("/rates/USD/2010-01-11", headers={"If-None-Match": f'W/{resp.headers["etag"]}'})
+        assert resp.status_code == HTTPStatus.NOT_MODIFIED
+
+        resp = await async_client.get(
+            "/rates/USD", params={"from": "2010-01-08", "to": "2010-01-11"}, headers={"If-None-Match": "*"}
+        )
+        assert resp.status_code == HTTPStatus.NOT_MODIFIED
+
+
+async def test_rate__unavailable(async_client: AsyncClient):
+    with patch(
+        "currency_exchange.services.rate_table_index.RateTableIndexService.get_table_id",
+        side_effect=ExchangeRateUnavailable(),
+    ):
+        resp = await async_client.get("/rates/USD/2010-01-10")
+
+    assert resp.status_code == HTTPStatus.NOT_FOUND
+    assert "cache-control" not in resp.headers
+
+
+async def test_rates__failed_fetch_not_cached(async_client: AsyncClient):
+    with patch(
+        "currency_exchange.services.rate_table_index.RateTableIndexService.get_table_id",
+        side_effect=httpx.ConnectError("NBP unreachable"),
+    ):
+        resp = await async_client.get("/rates/USD", params={"from": "2010-01-08", "to": "2010-01-11"})
+        single_resp = await async_client.get("/rates/USD/2010-01-11")
+
+    assert resp.status_code == HTTPStatus.OK
+    assert [json.loads(line)["resolved"] for line in resp.text.splitlines()] == [False] * 4
+    assert resp.headers["cache-control"] == "no-cache"
+    assert "etag" not in resp.headers
+    assert single_resp.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert single_resp.headers["cache-control"] == "no-cache"
@@ -1,4 +1,5 @@
 from datetime import date
+from pathlib import Path
 from typing import Optional
 
 from sqlalchemy import and_, select
@@ -13,3 +14,10 @@ async def get_exchange_rate_from_db(
 ) -> Optional[ExchangeRate]:
     query = select(ExchangeRate).where(and_(ExchangeRate.currency == currency, ExchangeRate.rate_date == exchange_date))
     return (await async_session.execute(query)).scalar_one_or_none()
+
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+
+def read_fixture(name: str) -> str:
+    return (FIXTURES_DIR / name).read_text(encoding="utf-8")
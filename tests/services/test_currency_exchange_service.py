@@ -1,16 +1,36 @@
-from datetime import date
+from datetime import date, datetime, timedelta
 from decimal import Decimal
 from unittest.mock import patch
 
 import httpx
 import pytest
+from sqlalchemy import text
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from currency_exchange.enums import Currency
-from currency_exchange.exceptions import ExchangeRateUnavailable
-from currency_exchange.services.currency_exchange import CurrencyExchangeService
+from currency_exchange.database.repositories import ExchangeRateRepository
+from currency_exchange.database.types import RATE_SCALE
+from currency_exchange.enums import FOREIGN_CURRENCIES, Currency
+from currency_exchange.exceptions import (
+    ExchangeRateRecordDoesNotExist,
+    ExchangeRateUnavailable,
+)
+from currency_exchange.services.currency_exchange import (
+    CurrencyExchangeService,
+    ExchangeOrder,
+    RatePoint,
+)
 from tests.helpers import get_exchange_rate_from_db
 
+TABLE_ID = "a001z010101"
+
+
+def patch_get_table_id(**kwargs):
+    return patch("currency_exchange.services.rate_table_index.RateTableIndexService.get_table_id", **kwargs)
+
+
+def patch_get_exchange_rates_from_table(**kwargs):
+    return patch("currency_exchange.services.nbp_api.NBPApiService.get_exchange_rates_from_table", **kwargs)
+
 
 @pytest.mark.parametrize(
     "in_currency, out_currency, rate, amount, exchange_date",
@@ -38,18 +58,27 @@ async def test_exchange_service__rate_saved(  # pylint: disable=too-many-argumen
         foreign_currency = in_currency
         expected_result = float(Decimal(amount) * rate)
 
-    with patch("currency_exchange.services.nbp_api.NBPApiService.get_exchange_rate", return_value=rate) as mock:
+    with patch_get_table_id(return_value=TABLE_ID), patch_get_exchange_rates_from_table(
+        return_value={foreign_currency: rate}
+    ) as mock:
         result = await currency_exchange_service.exchange(amount=amount, in_currency=in_currency, out_currency=out_currency, exchange_date=exchange_date)
 
         # check if nbp api was called
-        assert result == expected_result
-        mock.assert_awaited_once_with(exchange_date, foreign_currency)
+        assert result.amount == expected_result
+        mock.assert_awaited_once_with(TABLE_ID)
         mock.reset_mock()
 
         # check if record was added to the database
         row = await get_exchange_rate_from_db(async_session, foreign_currency, exchange_date)
         assert row is not None
-        assert row.rate == rate
+        # rates are stored with fixed scale
+        assert row.rate == rate.quantize(Decimal(10) ** -RATE_SCALE)
+
+        # check if currencies missing from the table were stored as unavailable
+        for currency in set(FOREIGN_CURRENCIES) - {foreign_currency}:
+            row = await get_exchange_rate_from_db(async_session, currency, exchange_date)
+            assert row is not None
+            assert row.rate is None
 
         # check if nbp api was not called when record is present
         await currency_exchange_service.exchange(amount=amount, in_currency=in_currency, out_currency=out_currency, exchange_date=exchange_date)
@@ -60,20 +89,19 @@ async def test_exchange_service__rate_saved(  # pylint: disable=too-many-argumen
 async def test_exchange_service_rate_unavailable__raises_exception(
     currency_exchange_service: CurrencyExchangeService, async_session: AsyncSession
 ):
-    with patch(
-        "currency_exchange.services.nbp_api.NBPApiService.get_exchange_rate", side_effect=ExchangeRateUnavailable
-    ) as mock:
+    with patch_get_table_id(side_effect=ExchangeRateUnavailable) as mock:
         # check if nbp api was called
         with pytest.raises(ExchangeRateUnavailable):
             await currency_exchange_service.exchange(amount=1, in_currency=Currency.JPY, out_currency=Currency.PLN, exchange_date=date.today())
 
-        mock.assert_awaited_once_with(date.today(), Currency.JPY)
+        mock.assert_awaited_once_with(date.today())
         mock.reset_mock()
 
-        # check if record was added to the database
-        row = await get_exchange_rate_from_db(async_session, Currency.JPY, date.today())
-        assert row is not None
-        assert row.rate is None
+        # check if records for all currencies were added to the database
+        for currency in FOREIGN_CURRENCIES:
+            row = await get_exchange_rate_from_db(async_session, currency, date.today())
+            assert row is not None
+            assert row.rate is None
 
         # check if nbp api was not called when record is present
         with pytest.raises(ExchangeRateUnavailable):
@@ -85,25 +113,249 @@ async def test_exchange_service_rate_unavailable__raises_exception(
         mock.assert_not_awaited()
 
 
+async def test_exchange_service_whole_table_saved(
+    currency_exchange_service: CurrencyExchangeService, async_session: AsyncSession
+):
+    rates = {Currency.USD: Decimal("2.821"), Currency.EUR: Decimal("4.0771")}
+    with patch_get_table_id(return_value=TABLE_ID), patch_get_exchange_rates_from_table(return_value=rates) as mock:
+        await currency_exchange_service.exchange(amount=1, in_currency=Currency.USD, out_currency=Currency.PLN, exchange_date=date(2010, 1, 11))
+        currency_exchange_service.exchange_rate_cache.clear()
+
+        # check if other currency from the same table is read from the database
+        result = await currency_exchange_service.exchange(amount=1, in_currency=Currency.EUR, out_currency=Currency.PLN, exchange_date=date(2010, 1, 11))
+        assert result.amount == float(rates[Currency.EUR])
+        mock.assert_awaited_once_with(TABLE_ID)
+
+
 async def test_exchange_service_nbp_api_unavailable__raises_exception(
     currency_exchange_service: CurrencyExchangeService, async_session: AsyncSession
 ):
-    with patch(
-        "currency_exchange.services.nbp_api.NBPApiService.get_exchange_rate", side_effect=httpx.HTTPError("Api error")
-    ) as mock:
+    with patch_get_table_id(side_effect=httpx.HTTPError("Api error")) as mock:
         # check if nbp api was called
         with pytest.raises(ExchangeRateUnavailable):
             await currency_exchange_service.exchange(amount=1, in_currency=Currency.JPY, out_currency=Currency.PLN, exchange_date=date.today())
 
-        mock.assert_awaited_once_with(date.today(), Currency.JPY)
+        mock.assert_awaited_once_with(date.today())
 
         # check if record was not added to the database
         row = await get_exchange_rate_from_db(async_session, Currency.JPY, date.today())
         assert row is None
 
 
-async def test_exchange_service_not_pln_exchange__raises_exception(
-        currency_exchange_service: CurrencyExchangeService
+async def test_exchange_service_cross_exchange(
+    currency_exchange_service: CurrencyExchangeService, async_session: AsyncSession
+):
+    rates = {Currency.JPY: Decimal("3.0588"), Currency.EUR: Decimal("4.0771")}
+    with patch_get_table_id(return_value=TABLE_ID), patch_get_exchange_rates_from_table(return_value=rates) as mock:
+        result = await currency_exchange_service.exchange(
+            amount=1000, in_currency=Currency.JPY, out_currency=Currency.EUR, exchange_date=date(2010, 1, 11)
+        )
+
+        # both legs are resolved with a single table fetch
+        mock.assert_awaited_once_with(TABLE_ID)
+        assert result.amount == float(Decimal(1000) * rates[Currency.JPY] / rates[Currency.EUR])
+        assert result.rate == rates[Currency.JPY] / rates[Currency.EUR]
+
+        row = await get_exchange_rate_from_db(async_session, Currency.EUR, date(2010, 1, 11))
+        assert row.rate == rates[Currency.EUR]
+
+
+async def test_exchange_service_same_currency_exchange(currency_exchange_service: CurrencyExchangeService):
+    with patch_get_table_id() as mock:
+        result = await currency_exchange_service.exchange(
+            amount=10, in_currency=Currency.USD, out_currency=Currency.USD, exchange_date=date(2010, 1, 11)
+        )
+
+    assert result.amount == 10
+    assert result.rate == 1
+    mock.assert_not_awaited()
+
+
+async def test_exchange_service_cross_exchange_one_leg_unavailable__raises_exception(
+    currency_exchange_service: CurrencyExchangeService,
+):
+    with patch_get_table_id(return_value=TABLE_ID), patch_get_exchange_rates_from_table(
+        return_value={Currency.EUR: Decimal("4.0771")}
+    ):
+        with pytest.raises(ExchangeRateUnavailable):
+            await currency_exchange_service.exchange(
+                amount=1, in_currency=Currency.JPY, out_currency=Currency.EUR, exchange_date=date(2010, 1, 11)
+            )
+
+
+async def test_exchange_service_exchange_many(
+    currency_exchange_service: CurrencyExchangeService, exchange_rate_repository: ExchangeRateRepository
+):
+    await exchange_rate_repository.insert_exchange_rates(
+        {(date(2010, 1, 8), Currency.USD): Decimal("2.8"), (date(2010, 1, 9), Currency.USD): None}
+    )
+    orders = [
+        ExchangeOrder(amount=10, in_currency=Currency.USD, out_currency=Currency.PLN, exchange_date=date(2010, 1, 8)),
+        ExchangeOrder(amount=10, in_currency=Currency.PLN, out_currency=Currency.EUR, exchange_date=date(2010, 1, 11)),
+        ExchangeOrder(amount=10, in_currency=Currency.USD, out_currency=Currency.PLN, exchange_date=date(2010, 1, 9)),
+        ExchangeOrder(amount=10, in_currency=Currency.PLN, out_currency=Currency.USD, exchange_date=date(2010, 1, 11)),
+        ExchangeOrder(amount=10, in_currency=Currency.PLN, out_currency=Currency.USD, exchange_date=date(2010, 1, 10)),
+    ]
+    table_rates = {Currency.USD: Decimal("2.821"), Currency.EUR: Decimal("4.0771")}
+
+    table_id_patch = patch_get_table_id(side_effect=[ExchangeRateUnavailable, TABLE_ID])
+    with table_id_patch as table_id_mock, patch_get_exchange_rates_from_table(return_value=table_rates) as mock:
+        results = await currency_exchange_service.exchange_many(orders)
+
+    assert [result and result.amount for result in results] == [
+        float(Decimal(10) * Decimal("2.8")),
+        float(Decimal(10) / Decimal("4.0771")),
+        None,
+        float(Decimal(10) / Decimal("2.821")),
+        None,
+    ]
+    # one table fetch per missing date
+    assert [call.args for call in table_id_mock.await_args_list] == [(date(2010, 1, 10),), (date(2010, 1, 11),)]
+    mock.assert_awaited_once_with(TABLE_ID)
+
+
+async def test_exchange_service__rate_series_gaps_fetched_and_fallback(
+    currency_exchange_service: CurrencyExchangeService,
+):
+    await currency_exchange_service.exchange_rate_repository.insert_exchange_rates(
+        {(date(2010, 1, 8), currency): Decimal("2.8") for currency in FOREIGN_CURRENCIES}
+    )
+
+    async def get_table_id(rate_date: date) -> str:
+        if rate_date == date(2010, 1, 11):
+            return TABLE_ID
+        raise ExchangeRateUnavailable()
+
+    with patch_get_table_id(side_effect=get_table_id), patch_get_exchange_rates_from_table(
+        return_value={Currency.USD: Decimal("2.821")}
+    ) as mock:
+        points = [
+            point
+            async for point in currency_exchange_service.get_rate_series(
+                Currency.USD, date(2010, 1, 9), date(2010, 1, 11), fallback=True
+            )
+        ]
+        assert points == [
+            RatePoint(date(2010, 1, 9), Decimal("2.8"), date(2010, 1, 8)),
+            RatePoint(date(2010, 1, 10), Decimal("2.8"), date(2010, 1, 8)),
+            RatePoint(date(2010, 1, 11), Decimal("2.821"), date(2010, 1, 11)),
+        ]
+        mock.assert_awaited_once_with(TABLE_ID)
+        mock.reset_mock()
+
+        # missing days were stored, so the series is served from the database
+        points = [
+            point
+            async for point in currency_exchange_service.get_rate_series(
+                Currency.USD, date(2010, 1, 9), date(2010, 1, 11), chunk_days=2
+            )
+        ]
+        assert points == [
+            RatePoint(date(2010, 1, 9), None, None),
+            RatePoint(date(2010, 1, 10), None, None),
+            RatePoint(date(2010, 1, 11), Decimal("2.821"), date(2010, 1, 11)),
+        ]
+        mock.assert_not_awaited()
+
+
+async def test_exchange_service__rate_series_failed_fetch_unresolved(
+    currency_exchange_service: CurrencyExchangeService,
+):
+    await currency_exchange_service.exchange_rate_repository.insert_exchange_rates(
+        {(date(2010, 1, 8), currency): Decimal("2.8") for currency in FOREIGN_CURRENCIES}
+    )
+
+    async def get_table_id(rate_date: date) -> str:
+        if rate_date == date(2010, 1, 10):
+            raise httpx.ConnectError("NBP unreachable")
+        raise ExchangeRateUnavailable()
+
+    with patch_get_table_id(side_effect=get_table_id):
+        points = [
+            point
+            async for point in currency_exchange_service.get_rate_series(
+                Currency.USD, date(2010, 1, 9), date(2010, 1, 11), fallback=True
+            )
+        ]
+        assert points == [
+            RatePoint(date(2010, 1, 9), Decimal("2.8"), date(2010, 1, 8)),
+            RatePoint(date(2010, 1, 10), None, None, resolved=False),
+            # the failed day may have a table the rate would fall back to
+            RatePoint(date(2010, 1, 11), Decimal("2.8"), date(2010, 1, 8), resolved=False),
+        ]
+
+        points = [
+            point
+            async for point in currency_exchange_service.get_rate_series(
+                Currency.USD, date(2010, 1, 9), date(2010, 1, 11)
+            )
+        ]
+        assert points == [
+            RatePoint(date(2010, 1, 9), None, None),
+            RatePoint(date(2010, 1, 10), None, None, resolved=False),
+            RatePoint(date(2010, 1, 11), None, None),
+        ]
+
+
+async def test_exchange_service__last_available_rate(
+    currency_exchange_service: CurrencyExchangeService, async_session: AsyncSession
 ):
-    with pytest.raises(ValueError):
-        await currency_exchange_service.exchange(amount=1, in_currency=Currency.JPY, out_currency=Currency.EUR, exchange_date=date.today())
+    currency_exchange_service.last_available_rate = True
+
+    with patch(
+        "currency_exchange.services.rate_table_index.RateTableIndexService.get_last_table_date",
+        return_value=date(2010, 1, 8),
+    ) as last_table_mock, patch_get_table_id(return_value=TABLE_ID), patch_get_exchange_rates_from_table(
+        return_value={Currency.USD: Decimal("2.8")}
+    ):
+        result = await currency_exchange_service.exchange(
+            amount=1000, in_currency=Currency.USD, out_currency=Currency.PLN, exchange_date=date(2010, 1, 10)
+        )
+        results = await currency_exchange_service.exchange_many(
+            [
+                ExchangeOrder(1000, Currency.PLN, Currency.USD, date(2010, 1, 9)),
+                ExchangeOrder(1000, Currency.PLN, Currency.PLN, date(2010, 1, 3)),
+            ]
+        )
+
+    assert result.amount == float(Decimal(1000) * Decimal("2.8"))
+    assert results[0].amount == float(Decimal(1000) / Decimal("2.8"))
+    assert results[1].amount == 1000
+    assert [call.args for call in last_table_mock.await_args_list] == [(date(2010, 1, 10),), (date(2010, 1, 9),)]
+    # rates are stored only for the table date, not for the weekend
+    assert await get_exchange_rate_from_db(async_session, Currency.USD, date(2010, 1, 10)) is None
+    assert (await get_exchange_rate_from_db(async_session, Currency.USD, date(2010, 1, 8))).rate == Decimal("2.8")
+
+
+async def test_exchange_rate_repository__premature_unavailable_rate_expires(async_session: AsyncSession):
+    now = datetime(2022, 6, 15, 9)
+    repository = ExchangeRateRepository(async_session, unavailable_rate_ttl=timedelta(minutes=5), clock=lambda: now)
+    keys = [(date(2022, 6, 14), Currency.USD), (date(2022, 6, 15), Currency.USD)]
+    await repository.insert_exchange_rates(dict.fromkeys(keys))
+    assert await repository.get_exchange_rates(keys) == dict.fromkeys(keys)
+
+    # yesterday's table was never published, today's may still be
+    now = datetime(2022, 6, 15, 9, 5)
+    assert await repository.get_exchange_rates(keys) == {(date(2022, 6, 14), Currency.USD): None}
+    with pytest.raises(ExchangeRateRecordDoesNotExist):
+        await repository.get_rate(date(2022, 6, 15), Currency.USD)
+
+    await repository.insert_exchange_rates({(date(2022, 6, 15), Currency.USD): Decimal("4.5")})
+    assert await repository.get_rate(date(2022, 6, 15), Currency.USD) == Decimal("4.5")
+
+
+async def test_exchange_rate_repository__bulk_insert_in_one_statement(async_session: AsyncSession):
+    repository = ExchangeRateRepository(async_session, unavailable_rate_ttl=timedelta(minutes=5))
+    first_day = date(2000, 1, 1)
+    rates = {
+        (first_day + timedelta(days=day), currency): Decimal(day % 10_000 + 1).scaleb(-6)
+        for day in range(2_000)
+        for currency in FOREIGN_CURRENCIES
+    }
+    await repository.insert_exchange_rates(rates)
+
+    assert await repository.get_exchange_rates(rates) == rates
+    # stored as ISO 4217 numeric code and scaled integer
+    query = text("SELECT currency, rate FROM exchangerate WHERE rate_date = '2000-01-02'")
+    row = (await async_session.execute(query)).all()
+    assert sorted(row) == [(392, 200), (756, 200), (840, 200), (978, 200)]
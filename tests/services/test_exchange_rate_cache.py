@@ -0,0 +1,80 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+from currency_exchange.enums import Currency
+from currency_exchange.exceptions import ExchangeRateNotCached
+from currency_exchange.services.exchange_rate_cache import ExchangeRateCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_exchange_rate_cache__hit_and_miss():
+    cache = ExchangeRateCache()
+
+    with pytest.raises(ExchangeRateNotCached):
+        cache.get(date(2010, 1, 11), Currency.USD)
+
+    cache.set(date(2010, 1, 11), Currency.USD, Decimal("2.821"))
+    assert cache.get(date(2010, 1, 11), Currency.USD) == Decimal("2.821")
+
+    with pytest.raises(ExchangeRateNotCached):
+        cache.get(date(2010, 1, 11), Currency.EUR)
+
+    assert cache.stats() == {"size": 1, "hits": 1, "misses": 2, "evictions": 0}
+
+
+def test_exchange_rate_cache__least_recently_used_evicted():
+    cache = ExchangeRateCache(max_size=2)
+    cache.set(date(2010, 1, 11), Currency.USD, Decimal("2.821"))
+    cache.set(date(2010, 1, 11), Currency.EUR, Decimal("4.0771"))
+    cache.get(date(2010, 1, 11), Currency.USD)
+    cache.set(date(2010, 1, 11), Currency.CHF, Decimal("2.7533"))
+
+    assert len(cache) == 2
+    assert cache.evictions == 1
+    assert cache.get(date(2010, 1, 11), Currency.USD) == Decimal("2.821")
+    with pytest.raises(ExchangeRateNotCached):
+        cache.get(date(2010, 1, 11), Currency.EUR)
+
+
+def test_exchange_rate_cache__unavailable_rate_expires():
+    clock = FakeClock()
+    cache = ExchangeRateCache(negative_ttl=60, clock=clock, wall_clock=lambda: datetime(2010, 1, 10, 9))
+    cache.set(date(2010, 1, 10), Currency.USD, None)
+
+    clock.now = 59
+    assert cache.get(date(2010, 1, 10), Currency.USD) is None
+
+    clock.now = 60
+    with pytest.raises(ExchangeRateNotCached):
+        cache.get(date(2010, 1, 10), Currency.USD)
+    assert len(cache) == 0
+
+
+def test_exchange_rate_cache__unavailable_rate_of_past_day_kept():
+    clock = FakeClock()
+    cache = ExchangeRateCache(negative_ttl=60, clock=clock, wall_clock=lambda: datetime(2010, 1, 11, 9))
+    cache.set(date(2010, 1, 10), Currency.USD, None)
+
+    clock.now = 3600
+    assert cache.get(date(2010, 1, 10), Currency.USD) is None
+
+
+def test_exchange_rate_cache__unavailable_rates_evicted_first():
+    cache = ExchangeRateCache(max_size=2)
+    cache.set(date(2010, 1, 11), Currency.USD, Decimal("2.821"))
+    cache.set(date(2010, 1, 10), Currency.USD, None)
+    cache.set(date(2010, 1, 11), Currency.EUR, Decimal("4.0771"))
+
+    assert cache.get(date(2010, 1, 11), Currency.USD) == Decimal("2.821")
+    assert cache.get(date(2010, 1, 11), Currency.EUR) == Decimal("4.0771")
+    with pytest.raises(ExchangeRateNotCached):
+        cache.get(date(2010, 1, 10), Currency.USD)
@@ -0,0 +1,107 @@
+from datetime import date
+from decimal import Decimal
+
+import httpx
+import pytest
+
+from currency_exchange.enums import Currency
+from currency_exchange.exceptions import ExchangeRateUnavailable
+from currency_exchange.services.nbp_api import NBPApiService
+from tests.helpers import read_fixture
+
+
+def nbp_handler(request: httpx.Request) -> httpx.Response:
+    if request.url.path == "/transfer.aspx":
+        if request.method == "GET":
+            return httpx.Response(200, text=read_fixture("nbp/archive_form.html"))
+        return httpx.Response(200, text=read_fixture("nbp/archive_2010_01.html"))
+    if request.url.path == "/kursy/xml/a005z100111.xml":
+        return httpx.Response(200, text=read_fixture("nbp/a005z100111.xml"))
+    if request.url.path == "/api/exchangerates/tables/A/2010-01-11/":
+        return httpx.Response(200, text=read_fixture("nbp/table_a_2010-01-11.json"))
+    return httpx.Response(404)
+
+
+@pytest.fixture
+def mocked_nbp_api_service(nbp_api_service: NBPApiService) -> NBPApiService:
+    nbp_api_service.client = httpx.AsyncClient(transport=httpx.MockTransport(nbp_handler))
+    return nbp_api_service
+
+
+async def test_nbp_api_service__month_tables_parsed(mocked_nbp_api_service: NBPApiService):
+    tables = await mocked_nbp_api_service.get_tables_from_month(2010, 1)
+
+    assert tables == {
+        date(2010, 1, 4): "a001z100104",
+        date(2010, 1, 5): "a002z100105",
+        date(2010, 1, 7): "a003z100107",
+        date(2010, 1, 8): "a004z100108",
+        date(2010, 1, 11): "a005z100111",
+    }
+
+
+async def test_nbp_api_service__all_supported_rates_parsed(mocked_nbp_api_service: NBPApiService):
+    rates = await mocked_nbp_api_service.get_exchange_rates_from_table("a005z100111")
+
+    assert rates == {
+        Currency.USD: Decimal("2.8210"),
+        Currency.EUR: Decimal("4.0771"),
+        Currency.CHF: Decimal("2.7533"),
+        Currency.JPY: Decimal("0.030588"),
+    }
+
+
+async def test_nbp_api_service__large_table_parsed_in_thread(mocked_nbp_api_service: NBPApiService):
+    mocked_nbp_api_service.parse_in_thread_threshold = 0
+
+    rates = await mocked_nbp_api_service.get_exchange_rates_from_table("a005z100111")
+
+    assert rates[Currency.USD] == Decimal("2.8210")
+
+
+async def test_nbp_api_service__json_api_rates_parsed(mocked_nbp_api_service: NBPApiService):
+    rates = await mocked_nbp_api_service.get_exchange_rates_by_date(date(2010, 1, 11))
+
+    assert rates == await mocked_nbp_api_service.get_exchange_rates_from_table("a005z100111")
+
+
+async def test_nbp_api_service__json_api_no_table__raises_unavailable(mocked_nbp_api_service: NBPApiService):
+    with pytest.raises(ExchangeRateUnavailable):
+        await mocked_nbp_api_service.get_exchange_rates_by_date(date(2010, 1, 10))
+
+
+async def test_nbp_api_service__upstream_error__raises_http_error(mocked_nbp_api_service: NBPApiService):
+    with pytest.raises(httpx.HTTPError):
+        await mocked_nbp_api_service.get_exchange_rates_from_table("a001z100104")
+
+
+async def test_nbp_api_service__transient_errors_retried():
+    responses = iter([httpx.Response(503), httpx.ConnectError("connection refused"), httpx.Response(200, text="ok")])
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        response = next(responses)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    service = NBPApiService(client, retries=2, retry_backoff=0)
+
+    resp = await service._request("GET", "https://www.nbp.pl/")  # pylint: disable=protected-access
+    assert resp.text == "ok"
+
+
+async def test_nbp_api_service__retries_exhausted__raises_http_error():
+    calls = 0
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        return httpx.Response(502)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    service = NBPApiService(client, retries=2, retry_backoff=0)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await service._request("GET", "https://www.nbp.pl/")  # pylint: disable=protected-access
+    assert calls == 3
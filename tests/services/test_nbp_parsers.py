@@ -0,0 +1,75 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from currency_exchange.enums import Currency
+from currency_exchange.services.nbp_parsers import (
+    PARSERS,
+    NBPParser,
+    get_parser,
+    parse_json_table,
+)
+from tests.helpers import read_fixture
+
+TABLE_RATES = {
+    Currency.USD: Decimal("2.8210"),
+    Currency.EUR: Decimal("4.0771"),
+    Currency.CHF: Decimal("2.7533"),
+    Currency.JPY: Decimal("0.030588"),
+}
+
+
+@pytest.fixture(params=sorted(PARSERS))
+def parser(request) -> NBPParser:
+    return get_parser(request.param)
+
+
+def test_parser__archive_form_parsed(parser: NBPParser):
+    form = parser.parse_archive_form(read_fixture("nbp/archive_form.html").encode())
+
+    assert form == {
+        "__VIEWSTATE": "dDwtMTY4OTk0MjI5NDs7Pg==",
+        "__EVENTVALIDATION": "dDwxMjM0NTY3ODk7Oz4=",
+        "pokaz": "Pokaż",
+    }
+
+
+def test_parser__archive_tables_parsed(parser: NBPParser):
+    tables = parser.parse_archive_tables(read_fixture("nbp/archive_2010_01.html").encode())
+
+    assert tables == {
+        date(2010, 1, 4): "a001z100104",
+        date(2010, 1, 5): "a002z100105",
+        date(2010, 1, 7): "a003z100107",
+        date(2010, 1, 8): "a004z100108",
+        date(2010, 1, 11): "a005z100111",
+    }
+
+
+def test_parser__table_rates_per_unit(parser: NBPParser):
+    rates = parser.parse_table(read_fixture("nbp/a005z100111.xml").encode())
+
+    assert rates == TABLE_RATES
+
+
+def test_parse_json_table__same_rates_as_xml_table():
+    rates = parse_json_table(read_fixture("nbp/table_a_2010-01-11.json").encode())
+
+    assert rates == TABLE_RATES
+
+
+def test_get_parser__unknown__raises_value_error():
+    with pytest.raises(ValueError):
+        get_parser("regex")
+
+
+def test_parser__missing_method__not_instantiable():
+    class TableOnlyParser(NBPParser):  # pylint: disable=abstract-method
+        name = "table-only"
+
+        def parse_table(self, content: bytes) -> dict[Currency, Decimal]:
+            return {}
+
+    with pytest.raises(TypeError):
+        TableOnlyParser()
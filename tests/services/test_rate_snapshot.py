@@ -0,0 +1,96 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from currency_exchange.database.repositories import ExchangeRateRepository
+from currency_exchange.enums import CURRENCY_NUMERIC_CODES, Currency
+from currency_exchange.exceptions import ExchangeRateNotCached
+from currency_exchange.services.currency_exchange import CurrencyExchangeService
+from currency_exchange.services.rate_snapshot import (
+    RateSnapshot,
+    load_rate_snapshot,
+    write_rate_snapshot,
+)
+
+RATES = [
+    (date(2010, 1, 8), Currency.USD, Decimal("2.8423")),
+    (date(2010, 1, 8), Currency.JPY, Decimal("0.030588")),
+    (date(2010, 1, 9), Currency.USD, None),
+    (date(2010, 1, 11), Currency.USD, Decimal("2.8210")),
+]
+
+
+def test_rate_snapshot__rates_read_back(tmp_path: Path):
+    path = str(tmp_path / "rates.bin")
+    assert write_rate_snapshot(path, RATES) == 4
+
+    snapshot = RateSnapshot(path)
+    assert snapshot.first_day == date(2010, 1, 8)
+    assert snapshot.days == 4
+    assert len(snapshot) == 4
+    for rate_date, currency, rate in RATES:
+        assert snapshot.get(rate_date, currency) == rate
+    # the file is little-endian whatever the byte order of the host
+    assert bytes(snapshot.values[:8]) == (284_230_000).to_bytes(8, "little", signed=True)
+
+    for rate_date, currency in [
+        (date(2010, 1, 8), Currency.EUR),
+        (date(2010, 1, 10), Currency.USD),
+        (date(2010, 1, 7), Currency.USD),
+        (date(2010, 1, 12), Currency.USD),
+    ]:
+        with pytest.raises(ExchangeRateNotCached):
+            snapshot.get(rate_date, currency)
+    snapshot.close()
+
+
+def test_rate_snapshot__replaced_while_mapped(tmp_path: Path):
+    path = str(tmp_path / "rates.bin")
+    write_rate_snapshot(path, RATES[:1])
+    snapshot = RateSnapshot(path)
+
+    write_rate_snapshot(path, RATES)
+    assert snapshot.get(date(2010, 1, 8), Currency.USD) == Decimal("2.8423")
+    with pytest.raises(ExchangeRateNotCached):
+        snapshot.get(date(2010, 1, 11), Currency.USD)
+    snapshot.close()
+
+    assert RateSnapshot(path).get(date(2010, 1, 11), Currency.USD) == Decimal("2.8210")
+
+
+def test_load_rate_snapshot__missing_file(tmp_path: Path):
+    assert load_rate_snapshot(None) is None
+    assert load_rate_snapshot(str(tmp_path / "rates.bin")) is None
+
+
+async def test_exchange_rate_repository__final_rates_exported(async_session: AsyncSession):
+    repository = ExchangeRateRepository(
+        async_session, unavailable_rate_ttl=timedelta(minutes=5), clock=lambda: datetime(2010, 1, 11, 9)
+    )
+    rates = {(rate_date, currency): rate for rate_date, currency, rate in RATES}
+    await repository.insert_exchange_rates({**rates, (date(2010, 1, 11), Currency.EUR): None})
+
+    # unavailable rate of today may still get published, currencies are ordered by their stored codes
+    assert [rate async for rate in repository.iter_final_rates()] == sorted(
+        RATES, key=lambda rate: (rate[0], CURRENCY_NUMERIC_CODES[rate[1]])
+    )
+
+
+async def test_exchange_service__rate_read_from_snapshot(
+    currency_exchange_service: CurrencyExchangeService, tmp_path: Path
+):
+    path = str(tmp_path / "rates.bin")
+    write_rate_snapshot(path, RATES)
+    currency_exchange_service.rate_snapshot = RateSnapshot(path)
+
+    with patch("currency_exchange.database.repositories.ExchangeRateRepository.get_rate") as mock:
+        result = await currency_exchange_service.exchange(
+            amount=10, in_currency=Currency.USD, out_currency=Currency.PLN, exchange_date=date(2010, 1, 11)
+        )
+        mock.assert_not_called()
+    assert result.rate == Decimal("2.8210")
+    currency_exchange_service.rate_snapshot.close()
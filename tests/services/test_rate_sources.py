@@ -0,0 +1,184 @@
+import asyncio
+from datetime import date, datetime
+from decimal import Decimal
+
+import httpx
+import pytest
+from sqlalchemy.orm import sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from currency_exchange.enums import Currency
+from currency_exchange.exceptions import ExchangeRateUnavailable, UpstreamCircuitOpen
+from currency_exchange.services.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+)
+from currency_exchange.services.currency_exchange import CurrencyExchangeService
+from currency_exchange.services.nbp_api import NBPApiService
+from currency_exchange.services.rate_sources import (
+    ArchiveRateSource,
+    HedgedRateSource,
+    JsonApiRateSource,
+)
+from currency_exchange.services.rate_table_index import MonthTablesCache
+from tests.helpers import read_fixture
+
+RATE_DATE = date(2010, 1, 11)
+
+
+class StandInNBP:
+    """Local stand-in of NBP archive and JSON api, with configurable latency and failures of each of them."""
+
+    def __init__(
+        self,
+        archive_latency: float = 0.0,
+        api_latency: float = 0.0,
+        archive_status: int = 200,
+        api_dates: tuple[str, ...] = ("2010-01-11",),
+    ):
+        self.archive_latency = archive_latency
+        self.api_dates = api_dates
+        self.api_latency = api_latency
+        self.archive_status = archive_status
+        self.calls = {"archive": 0, "api": 0}
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path.startswith("/api/"):
+            self.calls["api"] += 1
+            await asyncio.sleep(self.api_latency)
+            if request.url.path in {f"/api/exchangerates/tables/A/{api_date}/" for api_date in self.api_dates}:
+                return httpx.Response(200, text=read_fixture("nbp/table_a_2010-01-11.json"))
+            return httpx.Response(404)
+
+        self.calls["archive"] += 1
+        await asyncio.sleep(self.archive_latency)
+        if self.archive_status != 200:
+            return httpx.Response(self.archive_status)
+        if request.url.path == "/transfer.aspx":
+            if request.method == "GET":
+                return httpx.Response(200, text=read_fixture("nbp/archive_form.html"))
+            return httpx.Response(200, text=read_fixture("nbp/archive_2010_01.html"))
+        if request.url.path == "/kursy/xml/a005z100111.xml":
+            return httpx.Response(200, text=read_fixture("nbp/a005z100111.xml"))
+        return httpx.Response(404)
+
+
+def create_rate_source(async_session: AsyncSession, stand_in: StandInNBP, **kwargs) -> HedgedRateSource:
+    nbp_api_service = NBPApiService(httpx.AsyncClient(transport=httpx.MockTransport(stand_in)))
+    session_factory = sessionmaker(bind=async_session.bind, class_=AsyncSession, expire_on_commit=False)
+    return HedgedRateSource(
+        [ArchiveRateSource(session_factory, nbp_api_service, MonthTablesCache()), JsonApiRateSource(nbp_api_service)],
+        **kwargs,
+    )
+
+
+def test_circuit_breaker__opens_on_failures_and_closes_after_probe():
+    now = 0.0
+    breaker = CircuitBreaker(failure_rate=0.5, window=4, min_calls=4, reset_timeout=30.0, clock=lambda: now)
+    for _ in range(2):
+        breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.allow_request() is False
+
+    now = 30.0
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow_request() is True
+    # single probe at a time
+    assert breaker.allow_request() is False
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    now = 60.0
+    assert breaker.allow_request() is True
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.transitions == {OPEN: 2, HALF_OPEN: 2, CLOSED: 1}
+
+
+async def test_hedged_rate_source__slow_source_hedged(async_session: AsyncSession):
+    stand_in = StandInNBP(archive_latency=0.2)
+    rate_source = create_rate_source(async_session, stand_in, hedge_delay=0.05)
+
+    rates = await rate_source.get_rates(RATE_DATE)
+    # shared listing fetch of the cancelled call completes in background
+    await asyncio.sleep(0.5)
+
+    assert rates[Currency.USD] == Decimal("2.8210")
+    assert stand_in.calls["api"] == 1
+    assert rate_source.counters == {("api", "hedged"): 1, ("api", "success"): 1, ("archive", "cancelled"): 1}
+
+
+async def test_hedged_rate_source__fast_source_not_hedged(async_session: AsyncSession):
+    stand_in = StandInNBP()
+    rate_source = create_rate_source(async_session, stand_in, hedge_delay=1.0)
+
+    rates = await rate_source.get_rates(RATE_DATE)
+    with pytest.raises(ExchangeRateUnavailable):
+        await rate_source.get_rates(date(2010, 1, 10))
+
+    assert rates[Currency.USD] == Decimal("2.8210")
+    assert stand_in.calls == {"archive": 3, "api": 0}
+    assert rate_source.counters == {("archive", "success"): 1, ("archive", "unavailable"): 1}
+
+
+async def test_hedged_rate_source__recent_unavailable_rechecked_with_next_source(async_session: AsyncSession):
+    # today's table is already in the api, while the archive listing fetched before publication doesn't have it
+    stand_in = StandInNBP(api_dates=("2010-01-12",))
+    rate_source = create_rate_source(
+        async_session, stand_in, hedge_delay=1.0, clock=lambda: datetime(2010, 1, 12, 12, 30)
+    )
+
+    rates = await rate_source.get_rates(date(2010, 1, 12))
+    with pytest.raises(ExchangeRateUnavailable):
+        await rate_source.get_rates(date(2010, 1, 10))
+
+    assert rates[Currency.USD] == Decimal("2.8210")
+    assert stand_in.calls == {"archive": 2, "api": 1}
+    assert rate_source.counters == {("archive", "unavailable"): 2, ("api", "success"): 1}
+
+
+async def test_hedged_rate_source__failed_source_fails_over_until_circuit_opens(async_session: AsyncSession):
+    stand_in = StandInNBP(archive_status=503)
+    rate_source = create_rate_source(
+        async_session, stand_in, breaker_factory=lambda: CircuitBreaker(window=2, min_calls=2)
+    )
+
+    for _ in range(3):
+        assert (await rate_source.get_rates(RATE_DATE))[Currency.USD] == Decimal("2.8210")
+
+    assert rate_source.breakers["archive"].state == OPEN
+    assert stand_in.calls == {"archive": 2, "api": 3}
+    assert rate_source.counters == {("archive", "error"): 2, ("archive", "rejected"): 1, ("api", "success"): 3}
+
+
+async def test_exchange_service__fast_fails_with_open_circuits(
+    async_session: AsyncSession, currency_exchange_service: CurrencyExchangeService
+):
+    stand_in = StandInNBP()
+    rate_source = create_rate_source(async_session, stand_in)
+    for breaker in rate_source.breakers.values():
+        for _ in range(breaker.min_calls):
+            breaker.record_failure()
+    currency_exchange_service.rate_source = rate_source
+
+    with pytest.raises(UpstreamCircuitOpen):
+        await rate_source.get_rates(RATE_DATE)
+    with pytest.raises(ExchangeRateUnavailable):
+        await currency_exchange_service.exchange(
+            amount=10, in_currency=Currency.USD, out_currency=Currency.PLN, exchange_date=RATE_DATE
+        )
+    assert stand_in.calls == {"archive": 0, "api": 0}
+
+    # rates stored before the upstream failed are still served
+    await currency_exchange_service.exchange_rate_repository.insert_exchange_rates(
+        {(RATE_DATE, Currency.USD): Decimal("2.8210")}
+    )
+    result = await currency_exchange_service.exchange(
+        amount=10, in_currency=Currency.USD, out_currency=Currency.PLN, exchange_date=RATE_DATE
+    )
+    assert result.rate == Decimal("2.8210")
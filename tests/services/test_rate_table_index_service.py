@@ -0,0 +1,104 @@
+from datetime import date, datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+
+from currency_exchange.exceptions import ExchangeRateUnavailable, MonthTablesNotCached
+from currency_exchange.services.rate_table_index import (
+    MonthTablesCache,
+    RateTableIndexService,
+    is_month_listing_fresh,
+)
+
+TABLES = {date(2010, 1, 4): "a001z100104", date(2010, 1, 11): "a005z100111"}
+
+
+def patch_get_tables_from_month(**kwargs):
+    return patch("currency_exchange.services.nbp_api.NBPApiService.get_tables_from_month", **kwargs)
+
+
+@pytest.mark.parametrize(
+    "fetched_at, now, expected",
+    [
+        (datetime(2010, 2, 1), datetime(2030, 1, 1), True),
+        (datetime(2010, 1, 31, 23), datetime(2010, 1, 31, 23, 5), True),
+        (datetime(2010, 1, 31, 23), datetime(2010, 1, 31, 23, 10), False),
+        (datetime(2010, 1, 31, 23), datetime(2010, 2, 1, 12), False),
+    ],
+)
+def test_is_month_listing_fresh(fetched_at: datetime, now: datetime, expected: bool):
+    assert is_month_listing_fresh(2010, 1, fetched_at, now, timedelta(minutes=10)) is expected
+
+
+async def test_rate_table_index_service__past_month_fetched_once(rate_table_index_service: RateTableIndexService):
+    with patch_get_tables_from_month(return_value=TABLES) as mock:
+        assert await rate_table_index_service.get_table_id(date(2010, 1, 11)) == "a005z100111"
+        mock.assert_awaited_once_with(2010, 1)
+        mock.reset_mock()
+
+        # served from memory
+        assert await rate_table_index_service.get_table_id(date(2010, 1, 4)) == "a001z100104"
+
+        # served from database
+        rate_table_index_service.month_tables_cache.clear()
+        assert await rate_table_index_service.get_table_id(date(2010, 1, 11)) == "a005z100111"
+        with pytest.raises(ExchangeRateUnavailable):
+            await rate_table_index_service.get_table_id(date(2010, 1, 10))
+
+        mock.assert_not_awaited()
+
+
+async def test_rate_table_index_service__current_month_refreshed(rate_table_index_service: RateTableIndexService):
+    now = datetime(2010, 1, 11, 12)
+    rate_table_index_service._clock = lambda: now  # pylint: disable=protected-access
+    rate_table_index_service.month_tables_cache = MonthTablesCache()
+
+    with patch_get_tables_from_month(return_value={date(2010, 1, 4): "a001z100104"}) as mock:
+        with pytest.raises(ExchangeRateUnavailable):
+            await rate_table_index_service.get_table_id(date(2010, 1, 11))
+
+    now += timedelta(minutes=5)
+    with patch_get_tables_from_month(return_value=TABLES) as mock:
+        with pytest.raises(ExchangeRateUnavailable):
+            await rate_table_index_service.get_table_id(date(2010, 1, 11))
+        mock.assert_not_awaited()
+
+    now += timedelta(minutes=10)
+    with patch_get_tables_from_month(return_value=TABLES) as mock:
+        assert await rate_table_index_service.get_table_id(date(2010, 1, 11)) == "a005z100111"
+        mock.assert_awaited_once_with(2010, 1)
+
+
+def test_month_tables_cache__last_table_date_needs_months_in_between():
+    cache = MonthTablesCache()
+    cache.set(2009, 12, {date(2009, 12, 31): "a255z091231"}, datetime(2010, 2, 1))
+    cache.set(2010, 2, {date(2010, 2, 1): "a021z100201"}, datetime(2010, 3, 1))
+
+    assert cache.get_last_table_date(date(2010, 2, 5)) == date(2010, 2, 1)
+    with pytest.raises(MonthTablesNotCached):
+        cache.get_last_table_date(date(2010, 1, 1))
+    with pytest.raises(MonthTablesNotCached):
+        cache.get_last_table_date(date(2009, 12, 30))
+
+    cache.set(2010, 1, TABLES, datetime(2010, 2, 1))
+    assert cache.get_last_table_date(date(2010, 1, 1)) == date(2009, 12, 31)
+    assert cache.get_last_table_date(date(2010, 1, 31)) == date(2010, 1, 11)
+    assert cache.get_last_table_date(date(2010, 1, 10)) == date(2010, 1, 4)
+
+
+async def test_rate_table_index_service__last_table_date(rate_table_index_service: RateTableIndexService):
+    rate_table_index_service._clock = lambda: datetime(2010, 3, 1)  # pylint: disable=protected-access
+    months = {(2010, 1): TABLES, (2010, 2): {date(2010, 2, 2): "a022z100202"}}
+
+    with patch_get_tables_from_month(side_effect=lambda year, month: months[(year, month)]) as mock:
+        assert await rate_table_index_service.get_last_table_date(date(2010, 2, 1)) == date(2010, 1, 11)
+        assert mock.await_count == 2
+        mock.reset_mock()
+
+        # served from memory
+        assert await rate_table_index_service.get_last_table_date(date(2010, 1, 10)) == date(2010, 1, 4)
+        assert await rate_table_index_service.get_last_table_date(date(2010, 2, 28)) == date(2010, 2, 2)
+        mock.assert_not_awaited()
+
+        with pytest.raises(ExchangeRateUnavailable):
+            await rate_table_index_service.get_last_table_date(date(2010, 3, 2))
@@ -0,0 +1,140 @@
+import asyncio
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Optional
+from unittest.mock import patch
+
+import pytest
+
+from currency_exchange.database.repositories import ExchangeRateRepository
+from currency_exchange.enums import FOREIGN_CURRENCIES, Currency
+from currency_exchange.exceptions import MonthTablesNotCached
+from currency_exchange.services.currency_exchange import CurrencyExchangeService
+from currency_exchange.services.exchange_rate_cache import ExchangeRateCache
+from currency_exchange.services.nbp_api import NBPApiService
+from currency_exchange.services.rate_table_index import RateTableIndexService
+from currency_exchange.services.shared_cache import (
+    InMemorySharedCacheBackend,
+    SharedCache,
+    SharedCacheBackend,
+)
+from tests.services.test_exchange_rate_cache import FakeClock
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+@pytest.fixture
+def shared_cache(clock: FakeClock) -> SharedCache:
+    return SharedCache(
+        InMemorySharedCacheBackend(clock=clock),
+        negative_ttl=60,
+        lock_timeout=1,
+        clock=lambda: datetime(2010, 1, 10, 12),
+    )
+
+
+async def test_shared_cache__rates_and_negative_ttl(shared_cache: SharedCache, clock: FakeClock):
+    await shared_cache.set_rates(
+        {
+            (date(2010, 1, 8), Currency.USD): Decimal("2.821"),
+            (date(2010, 1, 9), Currency.USD): None,
+            (date(2010, 1, 10), Currency.USD): None,
+        }
+    )
+    keys = [
+        (date(2010, 1, 8), Currency.USD),
+        (date(2010, 1, 9), Currency.USD),
+        (date(2010, 1, 10), Currency.USD),
+        (date(2010, 1, 8), Currency.EUR),
+    ]
+
+    assert await shared_cache.get_rates(keys) == {
+        (date(2010, 1, 8), Currency.USD): Decimal("2.821"),
+        (date(2010, 1, 9), Currency.USD): None,
+        (date(2010, 1, 10), Currency.USD): None,
+    }
+
+    # only today's unavailable rate expires, the table may still get published
+    clock.now += 60
+    assert await shared_cache.get_rates(keys) == {
+        (date(2010, 1, 8), Currency.USD): Decimal("2.821"),
+        (date(2010, 1, 9), Currency.USD): None,
+    }
+
+
+async def test_shared_cache__month_tables(shared_cache: SharedCache):
+    tables = {date(2010, 1, 4): "a001z100104", date(2010, 1, 11): "a005z100111"}
+
+    with pytest.raises(MonthTablesNotCached):
+        await shared_cache.get_month_tables(2010, 1)
+
+    await shared_cache.set_month_tables(2010, 1, tables, datetime(2010, 2, 1, 12))
+    assert await shared_cache.get_month_tables(2010, 1) == (tables, datetime(2010, 2, 1, 12))
+
+
+async def test_shared_cache__fill_lock_serializes_fills(shared_cache: SharedCache):
+    events = []
+
+    async def fill(name: str):
+        async with shared_cache.fill_lock("rates:2010-01-11"):
+            events.append(f"{name} start")
+            await asyncio.sleep(0.01)
+            events.append(f"{name} end")
+
+    await asyncio.gather(fill("a"), fill("b"))
+
+    assert events == ["a start", "a end", "b start", "b end"]
+    assert not shared_cache.backend._locks  # pylint: disable=protected-access
+
+
+async def test_exchange_service__rates_shared_between_workers(
+    shared_cache: SharedCache,
+    exchange_rate_repository: ExchangeRateRepository,
+    nbp_api_service: NBPApiService,
+    rate_table_index_service: RateTableIndexService,
+):
+    def create_worker_service() -> CurrencyExchangeService:
+        return CurrencyExchangeService(
+            exchange_rate_repository,
+            nbp_api_service,
+            rate_table_index_service,
+            ExchangeRateCache(),
+            shared_cache=shared_cache,
+        )
+
+    with patch(
+        "currency_exchange.services.rate_table_index.RateTableIndexService.get_table_id", return_value="a005z100111"
+    ), patch(
+        "currency_exchange.services.nbp_api.NBPApiService.get_exchange_rates_from_table",
+        return_value={Currency.USD: Decimal("2.821")},
+    ) as table_mock:
+        await create_worker_service().exchange(1000, Currency.USD, Currency.PLN, date(2010, 1, 11))
+        table_mock.assert_awaited_once()
+
+        with patch(
+            "currency_exchange.database.repositories.ExchangeRateRepository.get_rate",
+            side_effect=AssertionError("database shouldn't be queried"),
+        ):
+            result = await create_worker_service().exchange(1000, Currency.USD, Currency.PLN, date(2010, 1, 11))
+        assert result.amount == float(Decimal(1000) * Decimal("2.821"))
+
+        # dates filled by another worker while the lock was awaited aren't fetched again
+        await shared_cache.set_rates({(date(2010, 1, 12), currency): Decimal(1) for currency in FOREIGN_CURRENCIES})
+        rates = await create_worker_service().fetch_exchange_rates({date(2010, 1, 12)})
+        assert rates[(date(2010, 1, 12), Currency.EUR)] == Decimal(1)
+        table_mock.assert_awaited_once()
+
+
+def test_shared_cache_backend__missing_method__not_instantiable():
+    class LocklessBackend(SharedCacheBackend):  # pylint: disable=abstract-method
+        async def get_many(self, keys: list[str]) -> list[Optional[str]]:
+            return [None] * len(keys)
+
+        async def set_many(self, items: dict[str, str], ttl: Optional[float] = None) -> None:
+            pass
+
+    with pytest.raises(TypeError):
+        LocklessBackend()
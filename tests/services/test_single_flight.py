@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from currency_exchange.services.single_flight import SingleFlight
+
+
+async def test_single_flight__concurrent_calls_coalesced():
+    single_flight = SingleFlight()
+    calls = 0
+
+    async def fetch() -> int:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return 42
+
+    results = await asyncio.gather(*(single_flight.call("key", fetch) for _ in range(10)))
+
+    assert results == [42] * 10
+    assert calls == 1
+    assert len(single_flight) == 0
+
+
+async def test_single_flight__error_shared_and_not_cached():
+    single_flight = SingleFlight()
+    calls = 0
+
+    async def fetch() -> int:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream error")
+
+    results = await asyncio.gather(*(single_flight.call("key", fetch) for _ in range(3)), return_exceptions=True)
+    assert calls == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+    with pytest.raises(RuntimeError):
+        await single_flight.call("key", fetch)
+    assert calls == 2
+
+
+async def test_single_flight__different_keys_not_coalesced():
+    single_flight = SingleFlight()
+
+    async def fetch(value: int) -> int:
+        await asyncio.sleep(0.01)
+        return value
+
+    results = await asyncio.gather(single_flight.call(1, lambda: fetch(1)), single_flight.call(2, lambda: fetch(2)))
+    assert results == [1, 2]
+
+
+async def test_single_flight__cancelled_waiter_does_not_cancel_work():
+    single_flight = SingleFlight()
+
+    async def fetch() -> int:
+        await asyncio.sleep(0.02)
+        return 42
+
+    first = asyncio.ensure_future(single_flight.call("key", fetch))
+    second = asyncio.ensure_future(single_flight.call("key", fetch))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second == 42
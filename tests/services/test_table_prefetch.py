@@ -0,0 +1,124 @@
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Callable
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from currency_exchange.database.repositories import ExchangeRateRepository
+from currency_exchange.enums import FOREIGN_CURRENCIES, Currency
+from currency_exchange.exceptions import ExchangeRateUnavailable
+from currency_exchange.services.exchange_rate_cache import ExchangeRateCache
+from currency_exchange.services.nbp_api import NBPApiService
+from currency_exchange.services.table_prefetch import (
+    AdvisoryLockLeaderElection,
+    TablePrefetcher,
+)
+
+TODAY = date(2022, 6, 15)
+TABLE_RATES = {currency: Decimal("4.5") for currency in FOREIGN_CURRENCIES}
+
+
+def patch_get_exchange_rates_by_date(**kwargs):
+    return patch("currency_exchange.services.nbp_api.NBPApiService.get_exchange_rates_by_date", **kwargs)
+
+
+class StaticLeaderElection:
+    def __init__(self, leader: bool):
+        self.leader = leader
+
+    async def is_leader(self) -> bool:
+        return self.leader
+
+    async def release(self) -> None:
+        pass
+
+
+def create_prefetcher(
+    async_session: AsyncSession,
+    repository_factory: Callable[[AsyncSession], ExchangeRateRepository],
+    leader: bool,
+    now: datetime,
+) -> TablePrefetcher:
+    return TablePrefetcher(
+        sessionmaker(bind=async_session.bind, class_=AsyncSession, expire_on_commit=False),
+        repository_factory,
+        NBPApiService(),
+        ExchangeRateCache(),
+        StaticLeaderElection(leader),
+        clock=lambda: now,
+    )
+
+
+async def test_table_prefetcher__leader_replaces_premature_nulls(
+    async_session: AsyncSession,
+    exchange_rate_repository: ExchangeRateRepository,
+    exchange_rate_repository_factory: Callable[[AsyncSession], ExchangeRateRepository],
+):
+    await exchange_rate_repository.insert_exchange_rates({(TODAY, currency): None for currency in FOREIGN_CURRENCIES})
+    prefetcher = create_prefetcher(
+        async_session, exchange_rate_repository_factory, leader=True, now=datetime(2022, 6, 15, 12, 0)
+    )
+
+    with patch_get_exchange_rates_by_date(side_effect=ExchangeRateUnavailable()):
+        assert await prefetcher.run_once() is False
+    with patch_get_exchange_rates_by_date(return_value=TABLE_RATES) as mock:
+        assert await prefetcher.run_once() is True
+        mock.assert_awaited_once_with(TODAY)
+        assert await prefetcher.run_once() is False
+        mock.assert_awaited_once()
+
+    assert await exchange_rate_repository.get_rate(TODAY, Currency.USD) == Decimal("4.5")
+    assert prefetcher.exchange_rate_cache.get(TODAY, Currency.EUR) == Decimal("4.5")
+
+
+async def test_table_prefetcher__follower_loads_rates_stored_by_leader(
+    async_session: AsyncSession,
+    exchange_rate_repository: ExchangeRateRepository,
+    exchange_rate_repository_factory: Callable[[AsyncSession], ExchangeRateRepository],
+):
+    prefetcher = create_prefetcher(
+        async_session, exchange_rate_repository_factory, leader=False, now=datetime(2022, 6, 15, 12, 0)
+    )
+
+    with patch_get_exchange_rates_by_date(return_value=TABLE_RATES) as mock:
+        await exchange_rate_repository.insert_exchange_rates({(TODAY, Currency.USD): None})
+        assert await prefetcher.run_once() is False
+        await exchange_rate_repository.insert_exchange_rates(
+            {(TODAY, currency): Decimal("4.5") for currency in FOREIGN_CURRENCIES}
+        )
+        assert await prefetcher.run_once() is True
+        mock.assert_not_awaited()
+
+    assert prefetcher.exchange_rate_cache.get(TODAY, Currency.USD) == Decimal("4.5")
+
+
+@pytest.mark.parametrize(
+    "now",
+    [datetime(2022, 6, 15, 9, 0), datetime(2022, 6, 15, 18, 0), datetime(2022, 6, 18, 12, 0)],
+)
+async def test_table_prefetcher__outside_publication_window__not_polled(
+    async_session: AsyncSession,
+    exchange_rate_repository_factory: Callable[[AsyncSession], ExchangeRateRepository],
+    now: datetime,
+):
+    prefetcher = create_prefetcher(async_session, exchange_rate_repository_factory, leader=True, now=now)
+
+    with patch_get_exchange_rates_by_date(return_value=TABLE_RATES) as mock:
+        assert await prefetcher.run_once() is False
+        mock.assert_not_awaited()
+
+
+async def test_advisory_lock_leader_election__single_leader(async_session: AsyncSession):
+    first = AdvisoryLockLeaderElection(async_session.bind)
+    second = AdvisoryLockLeaderElection(async_session.bind)
+
+    assert await first.is_leader() is True
+    assert await first.is_leader() is True
+    assert await second.is_leader() is False
+
+    await first.release()
+    assert await second.is_leader() is True
+    await second.release()
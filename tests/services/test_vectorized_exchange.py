@@ -0,0 +1,90 @@
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+
+from currency_exchange.enums import Currency
+from currency_exchange.services.currency_exchange import (
+    CurrencyExchangeService,
+    ExchangeOrder,
+)
+from currency_exchange.services.rate_snapshot import RateSnapshot, write_rate_snapshot
+from currency_exchange.services.vectorized_exchange import RateMatrix
+
+np = pytest.importorskip("numpy")
+
+RATES = [
+    (date(2010, 1, 8), Currency.USD, Decimal("2.8423")),
+    (date(2010, 1, 8), Currency.EUR, Decimal("4.1066")),
+    (date(2010, 1, 8), Currency.JPY, Decimal("0.030588")),
+    (date(2010, 1, 9), Currency.USD, None),
+    (date(2010, 1, 11), Currency.USD, Decimal("2.8210")),
+]
+
+ORDERS = [
+    ExchangeOrder(amount=10, in_currency=Currency.USD, out_currency=Currency.PLN, exchange_date=date(2010, 1, 8)),
+    ExchangeOrder(amount=10, in_currency=Currency.PLN, out_currency=Currency.JPY, exchange_date=date(2010, 1, 8)),
+    ExchangeOrder(amount=12.5, in_currency=Currency.EUR, out_currency=Currency.USD, exchange_date=date(2010, 1, 8)),
+    ExchangeOrder(amount=10, in_currency=Currency.USD, out_currency=Currency.PLN, exchange_date=date(2010, 1, 9)),
+    ExchangeOrder(amount=10, in_currency=Currency.EUR, out_currency=Currency.PLN, exchange_date=date(2010, 1, 11)),
+    ExchangeOrder(amount=10, in_currency=Currency.USD, out_currency=Currency.PLN, exchange_date=date(2010, 1, 12)),
+    ExchangeOrder(amount=10, in_currency=Currency.CHF, out_currency=Currency.CHF, exchange_date=date(2011, 1, 1)),
+]
+
+
+def exchange(matrix: RateMatrix, orders: list[ExchangeOrder], decimals=None):
+    return matrix.exchange(
+        np.array([order.amount for order in orders]),
+        matrix.day_indexes([order.exchange_date for order in orders]),
+        matrix.currency_indexes([order.in_currency for order in orders]),
+        matrix.currency_indexes([order.out_currency for order in orders]),
+        decimals=decimals,
+    )
+
+
+@pytest.fixture(params=["rates", "snapshot"])
+def rate_matrix(request, tmp_path: Path):
+    if request.param == "rates":
+        yield RateMatrix.from_rates(RATES)
+        return
+    path = str(tmp_path / "rates.bin")
+    write_rate_snapshot(path, RATES)
+    snapshot = RateSnapshot(path)
+    yield RateMatrix.from_snapshot(snapshot)
+    snapshot.close()
+
+
+def test_rate_matrix__same_results_as_per_item_exchange(rate_matrix: RateMatrix):
+    rates = {(rate_date, currency): rate for rate_date, currency, rate in RATES}
+    # pylint: disable=protected-access
+    expected = [CurrencyExchangeService._convert(order, rates) for order in ORDERS]
+
+    result = exchange(rate_matrix, ORDERS)
+
+    assert result.available.tolist() == [item is not None for item in expected]
+    for amount, rate, item in zip(result.amounts, result.rates, expected):
+        if item is not None:
+            assert amount == pytest.approx(item.amount, rel=1e-15)
+            assert rate == pytest.approx(float(item.rate), rel=1e-15)
+    assert np.isnan(result.amounts[~result.available]).all()
+
+
+def test_rate_matrix__amounts_rounded_half_to_even():
+    matrix = RateMatrix.from_rates([(date(2010, 1, 8), Currency.USD, Decimal("2"))])
+    orders = [
+        ExchangeOrder(
+            amount=amount, in_currency=Currency.PLN, out_currency=Currency.USD, exchange_date=date(2010, 1, 8)
+        )
+        for amount in [1, 3, 5, 0.2]
+    ]
+
+    assert exchange(matrix, orders, decimals=0).amounts.tolist() == [0, 2, 2, 0]
+    assert exchange(matrix, orders, decimals=1).amounts.tolist() == [0.5, 1.5, 2.5, 0.1]
+
+
+def test_rate_matrix__currency_codes():
+    matrix = RateMatrix.from_rates(RATES)
+
+    assert matrix.currency_indexes(["PLN", Currency.USD, "USD"]).tolist() == [4, 0, 0]
+    assert matrix.currency_indexes(np.array(["EUR", "PLN"])).tolist() == [1, 4]
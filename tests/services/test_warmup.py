@@ -0,0 +1,73 @@
+from datetime import date
+from decimal import Decimal
+from typing import Callable
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from currency_exchange.database.repositories import ExchangeRateRepository
+from currency_exchange.enums import FOREIGN_CURRENCIES, Currency
+from currency_exchange.exceptions import ExchangeRateNotCached
+from currency_exchange.services.exchange_rate_cache import ExchangeRateCache
+from currency_exchange.services.nbp_parsers import LxmlParser
+from currency_exchange.services.warmup import Warmup
+
+TODAY = date(2022, 6, 15)
+
+
+def create_warmup(
+    async_session: AsyncSession,
+    repository_factory: Callable[[AsyncSession], ExchangeRateRepository],
+    cache: ExchangeRateCache,
+    **kwargs,
+) -> Warmup:
+    return Warmup(
+        sessionmaker(bind=async_session.bind, class_=AsyncSession, expire_on_commit=False),
+        repository_factory,
+        LxmlParser(),
+        cache,
+        clock=lambda: TODAY,
+        **kwargs,
+    )
+
+
+async def test_warmup__recent_rates_cached(
+    async_session: AsyncSession,
+    exchange_rate_repository: ExchangeRateRepository,
+    exchange_rate_repository_factory: Callable[[AsyncSession], ExchangeRateRepository],
+):
+    await exchange_rate_repository.insert_exchange_rates(
+        {
+            (rate_date, currency): Decimal("4.5")
+            for rate_date in (date(2022, 6, 14), date(2022, 5, 1))
+            for currency in FOREIGN_CURRENCIES
+        }
+    )
+    cache = ExchangeRateCache()
+    warmup = create_warmup(async_session, exchange_rate_repository_factory, cache, rate_days=7)
+
+    with patch.object(LxmlParser, "load") as load:
+        await warmup.run_once()
+
+    load.assert_not_called()
+    assert warmup.warm is True
+    assert len(cache) == len(FOREIGN_CURRENCIES)
+    assert cache.get(date(2022, 6, 14), Currency.USD) == Decimal("4.5")
+    with pytest.raises(ExchangeRateNotCached):
+        cache.get(date(2022, 5, 1), Currency.USD)
+
+
+async def test_warmup__failure_retried(
+    async_session: AsyncSession, exchange_rate_repository_factory: Callable[[AsyncSession], ExchangeRateRepository]
+):
+    warmup = create_warmup(
+        async_session, exchange_rate_repository_factory, ExchangeRateCache(), retry_interval=0, load_parser=True
+    )
+
+    with patch.object(LxmlParser, "load", side_effect=[ImportError("lxml"), None]) as load:
+        await warmup.run()
+
+    assert load.call_count == 2
+    assert warmup.warm is True
@@ -0,0 +1,52 @@
+from datetime import date
+from decimal import Decimal
+from unittest.mock import patch
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from currency_exchange.backfill import backfill, date_range
+from currency_exchange.enums import FOREIGN_CURRENCIES, Currency
+from currency_exchange.exceptions import ExchangeRateUnavailable
+from currency_exchange.services.currency_exchange import CurrencyExchangeService
+from tests.helpers import get_exchange_rate_from_db
+
+
+def test_date_range():
+    assert date_range(date(2010, 1, 30), date(2010, 2, 2)) == [
+        date(2010, 1, 30),
+        date(2010, 1, 31),
+        date(2010, 2, 1),
+        date(2010, 2, 2),
+    ]
+
+
+async def test_backfill__missing_dates_stored(
+    currency_exchange_service: CurrencyExchangeService, async_session: AsyncSession
+):
+    await currency_exchange_service.exchange_rate_repository.insert_exchange_rates(
+        {(date(2010, 1, 8), currency): Decimal(1) for currency in FOREIGN_CURRENCIES}
+    )
+    table_ids = {date(2010, 1, 11): "a005z100111"}
+
+    async def get_table_id(rate_date: date) -> str:
+        try:
+            return table_ids[rate_date]
+        except KeyError as err:
+            raise ExchangeRateUnavailable() from err
+
+    with patch(
+        "currency_exchange.services.rate_table_index.RateTableIndexService.get_table_id", side_effect=get_table_id
+    ) as table_id_mock, patch(
+        "currency_exchange.services.nbp_api.NBPApiService.get_exchange_rates_from_table",
+        return_value={Currency.USD: Decimal("2.821")},
+    ):
+        failed = await backfill(currency_exchange_service, date(2010, 1, 8), date(2010, 1, 11), batch_size=2)
+
+    assert failed == 0
+    # already stored date is skipped
+    assert sorted(call.args[0] for call in table_id_mock.await_args_list) == date_range(
+        date(2010, 1, 9), date(2010, 1, 11)
+    )
+    assert (await get_exchange_rate_from_db(async_session, Currency.USD, date(2010, 1, 11))).rate == Decimal("2.821")
+    assert (await get_exchange_rate_from_db(async_session, Currency.USD, date(2010, 1, 10))).rate is None
+    assert (await get_exchange_rate_from_db(async_session, Currency.USD, date(2010, 1, 8))).rate == Decimal(1)
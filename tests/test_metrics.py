@@ -0,0 +1,48 @@
+from datetime import date
+from decimal import Decimal
+from http import HTTPStatus
+from unittest.mock import patch
+
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient
+
+from currency_exchange.asgi import setup_application
+from currency_exchange.database.repositories import ExchangeRateRepository
+from currency_exchange.enums import FOREIGN_CURRENCIES
+from currency_exchange.metrics import Metrics
+from currency_exchange.services.exchange_rate_cache import ExchangeRateCache
+
+pytest.importorskip("prometheus_client")
+
+
+def test_metrics__disabled_stage_timer_is_shared_noop():
+    metrics = Metrics()
+
+    assert metrics.time_stage("db") is metrics.time_stage("cache")
+
+
+async def test_metrics__requests_and_stages_exposed(
+    test_app: FastAPI, exchange_rate_repository: ExchangeRateRepository
+):
+    await exchange_rate_repository.insert_exchange_rates(
+        {(date(2010, 1, 11), currency): Decimal("2.821") for currency in FOREIGN_CURRENCIES}
+    )
+    metrics = Metrics()
+    metrics.enable()
+    metrics.watch(rate_cache=ExchangeRateCache())
+
+    with patch("currency_exchange.asgi.metrics", metrics), patch(
+        "currency_exchange.dependencies.metrics", metrics
+    ), patch("currency_exchange.endpoints.metrics.metrics", metrics):
+        app = setup_application()
+        app.dependency_overrides.update(test_app.dependency_overrides)
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            params = {"exchange_date": "2010-01-11", "in_currency": "USD", "out_currency": "PLN", "amount": 1}
+            assert (await client.get("/exchange", params=params)).status_code == HTTPStatus.OK
+            resp = await client.get("/metrics")
+
+    assert resp.status_code == HTTPStatus.OK
+    assert 'http_request_duration_seconds_count{method="GET",route="/exchange",status="200"} 1.0' in resp.text
+    assert 'exchange_stage_duration_seconds_count{stage="db"} 1.0' in resp.text
+    assert "rate_cache_size 0.0" in resp.text
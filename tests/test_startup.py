@@ -0,0 +1,83 @@
+"""Startup of a worker in a fresh interpreter: import of the application, its startup and the first request. Checks that
+slow imports, e.g. the database driver or parsers, are deferred past import and that parsers and optional dependencies
+of disabled features aren't imported at all, not even by the warm-up. Import time and first request latency are
+measured and reported, their limits are generous to catch only gross regressions on a loaded machine."""
+import json
+import os
+import subprocess
+import sys
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from currency_exchange.config import AppConfig
+
+IMPORT_TIME_LIMIT = 30.0
+FIRST_REQUEST_TIME_LIMIT = 10.0
+# loaded on first use, after the application is imported
+LAZY_MODULES = ["asyncpg", "bs4", "lxml"]
+# loaded by the first parse only, workers serving from cache and database never load them
+PARSER_MODULES = ["bs4", "lxml"]
+# loaded only by enabled metrics and by configured Redis shared cache
+OPTIONAL_MODULES = ["prometheus_client", "redis"]
+
+MEASURE_STARTUP = f"""
+import asyncio, json, sys, time
+
+start = time.perf_counter()
+from currency_exchange.asgi import app
+import_time = time.perf_counter() - start
+imported_on_import = [module for module in {LAZY_MODULES + OPTIONAL_MODULES!r} if module in sys.modules]
+
+import httpx
+
+
+async def start_and_request():
+    start = time.perf_counter()
+    await app.router.startup()
+    try:
+        async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+            status = (await client.get("/ready")).status_code
+            first_request_time = time.perf_counter() - start
+            # modules are checked once the background warm-up is done
+            for _ in range(1_000):
+                if app.state.warmup.warm:
+                    break
+                await asyncio.sleep(0.01)
+            return first_request_time, status, app.state.warmup.warm
+    finally:
+        await app.router.shutdown()
+
+
+first_request_time, status, warm = asyncio.run(start_and_request())
+print(json.dumps(dict(
+    import_time=import_time,
+    first_request_time=first_request_time,
+    imported_on_import=imported_on_import,
+    imported_after_warmup=[module for module in {PARSER_MODULES + OPTIONAL_MODULES!r} if module in sys.modules],
+    status=status,
+    warm=warm,
+)))
+"""
+
+
+async def test_startup__import_and_first_request(app_config: AppConfig, async_session: AsyncSession):
+    # the session fixture creates tables the warm-up reads from
+    env = {
+        **os.environ,
+        "POSTGRES_DB": app_config.postgres_db,
+        "PREFETCH_ENABLED": "false",
+        "METRICS_ENABLED": "false",
+        "WARMUP_LOAD_PARSER": "false",
+    }
+    env.pop("SHARED_CACHE_URL", None)
+
+    result = subprocess.run([sys.executable, "-c", MEASURE_STARTUP], env=env, capture_output=True, check=True)
+    measured = json.loads(result.stdout.splitlines()[-1])
+    print(f"import {measured['import_time']:.3f}s, startup and first request {measured['first_request_time']:.3f}s")
+
+    assert measured["imported_on_import"] == []
+    assert measured["status"] == 200
+    assert measured["warm"] is True
+    assert measured["imported_after_warmup"] == []
+    assert measured["import_time"] < IMPORT_TIME_LIMIT
+    assert measured["first_request_time"] < FIRST_REQUEST_TIME_LIMIT